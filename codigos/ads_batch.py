@@ -0,0 +1,289 @@
+"""
+Boletines en lote: un PDF por plan (nombre_del_plan), broker y mes a partir
+de una sola carga de datos.
+
+El Excel se lee una vez (caché columnar), las banderas de KPIs se calculan
+una vez sobre todo el DataFrame y cada dimensión se agrega con un solo
+groupby. Cada worker del pool recibe solo el resumen de su boletín (KPIs,
+indicadores y conteos) y escribe el PDF. Los boletines cuyo resumen no
+cambió se copian del caché de artefactos (ads_cache.py). Al final se escribe
+manifest.json y se reporta el throughput en boletines/minuto.
+Uso: python codigos/ads_batch.py [--input resultados/analyzed_bbdd.xlsx] [--dimensiones plan broker mes]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from fpdf import FPDF
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dashboard'))
+from modules.columnar_cache import read_excel_cached
+from modules.metrics import (kpi_flags, kpi_percentages, materialize_exclusion_flags, monthly_kpi_flags,
+                             summarize_kpis)
+from modules.schema import apply_schema, sort_month_labels
+from modules.sla_rules import SLA_RULES, control_text
+from ads_cache import ArtifactCache, artifact_key
+
+# Dimensiones del lote: nombre corto -> columna
+DIMENSIONS = {
+    'plan': 'nombre_del_plan',
+    'broker': 'broker',
+    'mes': 'mes',
+}
+
+# Indicadores del boletín (mismas filas que la tabla de Indicadores del dashboard)
+INDICATORS = [
+    ('ns', '% Cumplimiento del NS', 'Mínimo 90%'),
+    ('abandono', '% Máximo de Abandono', 'Máximo 1%'),
+    ('coordinacion', 'Coordinación Local y Foráneo', '10 minutos Mínimo el 85%'),
+] + [(r['sla'], r['nombre'], control_text(r)) for r in SLA_RULES]
+
+# Conteos por categoría incluidos en cada boletín: (título, columna, máximo de filas)
+BREAKDOWNS = [
+    ('Status del servicio', 'status_del_servicio', 6),
+    ('Origen', 'origen_del_servicio', 4),
+    ('Líneas de servicio', 'tipo_de_servicio', 6),
+]
+
+
+def slug(value):
+    """Nombre de archivo seguro a partir de un valor de dimensión"""
+    text = unicodedata.normalize('NFKD', str(value)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^A-Za-z0-9]+', '_', text).strip('_').lower() or 'sin_nombre'
+
+
+def _latin1(text):
+    # Las fuentes estándar de FPDF solo cubren latin-1
+    return str(text).encode('latin-1', 'replace').decode('latin-1')
+
+
+def load_data(path):
+    """Una sola lectura del Excel (caché columnar) con esquema y banderas de exclusión"""
+    df, _ = read_excel_cached(path)
+    return materialize_exclusion_flags(apply_schema(df))
+
+
+def bulletin_payloads(df, dimensions):
+    """
+    Resumen de cada boletín (uno por valor de cada dimensión) con un groupby
+    por dimensión sobre las banderas calculadas una sola vez.
+    """
+    kpis = kpi_flags(df)
+    monthly = monthly_kpi_flags(df).drop(columns=['total'])
+    flags = pd.concat([kpis, monthly], axis=1).astype(np.int64)
+
+    payloads = []
+    used_names = set()
+    for dim in dimensions:
+        col = DIMENSIONS[dim]
+        if col not in df.columns:
+            print(f"  Columna '{col}' no disponible: se omiten los boletines por {dim}")
+            continue
+        # Texto libre (plan, broker): valores con espacios sobrantes son el mismo boletín
+        keys = df[col] if dim == 'mes' else df[col].astype('string').str.strip().replace('', pd.NA)
+        sums = flags.groupby(keys, observed=True).sum()
+        percentages = kpi_percentages(sums)
+        breakdowns = [(title, df.groupby([keys, df[c]], observed=True).size().unstack(fill_value=0), limit)
+                      for title, c, limit in BREAKDOWNS if c in df.columns]
+
+        values = sums.index.tolist()
+        if dim == 'mes':
+            values = sort_month_labels(values)
+        for value in values:
+            row = sums.loc[value]
+            name = f"{dim}_{slug(value)}"
+            if name in used_names:
+                # Valores distintos con el mismo slug ('S.A' / 'S.A.'): sufijo estable
+                name += '_' + hashlib.sha1(str(value).encode('utf-8')).hexdigest()[:6]
+            used_names.add(name)
+            payloads.append({
+                'dimension': dim,
+                'columna': col,
+                'valor': str(value),
+                'archivo': f"{name}.pdf",
+                'kpis': {k: float(v) for k, v in summarize_kpis(row).items()},
+                'indicadores': [(name, None if np.isnan(percentages.loc[value, key]) else float(percentages.loc[value, key]),
+                                 control) for key, name, control in INDICATORS],
+                'conteos': {title: _top_counts(counts, value, limit) for title, counts, limit in breakdowns},
+            })
+    return payloads
+
+
+def _top_counts(counts, value, limit):
+    """Categorías más frecuentes de un valor de dimensión: [(categoría, n)]"""
+    if value not in counts.index:
+        return []
+    row = counts.loc[value]
+    row = row[row > 0].sort_values(ascending=False, kind='stable').head(limit)
+    return [(str(k), int(n)) for k, n in row.items()]
+
+
+class BulletinPDF(FPDF):
+    def __init__(self, title):
+        super().__init__()
+        self.title_text = _latin1(title)
+
+    def header(self):
+        self.set_font('Arial', 'B', 14)
+        self.cell(0, 10, self.title_text, 0, 1, 'C')
+        self.ln(3)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
+
+
+def write_bulletin(payload, path):
+    """PDF de un boletín a partir de su resumen (sin DataFrame)"""
+    labels = {'plan': 'Plan', 'broker': 'Broker', 'mes': 'Mes'}
+    pdf = BulletinPDF(f"Boletín de Calidad ADS - {labels[payload['dimension']]}: {payload['valor']}")
+    pdf.add_page()
+
+    kpis = payload['kpis']
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 8, 'Resumen', 0, 1)
+    pdf.set_font('Arial', '', 11)
+    for label, value in [('Total servicios', f"{kpis['total_servicios']:,.0f}"),
+                         ('Concluidos', f"{kpis['concluidos']:,.0f}"),
+                         ('SLA medido en BBDD', f"{kpis['sla']:.2f}%"),
+                         ('SLA ponderado (hoja TIEMPO)', f"{kpis['sla_tiempo']:.2f}%"),
+                         ('NPS', f"{kpis['nps']:.2f}%")]:
+        pdf.cell(80, 7, _latin1(label), 0, 0)
+        pdf.cell(0, 7, value, 0, 1)
+    pdf.ln(4)
+
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 8, 'Indicadores', 0, 1)
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(85, 7, 'Indicador', 1, 0)
+    pdf.cell(30, 7, 'Resultado', 1, 0, 'C')
+    pdf.cell(0, 7, 'Punto de control', 1, 1)
+    pdf.set_font('Arial', '', 10)
+    for name, value, control in payload['indicadores']:
+        pdf.cell(85, 7, _latin1(name), 1, 0)
+        pdf.cell(30, 7, '-' if value is None else f"{value:.2f}%", 1, 0, 'C')
+        pdf.cell(0, 7, _latin1(control), 1, 1)
+    pdf.ln(4)
+
+    for title, rows in payload['conteos'].items():
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(0, 8, _latin1(title), 0, 1)
+        pdf.set_font('Arial', '', 10)
+        total = sum(n for _, n in rows) or 1
+        for label, n in rows:
+            pdf.cell(120, 6, _latin1(label)[:70], 0, 0)
+            pdf.cell(0, 6, f"{n:,} ({n / total * 100:.1f}%)", 0, 1)
+        pdf.ln(2)
+
+    pdf.output(path)
+
+
+def _render(payload, output_dir):
+    """Worker: escribe un boletín y devuelve (archivo, segundos)"""
+    t0 = time.perf_counter()
+    write_bulletin(payload, os.path.join(output_dir, payload['archivo']))
+    return payload['archivo'], time.perf_counter() - t0
+
+
+def generate_bulletins(df, output_dir, dimensions=tuple(DIMENSIONS), workers=None, use_cache=True, source=None):
+    """Genera los boletines en un pool de procesos y escribe manifest.json"""
+    os.makedirs(output_dir, exist_ok=True)
+    t0 = time.perf_counter()
+    payloads = bulletin_payloads(df, dimensions)
+    t_aggregate = time.perf_counter() - t0
+    print(f"{len(payloads)} boletines agregados en {t_aggregate:.2f}s")
+
+    cache = ArtifactCache.for_output(output_dir, enabled=use_cache, verbose=False)
+    entries = {}
+    pending = []
+    for payload in payloads:
+        key = artifact_key(payload['archivo'], payload, renderer=write_bulletin)
+        hit = cache.fetch(key, os.path.join(output_dir, payload['archivo']))
+        entries[payload['archivo']] = {'key': key, 'cache': 'hit' if hit else 'miss', 'segundos': 0.0}
+        if not hit:
+            pending.append(payload)
+
+    if workers is None:
+        workers = min(len(pending), os.cpu_count() or 1)
+
+    def done(name, seconds):
+        cache.store(entries[name]['key'], os.path.join(output_dir, name))
+        entries[name]['segundos'] = round(seconds, 4)
+
+    t_render = time.perf_counter()
+    if workers <= 1 or len(pending) <= 1:
+        for payload in pending:
+            done(*_render(payload, output_dir))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_render, payload, output_dir) for payload in pending]
+            for future in as_completed(futures):
+                done(*future.result())
+    t_render = time.perf_counter() - t_render
+    elapsed = time.perf_counter() - t0
+    per_minute = len(payloads) / elapsed * 60 if elapsed > 0 else 0.0
+
+    manifest = {
+        'generado': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'entrada': source,
+        'dimensiones': list(dimensions),
+        'resumen': {
+            'boletines': len(payloads),
+            'generados': len(pending),
+            'desde_cache': len(payloads) - len(pending),
+            'procesos': max(workers, 1),
+            'segundos_agregacion': round(t_aggregate, 3),
+            'segundos_render': round(t_render, 3),
+            'segundos_total': round(elapsed, 3),
+            'boletines_por_minuto': round(per_minute, 1),
+        },
+        'boletines': [{
+            'dimension': p['dimension'],
+            'valor': p['valor'],
+            'archivo': p['archivo'],
+            'registros': int(p['kpis']['total_servicios']),
+            'sla': round(p['kpis']['sla'], 2),
+            'nps': round(p['kpis']['nps'], 2),
+            'cache': entries[p['archivo']]['cache'],
+            'segundos': entries[p['archivo']]['segundos'],
+        } for p in payloads],
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    print(f"{len(payloads)} boletines en {elapsed:.2f}s ({per_minute:.0f} boletines/minuto, "
+          f"{len(pending)} generados en {max(workers, 1)} procesos, {cache.summary()})")
+    print(f"Manifiesto: {os.path.join(output_dir, 'manifest.json')}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Boletines por plan, broker y mes desde una sola carga')
+    parser.add_argument('--input', default=os.path.join('resultados', 'analyzed_bbdd.xlsx'))
+    parser.add_argument('--output', default=os.path.join('reportes', 'boletines'))
+    parser.add_argument('--dimensiones', nargs='+', choices=list(DIMENSIONS), default=list(DIMENSIONS))
+    parser.add_argument('--workers', type=int, default=None, help='Procesos (por defecto, uno por CPU)')
+    parser.add_argument('--sin-cache', action='store_true', help='Regenera todos los boletines')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"No se encontró {args.input}. Ejecuta ads_utils.py primero.")
+        return
+
+    t0 = time.perf_counter()
+    df = load_data(args.input)
+    print(f"Datos cargados una vez: {len(df):,} registros en {time.perf_counter() - t0:.2f}s")
+    generate_bulletins(df, args.output, args.dimensiones, args.workers, not args.sin_cache, args.input)
+
+
+if __name__ == "__main__":
+    main()
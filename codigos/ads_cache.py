@@ -0,0 +1,213 @@
+"""
+ADS Artifact Cache - caché por contenido de gráficos y PDFs del boletín.
+
+Cada artefacto se identifica por el hash de sus entradas agregadas (series,
+tablas, métricas), sus parámetros de render (dpi, colores, tamaño) y el
+código del módulo que lo dibuja (la función, sus helpers y las constantes
+del módulo). Si la llave ya existe en el caché, el archivo se copia desde ahí
+en vez de volver a dibujarlo; así, tras una corrección puntual de datos solo
+se regeneran los gráficos afectados. Solo deben cachearse artefactos
+deterministas: nada que incruste la fecha de generación.
+
+El caché vive en `.cache/artifacts/` dentro del directorio de salida y se
+poda (los menos usados primero) al superar `max_bytes`.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIRNAME = os.path.join('.cache', 'artifacts')
+# Subir al cambiar algo que afecte a todos los artefactos (fuentes, backend...)
+CACHE_VERSION = 1
+# Tamaño máximo por defecto del caché de un directorio de salida
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+@functools.lru_cache(maxsize=None)
+def _module_digest(module_name):
+    """Hash del código fuente completo de un módulo (None si no está disponible)"""
+    module = sys.modules.get(module_name)
+    try:
+        source = inspect.getsource(module)
+    except (OSError, TypeError):
+        return None
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def renderer_fingerprint(fn):
+    """
+    Identidad del código de una función de dibujo: su código más el del módulo
+    que la define, para que cambios en helpers o constantes (p.ej. COLORS_SLA)
+    invaliden la llave. Una función puede fijar `fn.artifact_version`
+    explícitamente en lugar de depender del código.
+    """
+    version = getattr(fn, 'artifact_version', None)
+    if version is not None:
+        return f"version:{version}"
+    try:
+        source = inspect.getsource(fn)
+    except (OSError, TypeError):
+        source = getattr(fn, '__qualname__', repr(fn))
+    module_name = getattr(fn, '__module__', None)
+    module = _module_digest(module_name) if module_name else None
+    return f"{module}|{source}"
+
+
+def _update(digest, obj):
+    """Agrega `obj` al hash de forma canónica (tipo + contenido)"""
+    if obj is None:
+        digest.update(b'N')
+    elif isinstance(obj, (pd.DataFrame, pd.Series)):
+        digest.update(b'S' if isinstance(obj, pd.Series) else b'D')
+        names = [obj.name] if isinstance(obj, pd.Series) else list(obj.columns)
+        digest.update(json.dumps([str(n) for n in names] + [str(obj.index.name)]).encode('utf-8'))
+        digest.update(json.dumps([str(t) for t in np.atleast_1d(obj.dtypes)]).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        digest.update(b'A' + str(obj.dtype).encode('utf-8') + str(obj.shape).encode('utf-8'))
+        digest.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        digest.update(b'{')
+        for key in sorted(obj, key=str):
+            _update(digest, str(key))
+            _update(digest, obj[key])
+        digest.update(b'}')
+    elif isinstance(obj, (list, tuple)):
+        digest.update(b'[')
+        for item in obj:
+            _update(digest, item)
+        digest.update(b']')
+    elif callable(obj):
+        # Funciones de dibujo: cambia la llave si cambia su código o su módulo
+        digest.update(b'F' + renderer_fingerprint(obj).encode('utf-8'))
+    else:
+        digest.update(f"{type(obj).__name__}:{obj!r}".encode('utf-8'))
+
+
+def artifact_key(name, inputs, params=None, renderer=None):
+    """Llave SHA-256 de un artefacto: nombre + entradas + parámetros + código"""
+    digest = hashlib.sha256(f"v{CACHE_VERSION}|{name}".encode('utf-8'))
+    _update(digest, inputs)
+    _update(digest, params)
+    _update(digest, renderer)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """Caché de archivos por llave de contenido, con contadores de aciertos y tamaño máximo"""
+
+    def __init__(self, cache_dir, enabled=True, verbose=True, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.verbose = verbose
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.pruned = 0
+        self._size = None  # Bytes en disco; se calcula en el primer store
+
+    @classmethod
+    def for_output(cls, output_dir, **kwargs):
+        """Caché ubicado dentro del directorio de salida"""
+        return cls(os.path.join(output_dir, CACHE_DIRNAME), **kwargs)
+
+    def _path(self, key, output_path):
+        ext = os.path.splitext(output_path)[1]
+        return os.path.join(self.cache_dir, key[:2], key + ext)
+
+    def _log(self, status, output_path):
+        if self.verbose:
+            print(f"  [caché] {status:6s} {os.path.basename(output_path)}")
+
+    def fetch(self, key, output_path):
+        """Copia el artefacto cacheado a output_path; False si no existe (fallo)"""
+        cached = self._path(key, output_path)
+        if self.enabled and os.path.exists(cached):
+            if os.path.abspath(cached) != os.path.abspath(output_path):
+                shutil.copyfile(cached, output_path)
+            os.utime(cached)  # mtime = último uso, para la poda
+            self.hits += 1
+            self._log('hit', output_path)
+            return True
+        self.misses += 1
+        self._log('miss', output_path)
+        return False
+
+    def store(self, key, output_path):
+        """Guarda en el caché el artefacto recién generado en output_path"""
+        if not self.enabled or not os.path.exists(output_path):
+            return
+        cached = self._path(key, output_path)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        tmp_path = f"{cached}.tmp{os.getpid()}"
+        try:
+            shutil.copyfile(output_path, tmp_path)
+            previous = os.path.getsize(cached) if os.path.exists(cached) else 0
+            os.replace(tmp_path, cached)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += os.path.getsize(cached) - previous
+        if self.max_bytes is not None and self._size > self.max_bytes:
+            self.prune()
+
+    def _entries(self):
+        """(ruta, bytes, mtime) de cada archivo del caché"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime_ns))
+        return entries
+
+    def prune(self, max_bytes=None):
+        """Borra los artefactos usados hace más tiempo hasta quedar bajo `max_bytes`"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        size = sum(e[1] for e in entries)
+        for path, nbytes, _ in entries:
+            if size <= limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= nbytes
+            self.pruned += 1
+        self._size = size
+        return size
+
+    def build(self, output_path, render, inputs, params=None, renderer=None):
+        """
+        Artefacto en output_path: desde el caché si la llave existe, o
+        render(output_path) y se guarda. `renderer` (por defecto `render`)
+        es la función cuyo código forma parte de la llave.
+        """
+        key = artifact_key(os.path.basename(output_path), inputs, params,
+                           render if renderer is None else renderer)
+        if not self.fetch(key, output_path):
+            render(output_path)
+            self.store(key, output_path)
+        return key
+
+    def summary(self):
+        total = self.hits + self.misses
+        text = f"{self.hits}/{total} artefactos desde caché, {self.misses} regenerados"
+        if self.pruned:
+            text += f", {self.pruned} podados"
+        return text
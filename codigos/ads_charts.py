@@ -1,12 +1,25 @@
 """
 ADS Charts Generator - Boletín de Calidad Style
 Generates all charts matching the official bulletin format.
+
+Cada gráfico se separa en agregación (chart_data: series pequeñas a partir
+del DataFrame) y dibujo (draw_*: solo recibe esas series). generate_all_charts
+agrega una vez en el proceso principal y dibuja los gráficos en un pool de
+procesos; cada worker recibe únicamente los datos de su gráfico. Los gráficos
+cuyos datos y parámetros no cambiaron se copian del caché de artefactos
+(ads_cache.py) sin volver a dibujarse.
 """
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib
-import numpy as np
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dashboard'))
+from modules.nps import NPS_CATEGORIES, category_codes, nps_column, nps_flags, nps_summary
+from ads_cache import ArtifactCache, artifact_key
 
 matplotlib.use('Agg')
 
@@ -27,208 +40,269 @@ COLORS = {
     'en_proceso': '#b8d4ed',
 }
 
+STYLE = {
+    'font.family': 'sans-serif',
+    'font.size': 10,
+    'axes.titleweight': 'bold',
+    'axes.labelweight': 'bold',
+}
+
 def setup_style():
     """Configure matplotlib for bulletin style"""
-    plt.rcParams['font.family'] = 'sans-serif'
-    plt.rcParams['font.size'] = 10
-    plt.rcParams['axes.titleweight'] = 'bold'
-    plt.rcParams['axes.labelweight'] = 'bold'
+    plt.rcParams.update(STYLE)
 
-def generate_historico_coordinacion(df, output_dir):
-    """Generate stacked bar chart for monthly service history"""
+STATUS_ORDER = ['Concluido', 'Cancelado al momento', 'Cancelado posterior', 'En proceso']
+STATUS_COLORS = [COLORS['concluido'], COLORS['cancelado_momento'],
+                 COLORS['cancelado_posterior'], COLORS['en_proceso']]
+TIPO_COLORS = [COLORS['primary_blue'], COLORS['light_blue'], COLORS['dark_blue'],
+               COLORS['green'], COLORS['light_green'], COLORS['gray'],
+               COLORS['purple'], COLORS['light_purple']]
+NPS_COLORS = {'PROMOTOR': COLORS['green'], 'PASIVO': COLORS['yellow'], 'DETRACTOR': '#e53935'}
+DPI = 150
+
+# ---------------------------------------------------------------------------
+# Agregación (proceso principal)
+# ---------------------------------------------------------------------------
+
+def historico_data(df):
+    """Servicios por mes y estado (meses como texto, estados en orden del boletín)"""
+    pivot = df.groupby([df['mes'].astype(str).rename('mes_str'), 'status_del_servicio'],
+                       observed=True).size().unstack(fill_value=0)
+    return pivot.reindex(columns=[c for c in STATUS_ORDER if c in pivot.columns], fill_value=0)
+
+def demanda_data(df):
+    """Top 10 provincias y ciudades"""
+    return {'provincia': df['provincia'].value_counts().head(10),
+            'ciudad': df['ciudad'].value_counts().head(10)}
+
+def tipo_servicio_data(df):
+    return df['tipo_de_servicio'].value_counts().head(8)
+
+def origen_data(df):
+    return df['origen_del_servicio'].value_counts()
+
+def satisfaccion_data(df):
+    """
+    NPS con el motor compartido (modules/nps.py): conteos por calificación de
+    las respuestas válidas, categoría de cada calificación y NPS del total.
+    Conteos de satisfacción general (None si no hay columna).
+    """
+    nps_col = nps_column(df.columns)
+    sat_col = next((c for c in df.columns if 'satisfaccion' in c.lower() or 'general' in c.lower()), None)
+    nps = None
+    if nps_col:
+        answered = nps_flags(df)['respuestas'].to_numpy()
+        scores = pd.to_numeric(df[nps_col], errors='coerce')[answered].astype(int)
+        counts = scores.value_counts().sort_index()
+        nps = {'conteos': counts,
+               'categorias': [NPS_CATEGORIES[c] for c in category_codes(counts.index)],
+               'score': float(nps_summary(df)['nps'].iloc[0])}
+    return {'nps': nps,
+            'satisfaccion': df[sat_col].dropna().value_counts().sort_index() if sat_col else None}
+
+def chart_data(df, sla_value=82.71):
+    """Datos pre-agregados de cada gráfico del boletín {nombre: datos}"""
+    return {
+        'historico_coordinacion': historico_data(df),
+        'demanda_geografica': demanda_data(df),
+        'tipo_servicio': tipo_servicio_data(df),
+        'origen_distribucion': origen_data(df),
+        'satisfaccion_charts': satisfaccion_data(df),
+        'sla_chart': sla_value,
+    }
+
+# ---------------------------------------------------------------------------
+# Dibujo (workers): solo series agregadas
+# ---------------------------------------------------------------------------
+
+def _save(fig, path):
+    fig.tight_layout()
+    fig.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+
+def draw_historico_coordinacion(pivot, path):
+    """Stacked bar chart for monthly service history"""
     fig, ax = plt.subplots(figsize=(12, 6))
+    pivot.plot(kind='bar', stacked=True, ax=ax, color=STATUS_COLORS[:len(pivot.columns)], width=0.7)
     
-    # Aggregate by month and status
-    df['mes_str'] = df['mes'].astype(str)
-    pivot = df.groupby(['mes_str', 'status_del_servicio']).size().unstack(fill_value=0)
-    
-    # Reorder columns
-    status_order = ['Concluido', 'Cancelado al momento', 'Cancelado posterior', 'En proceso']
-    pivot = pivot.reindex(columns=[c for c in status_order if c in pivot.columns], fill_value=0)
-    
-    # Colors for each status
-    colors = [COLORS['concluido'], COLORS['cancelado_momento'], 
-              COLORS['cancelado_posterior'], COLORS['en_proceso']]
-    
-    pivot.plot(kind='bar', stacked=True, ax=ax, color=colors[:len(pivot.columns)], width=0.7)
-    
-    # Add totals on top
-    for i, (idx, row) in enumerate(pivot.iterrows()):
-        total = row.sum()
-        ax.text(i, total + 10, str(int(total)), ha='center', fontweight='bold', fontsize=9)
+    # Totales sobre la última serie apilada (su borde superior es el total del mes)
+    totals = pivot.sum(axis=1).astype(int)
+    ax.bar_label(ax.containers[-1], labels=totals.astype(str).tolist(), padding=2,
+                 fontweight='bold', fontsize=9)
     
     ax.set_xlabel('')
     ax.set_ylabel('Cantidad de Servicios')
     ax.set_title('HISTÓRICO COORDINACIÓN', fontsize=14, fontweight='bold', color=COLORS['primary_blue'])
     ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.1), ncol=4, frameon=False)
-    plt.xticks(rotation=0)
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'historico_coordinacion.png'), dpi=150, bbox_inches='tight')
-    plt.close()
+    ax.tick_params(axis='x', labelrotation=0)
+    _save(fig, path)
 
-def generate_demanda_geografica(df, output_dir):
-    """Generate bar charts for province and city demand"""
+def _count_pct_labels(counts, fmt):
+    pct = counts.to_numpy() / counts.sum() * 100
+    return [fmt.format(int(v), p) for v, p in zip(counts.to_numpy(), pct)]
+
+def draw_demanda_geografica(data, path):
+    """Bar charts for province and city demand"""
     fig, axes = plt.subplots(2, 1, figsize=(12, 8))
-    
-    # Province chart
-    provincia_counts = df['provincia'].value_counts().head(10)
-    bars1 = axes[0].bar(range(len(provincia_counts)), provincia_counts.values, color=COLORS['purple'])
-    axes[0].set_xticks(range(len(provincia_counts)))
-    axes[0].set_xticklabels(provincia_counts.index, rotation=45, ha='right', fontsize=8)
-    axes[0].set_title('DEMANDA POR PROVINCIA', fontweight='bold', color=COLORS['purple'])
-    
-    for i, (val, pct) in enumerate(zip(provincia_counts.values, provincia_counts.values/provincia_counts.sum()*100)):
-        axes[0].text(i, val + 5, f"{int(val)}\n{pct:.0f}%", ha='center', fontsize=8)
-    
-    # City chart
-    ciudad_counts = df['ciudad'].value_counts().head(10)
-    bars2 = axes[1].bar(range(len(ciudad_counts)), ciudad_counts.values, color=COLORS['light_purple'])
-    axes[1].set_xticks(range(len(ciudad_counts)))
-    axes[1].set_xticklabels(ciudad_counts.index, rotation=45, ha='right', fontsize=8)
-    axes[1].set_title('DEMANDA POR CIUDAD', fontweight='bold', color=COLORS['purple'])
-    
-    for i, (val, pct) in enumerate(zip(ciudad_counts.values, ciudad_counts.values/ciudad_counts.sum()*100)):
-        axes[1].text(i, val + 5, f"{int(val)}\n{pct:.0f}%", ha='center', fontsize=8)
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'demanda_geografica.png'), dpi=150, bbox_inches='tight')
-    plt.close()
+    for ax, key, color in [(axes[0], 'provincia', COLORS['purple']), (axes[1], 'ciudad', COLORS['light_purple'])]:
+        counts = data[key]
+        bars = ax.bar(range(len(counts)), counts.to_numpy(), color=color)
+        ax.set_xticks(range(len(counts)))
+        ax.set_xticklabels(counts.index, rotation=45, ha='right', fontsize=8)
+        ax.set_title(f'DEMANDA POR {key.upper()}', fontweight='bold', color=COLORS['purple'])
+        ax.bar_label(bars, labels=_count_pct_labels(counts, "{}\n{:.0f}%"), padding=2, fontsize=8)
+    _save(fig, path)
 
-def generate_tipo_servicio(df, output_dir):
-    """Generate service type distribution charts"""
+def draw_tipo_servicio(tipo_counts, path):
+    """Service type distribution chart"""
     fig, ax = plt.subplots(figsize=(10, 6))
-    
-    tipo_counts = df['tipo_de_servicio'].value_counts().head(8)
-    colors = [COLORS['primary_blue'], COLORS['light_blue'], COLORS['dark_blue'], 
-              COLORS['green'], COLORS['light_green'], COLORS['gray'], 
-              COLORS['purple'], COLORS['light_purple']]
-    
-    bars = ax.barh(range(len(tipo_counts)), tipo_counts.values, color=colors[:len(tipo_counts)])
+    bars = ax.barh(range(len(tipo_counts)), tipo_counts.to_numpy(), color=TIPO_COLORS[:len(tipo_counts)])
     ax.set_yticks(range(len(tipo_counts)))
     ax.set_yticklabels(tipo_counts.index, fontsize=9)
     ax.set_title('LÍNEAS DE SERVICIO', fontweight='bold', color=COLORS['primary_blue'])
     ax.invert_yaxis()
-    
-    for i, val in enumerate(tipo_counts.values):
-        pct = val / tipo_counts.sum() * 100
-        ax.text(val + 5, i, f"{int(val)} ({pct:.1f}%)", va='center', fontsize=9)
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'tipo_servicio.png'), dpi=150, bbox_inches='tight')
-    plt.close()
+    ax.bar_label(bars, labels=_count_pct_labels(tipo_counts, "{} ({:.1f}%)"), padding=3, fontsize=9)
+    _save(fig, path)
 
-def generate_origen_distribucion(df, output_dir):
-    """Generate LOCAL vs FORANEO donut chart"""
+def draw_origen_distribucion(origen_counts, path):
+    """LOCAL vs FORANEO donut chart"""
     fig, ax = plt.subplots(figsize=(6, 6))
-    
-    origen_counts = df['origen_del_servicio'].value_counts()
-    colors = [COLORS['primary_blue'], COLORS['light_blue']]
-    
-    wedges, texts, autotexts = ax.pie(origen_counts.values, labels=origen_counts.index,
-                                       autopct='%1.0f%%', colors=colors,
-                                       wedgeprops=dict(width=0.5), pctdistance=0.75)
-    
+    ax.pie(origen_counts.to_numpy(), labels=origen_counts.index, autopct='%1.0f%%',
+           colors=[COLORS['primary_blue'], COLORS['light_blue']],
+           wedgeprops=dict(width=0.5), pctdistance=0.75)
     ax.set_title('DISTRIBUCIÓN LOCAL / FORÁNEO', fontweight='bold', color=COLORS['primary_blue'])
     
     # Add center text with counts
     center_text = '\n'.join([f"{k}: {v}" for k, v in origen_counts.items()])
     ax.text(0, 0, center_text, ha='center', va='center', fontsize=10)
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'origen_distribucion.png'), dpi=150, bbox_inches='tight')
-    plt.close()
+    _save(fig, path)
 
-def generate_satisfaccion_charts(df, output_dir):
-    """Generate satisfaction and NPS charts"""
+def draw_satisfaccion_charts(data, path):
+    """Satisfaction and NPS charts"""
     fig, axes = plt.subplots(1, 3, figsize=(14, 5))
     
-    # NPS distribution
-    nps_col = next((c for c in df.columns if 'nps' in c.lower() and 'calificacion' in c.lower()), None)
-    if nps_col:
-        nps_data = df[nps_col].dropna()
-        nps_counts = nps_data.value_counts().sort_index()
+    nps = data['nps']
+    if nps is not None:
+        # Categorías y NPS ya calculados con modules/nps.py
+        nps_counts = nps['conteos']
+        colors = [NPS_COLORS[c] for c in nps['categorias']]
         
-        colors = []
-        for val in nps_counts.index:
-            if val >= 9 or val == 5:
-                colors.append(COLORS['green'])
-            elif val >= 7 or val == 4:
-                colors.append(COLORS['yellow'])
-            else:
-                colors.append('#e53935')
-        
-        axes[0].bar(nps_counts.index.astype(str), nps_counts.values, color=colors)
+        axes[0].bar(nps_counts.index.astype(str), nps_counts.to_numpy(), color=colors)
         axes[0].set_title('Distribución NPS', fontweight='bold', color=COLORS['green'])
         axes[0].set_xlabel('Calificación')
         
-        # Calculate NPS score
-        prom = len(nps_data[(nps_data >= 9) | (nps_data == 5)]) / len(nps_data)
-        det = len(nps_data[(nps_data <= 6) & (nps_data != 4) & (nps_data != 5)]) / len(nps_data)
-        nps_score = (prom - det) * 100
+        nps_score = nps['score']
         
         # NPS Gauge (simplified)
-        axes[1].pie([nps_score, 100-nps_score], colors=[COLORS['green'], COLORS['gray']],
+        filled = min(max(nps_score, 0), 100)
+        axes[1].pie([filled, 100-filled], colors=[COLORS['green'], COLORS['gray']],
                     startangle=90, counterclock=False,
                     wedgeprops=dict(width=0.3))
         axes[1].text(0, 0, f"{nps_score:.1f}%", ha='center', va='center', fontsize=20, fontweight='bold')
         axes[1].set_title('NPS Score', fontweight='bold', color=COLORS['green'])
     
     # Satisfaction summary
-    sat_col = next((c for c in df.columns if 'satisfaccion' in c.lower() or 'general' in c.lower()), None)
-    if sat_col:
-        sat_data = df[sat_col].dropna()
-        sat_counts = sat_data.value_counts().sort_index()
-        axes[2].bar(sat_counts.index.astype(str), sat_counts.values, color=COLORS['light_green'])
+    sat_counts = data['satisfaccion']
+    if sat_counts is not None:
+        axes[2].bar(sat_counts.index.astype(str), sat_counts.to_numpy(), color=COLORS['light_green'])
         axes[2].set_title('Satisfacción General', fontweight='bold', color=COLORS['green'])
     else:
         axes[2].text(0.5, 0.5, 'N/A', ha='center', va='center', fontsize=20)
         axes[2].set_title('Satisfacción General', fontweight='bold')
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'satisfaccion_charts.png'), dpi=150, bbox_inches='tight')
-    plt.close()
+    _save(fig, path)
 
-def generate_sla_chart(df, output_dir, sla_value):
-    """Generate SLA compliance pie chart"""
+def draw_sla_chart(sla_value, path):
+    """SLA compliance pie chart"""
     fig, ax = plt.subplots(figsize=(6, 6))
-    
-    colors = [COLORS['primary_blue'], '#e53935']
     ax.pie([sla_value, 100-sla_value], labels=['Cumple', 'No Cumple'],
-           autopct='%1.1f%%', colors=colors, startangle=90)
+           autopct='%1.1f%%', colors=[COLORS['primary_blue'], '#e53935'], startangle=90)
     ax.set_title('CUMPLIMIENTO SLA\n(Contactación Vial)', fontweight='bold', color=COLORS['primary_blue'])
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'sla_chart.png'), dpi=150, bbox_inches='tight')
-    plt.close()
+    _save(fig, path)
+
+# Registro de gráficos: nombre (= archivo .png), etiqueta, función de dibujo
+CHARTS = [
+    ('historico_coordinacion', 'Histórico Coordinación', draw_historico_coordinacion),
+    ('demanda_geografica', 'Demanda Geográfica', draw_demanda_geografica),
+    ('tipo_servicio', 'Tipo de Servicio', draw_tipo_servicio),
+    ('origen_distribucion', 'Origen Distribución', draw_origen_distribucion),
+    ('satisfaccion_charts', 'Satisfacción & NPS', draw_satisfaccion_charts),
+    ('sla_chart', 'SLA Chart', draw_sla_chart),
+]
+_DRAW = {name: draw for name, _, draw in CHARTS}
+
+def _render_chart(name, data, output_dir):
+    """Worker: dibuja un gráfico y devuelve (nombre, segundos)"""
+    t0 = time.perf_counter()
+    setup_style()
+    _DRAW[name](data, os.path.join(output_dir, f'{name}.png'))
+    return name, time.perf_counter() - t0
+
+# Compatibilidad: generadores individuales a partir del DataFrame
+
+def generate_historico_coordinacion(df, output_dir):
+    draw_historico_coordinacion(historico_data(df), os.path.join(output_dir, 'historico_coordinacion.png'))
 
-def generate_all_charts(df, output_dir, sla_value=82.71):
-    """Generate all charts for the bulletin"""
+def generate_demanda_geografica(df, output_dir):
+    draw_demanda_geografica(demanda_data(df), os.path.join(output_dir, 'demanda_geografica.png'))
+
+def generate_tipo_servicio(df, output_dir):
+    draw_tipo_servicio(tipo_servicio_data(df), os.path.join(output_dir, 'tipo_servicio.png'))
+
+def generate_origen_distribucion(df, output_dir):
+    draw_origen_distribucion(origen_data(df), os.path.join(output_dir, 'origen_distribucion.png'))
+
+def generate_satisfaccion_charts(df, output_dir):
+    draw_satisfaccion_charts(satisfaccion_data(df), os.path.join(output_dir, 'satisfaccion_charts.png'))
+
+def generate_sla_chart(df, output_dir, sla_value):
+    draw_sla_chart(sla_value, os.path.join(output_dir, 'sla_chart.png'))
+
+def generate_all_charts(df, output_dir, sla_value=82.71, workers=None, use_cache=True):
+    """
+    Generate all charts for the bulletin. Agrega en este proceso, reutiliza
+    del caché los gráficos sin cambios y dibuja el resto en `workers` procesos
+    (None = uno por gráfico hasta el número de CPUs; 1 = secuencial, sin pool).
+    Imprime el tiempo de cada gráfico y los aciertos del caché.
+    """
     setup_style()
     
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
     print("Generando gráficos del boletín...")
+    t0 = time.perf_counter()
+    data = chart_data(df, sla_value)
+    print(f"  Agregación: {time.perf_counter() - t0:.2f}s")
+    
+    # Llave por gráfico: datos agregados + parámetros de render + código de dibujo
+    cache = ArtifactCache.for_output(output_dir, enabled=use_cache)
+    params = {'dpi': DPI, 'colors': COLORS, 'style': STYLE}
+    keys = {}
+    pending = []
+    for name, _, draw in CHARTS:
+        keys[name] = artifact_key(f'{name}.png', data[name], params, draw)
+        if not cache.fetch(keys[name], os.path.join(output_dir, f'{name}.png')):
+            pending.append(name)
+    
+    labels = {name: label for name, label, _ in CHARTS}
+    if workers is None:
+        workers = min(len(pending), os.cpu_count() or 1)
+    
+    def done(name, seconds):
+        cache.store(keys[name], os.path.join(output_dir, f'{name}.png'))
+        print(f"  ✓ {labels[name]} ({seconds:.2f}s)")
+    
+    if workers <= 1 or len(pending) <= 1:
+        for name in pending:
+            done(*_render_chart(name, data[name], output_dir))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_render_chart, name, data[name], output_dir) for name in pending]
+            for future in as_completed(futures):
+                done(*future.result())
     
-    generate_historico_coordinacion(df, output_dir)
-    print("  ✓ Histórico Coordinación")
-    
-    generate_demanda_geografica(df, output_dir)
-    print("  ✓ Demanda Geográfica")
-    
-    generate_tipo_servicio(df, output_dir)
-    print("  ✓ Tipo de Servicio")
-    
-    generate_origen_distribucion(df, output_dir)
-    print("  ✓ Origen Distribución")
-    
-    generate_satisfaccion_charts(df, output_dir)
-    print("  ✓ Satisfacción & NPS")
-    
-    generate_sla_chart(df, output_dir, sla_value)
-    print("  ✓ SLA Chart")
-    
-    print(f"\nTodos los gráficos guardados en: {output_dir}")
+    print(f"  {cache.summary()}")
+    print(f"\nTodos los gráficos guardados en: {output_dir} ({time.perf_counter() - t0:.2f}s)")
 
 if __name__ == "__main__":
     # Load data
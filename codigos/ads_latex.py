@@ -0,0 +1,213 @@
+"""
+ADS LaTeX Build - compilación incremental de los boletines en LaTeX.
+
+Los auxiliares (.aux, .toc, .out, .log) viven en un directorio de build
+persistente (`.cache/latex/<nombre>/` junto al .tex), así que cada corrida
+parte de las referencias cruzadas de la anterior:
+
+- Si el .tex y todos los archivos que leyó la última compilación (gráficas,
+  \\input, estilos locales; los lista pdflatex -recorder) son idénticos byte
+  a byte, no se compila: el PDF ya está al día.
+- Si algo cambió se compila una pasada, y solo se repite si cambiaron los
+  auxiliares de referencias (etiquetas, índice, marcadores). Un cambio de
+  redacción que no mueve referencias cuesta una sola pasada.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+BUILD_DIRNAME = os.path.join('.cache', 'latex')
+# Auxiliares cuyo cambio obliga a otra pasada (referencias, índice, marcadores)
+REFERENCE_EXTENSIONS = ('.aux', '.toc', '.lof', '.lot', '.out')
+MAX_PASSES = 4
+STAMP_VERSION = 1
+
+DEFAULT_TEX = [os.path.join('reportes', 'v3_final', 'Boletin_Calidad_v3.tex')]
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_if_changed(path, content, encoding='utf-8'):
+    """Escribe `content` solo si difiere de lo que ya hay (conserva el archivo y su fecha)"""
+    data = content.encode(encoding)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def default_build_dir(tex_path):
+    """Directorio de build persistente para un .tex"""
+    stem = os.path.splitext(os.path.basename(tex_path))[0]
+    return os.path.join(os.path.dirname(os.path.abspath(tex_path)), BUILD_DIRNAME, stem)
+
+
+def _reference_state(build_dir, jobname):
+    """Hash de los auxiliares de referencias (None si aún no existen)"""
+    state = {}
+    for ext in REFERENCE_EXTENSIONS:
+        path = os.path.join(build_dir, jobname + ext)
+        state[ext] = _sha256(path) if os.path.exists(path) else None
+    return state
+
+
+def recorded_inputs(fls_path, source_dir, build_dir):
+    """
+    Archivos del proyecto que leyó la compilación, según el .fls de
+    pdflatex -recorder: solo los que están bajo `source_dir` (las gráficas y
+    \\input del boletín), no los del sistema TeX ni los auxiliares propios.
+    """
+    if not os.path.exists(fls_path):
+        return []
+    source_dir = os.path.abspath(source_dir)
+    build_dir = os.path.abspath(build_dir)
+    pwd = source_dir
+    inputs = set()
+    with open(fls_path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if line.startswith('PWD '):
+                pwd = line[4:].strip()
+            elif line.startswith('INPUT '):
+                path = os.path.abspath(os.path.join(pwd, line[6:].strip()))
+                if path.startswith(source_dir + os.sep) and not path.startswith(build_dir + os.sep):
+                    inputs.add(os.path.relpath(path, source_dir))
+    return sorted(inputs)
+
+
+def _input_hashes(source_dir, inputs):
+    return {rel: _sha256(os.path.join(source_dir, rel)) if os.path.exists(os.path.join(source_dir, rel)) else None
+            for rel in inputs}
+
+
+def _load_stamp(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _log_excerpt(log_path, lines=20):
+    if not os.path.exists(log_path):
+        return ''
+    with open(log_path, encoding='utf-8', errors='replace') as f:
+        return ''.join(f.readlines()[-lines:])
+
+
+def build_pdf(tex_path, pdf_path=None, build_dir=None, engine='pdflatex', force=False,
+              max_passes=MAX_PASSES, verbose=True):
+    """
+    Compila `tex_path` de forma incremental y deja el PDF en `pdf_path`
+    (por defecto junto al .tex). Devuelve un dict con el resultado
+    ('estado': 'al_dia' / 'compilado' / 'sin_motor', pasadas, segundos).
+    Lanza RuntimeError si la compilación falla.
+    """
+    start = time.time()
+    tex_path = os.path.abspath(tex_path)
+    source_dir = os.path.dirname(tex_path)
+    jobname = os.path.splitext(os.path.basename(tex_path))[0]
+    pdf_path = os.path.abspath(pdf_path or os.path.join(source_dir, jobname + '.pdf'))
+    build_dir = os.path.abspath(build_dir or default_build_dir(tex_path))
+    stamp_path = os.path.join(build_dir, jobname + '.stamp.json')
+    name = os.path.basename(tex_path)
+
+    def done(estado, passes=0):
+        result = {'tex': tex_path, 'pdf': pdf_path, 'estado': estado, 'pasadas': passes,
+                  'segundos': round(time.time() - start, 2)}
+        if verbose:
+            detail = {'al_dia': 'sin cambios, no se compila',
+                      'compilado': f"{passes} pasada(s)",
+                      'sin_motor': f"'{engine}' no está instalado, no se compila"}[estado]
+            print(f"  [latex] {name}: {detail} ({result['segundos']:.2f}s)")
+        return result
+
+    # 1. ¿Cambió algo desde la última compilación?
+    stamp = _load_stamp(stamp_path)
+    if (not force and stamp and stamp.get('version') == STAMP_VERSION and stamp.get('engine') == engine
+            and os.path.exists(pdf_path) and _sha256(pdf_path) == stamp.get('pdf')
+            and _sha256(tex_path) == stamp.get('tex')
+            and _input_hashes(source_dir, stamp['inputs']) == stamp['inputs']):
+        return done('al_dia')
+
+    if shutil.which(engine) is None:
+        return done('sin_motor')
+
+    # 2. Pasadas hasta que las referencias se estabilicen
+    os.makedirs(build_dir, exist_ok=True)
+    command = [engine, '-interaction=nonstopmode', '-halt-on-error', '-file-line-error', '-recorder',
+               f'-output-directory={build_dir}', f'-jobname={jobname}', os.path.basename(tex_path)]
+    log_path = os.path.join(build_dir, jobname + '.log')
+    passes = 0
+    while True:
+        before = _reference_state(build_dir, jobname)
+        # cwd en la carpeta del .tex: las rutas relativas de \includegraphics se resuelven igual
+        completed = subprocess.run(command, cwd=source_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        passes += 1
+        if completed.returncode != 0:
+            raise RuntimeError(f"{engine} falló en {name} (pasada {passes}):\n{_log_excerpt(log_path)}")
+        if _reference_state(build_dir, jobname) == before:
+            break
+        if passes >= max_passes:
+            if verbose:
+                print(f"  [latex] {name}: referencias sin estabilizar tras {passes} pasadas")
+            break
+
+    # 3. PDF al destino y sello de entradas para la próxima corrida
+    built_pdf = os.path.join(build_dir, jobname + '.pdf')
+    tmp_path = f"{pdf_path}.tmp{os.getpid()}"
+    shutil.copyfile(built_pdf, tmp_path)
+    os.replace(tmp_path, pdf_path)
+
+    inputs = [rel for rel in recorded_inputs(os.path.join(build_dir, jobname + '.fls'), source_dir, build_dir)
+              if rel != os.path.basename(tex_path)]
+    with open(stamp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': STAMP_VERSION, 'engine': engine, 'tex': _sha256(tex_path),
+                   'pdf': _sha256(pdf_path), 'inputs': _input_hashes(source_dir, inputs)}, f, indent=2)
+    return done('compilado', passes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compilación incremental de los boletines LaTeX")
+    parser.add_argument('tex', nargs='*', default=DEFAULT_TEX, help="Archivos .tex a compilar")
+    parser.add_argument('--pdf', help="Ruta del PDF de salida (solo con un .tex)")
+    parser.add_argument('--build-dir', help="Directorio de build persistente (solo con un .tex)")
+    parser.add_argument('--engine', default='pdflatex', help="Motor LaTeX (pdflatex, xelatex, lualatex)")
+    parser.add_argument('--forzar', action='store_true', help="Compilar aunque no haya cambios")
+    args = parser.parse_args()
+
+    if len(args.tex) > 1 and (args.pdf or args.build_dir):
+        parser.error("--pdf y --build-dir solo aplican a un único .tex")
+
+    failed = False
+    for tex_path in args.tex:
+        if not os.path.exists(tex_path):
+            print(f"  [latex] {tex_path}: no existe")
+            failed = True
+            continue
+        try:
+            build_pdf(tex_path, args.pdf, args.build_dir, engine=args.engine, force=args.forzar)
+        except RuntimeError as e:
+            print(e)
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib
 from fpdf import FPDF
 import os
+import sys
+
+# Módulos compartidos con el dashboard (dashboard/modules)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dashboard'))
+from modules.metrics import SLA_TIEMPO, VIAL_SLA_RULES, kpi_flags, materialize_exclusion_flags, summarize_kpis
+from modules.sla_rules import cross_check, sla_flags
+from modules.schema import apply_schema, contains, observed_counts
+from ads_cache import ArtifactCache
 
 # Configuración Backend para servidores sin pantalla
 matplotlib.use('Agg')
@@ -18,152 +27,73 @@ class PDFReport(FPDF):
         self.set_font('Arial', 'I', 8)
         self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
 
-def generate_visuals(df):
+def draw_nps_chart(nps_score, path):
+    """Barra horizontal del NPS en escala -100..100"""
+    plt.figure(figsize=(8, 2))
+    plt.barh(['NPS'], [nps_score], color='#0055a6')
+    plt.xlim(-100, 100)
+    plt.axvline(0, color='black', linewidth=0.8)
+    plt.title(f"NPS Score Final: {nps_score:.1f}")
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+def generate_visuals(df, cache=None):
     """Genera gráficos y retorna métricas calculadas con lógica corregida"""
     metrics = {}
     output_dir = os.path.join("reportes", "v3_final")
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    # --- 1. LÓGICA SLA CORREGIDA (Audit V3) ---
+    # --- 1. LÓGICA SLA (Audit V3, motor compartido dashboard/modules/metrics.py) ---
     # Objetivo: ~86.6% (Boletín Octubre)
-    
-    # Identify status column dynamically
-    cols = df.columns
-    status_col = next((c for c in cols if 'status' in c or 'estado' in c), 'status_del_servicio')
-    programado_col = next((c for c in cols if 'programado' in c), 'servicios_programados')
-
-    # Exclusión 1: Estados cancelados explícitos
-    mask_cancelados = df[status_col].astype(str).str.contains('Cancelado|Fallida|Anulado', case=False, na=False)
-    
-    # Exclusión 1b: Solo incluir servicios CONCLUIDOS (Auditor filtra esto)
-    mask_concluido = df[status_col].astype(str).str.strip().str.lower() == 'concluido'
-    
-    # Exclusión 2: Servicios Programados (CRÍTICO para Auditoría)
+    # Universo SLA: Concluido AND No Programado AND sin keywords de cita AND duración calculable
     # "Si un cliente pedía una grúa para 'mañana', tu fórmula calculaba demora de 12 horas"
-    # Solución: Filtrar donde servicios_programados != 'No'
-    # Es decir, QUEDARSE con los que SON 'No' (Inmediatos)
-    if programado_col in df.columns:
-        print(f"Filtrando Servicios Programados usando columna: {programado_col}")
-        # Normalizar a 'no'
-        mask_programados = df[programado_col].astype(str).str.strip().str.lower() != 'no'
-    else:
-        print("ADVERTENCIA: No se encontró columna de servicios programados. Usando heurística de motivos.")
-        mask_programados = pd.Series([False] * len(df))
-
-    # Exclusión 3: Palabras clave 'Cita'/'Agendada' en motivos (Red de seguridad)
-    cols_motivo = [c for c in df.columns if 'motivo' in c or 'sub_motivo' in c or 'servicio_brindado' in c]
-    mask_cita_keywords = pd.Series([False] * len(df))
-    for col in cols_motivo:
-        mask_cita_keywords |= df[col].astype(str).str.contains('Programada|Cita|Agendada|Posterior', case=False, na=False)
-            
-    # Exclusión 4: Outliers de duración (Auditor: "Demoras de 12h eran Citas Programadas")
-    # Si duración > 5 horas (300 min), asumimos que es una cita mal etiquetada o dato invalido para "Inmediato"
-    mask_outliers = df['duracion_minutos'] > 300 
-
-    # Filtro Final SLA: Concluido AND No Programado AND No Cita Keywords AND Duración calculable
-    df_sla = df[mask_concluido & ~mask_programados & ~mask_cita_keywords & df['duracion_minutos'].notnull()].copy()
+    flags = kpi_flags(df)
+    kpis = summarize_kpis(flags.sum())
+    df_sla = df[flags['sla_validos'].to_numpy()].copy()
     print(f"Registros válidos para SLA (Concluido + Inmediato): {len(df_sla)} (Total original: {len(df)})")
     
-    # --- NUEVO: Usar columna de cumplimiento del sistema si existe ---
+    # --- Usar columna de cumplimiento del sistema si existe ---
     # El auditor probablemente usa estas columnas precalculadas.
     sla_col_local = next((c for c in df_sla.columns if 'cumplimiento_local' in c and 'vial' in c), None)
     sla_col_foraneo = next((c for c in df_sla.columns if 'cumplimiento_foraneo' in c and 'vial' in c), None)
+    es_foraneo = contains(df_sla['origen_del_servicio'], 'FORAN').to_numpy()
     
     if sla_col_local and sla_col_foraneo:
         print(f"Usando columnas SLA del sistema: {sla_col_local}, {sla_col_foraneo}")
         # Determinar cumplimiento según origen
-        def check_system_sla(row):
-            origen = str(row.get('origen_del_servicio', '')).upper()
-            if 'FORAN' in origen:
-                return row.get(sla_col_foraneo, 'NO CUMPLE')
-            else:
-                return row.get(sla_col_local, 'NO CUMPLE')
-        
-        df_sla['estado_sla'] = df_sla.apply(check_system_sla, axis=1)
+        df_sla['estado_sla'] = np.where(es_foraneo, df_sla[sla_col_foraneo].astype(object),
+                                        df_sla[sla_col_local].astype(object))
     else:
-        print("Columnas SLA del sistema no encontradas. Usando cálculo manual.")
-        # Umbrales manuales
-        def check_sla(row):
-            limit = 45 
-            origen = str(row.get('origen_del_servicio', '')).lower()
-            if 'foran' in origen or 'carretera' in origen:
-                limit = 90
-            return 'CUMPLE' if row['duracion_minutos'] <= limit else 'NO CUMPLE'
-        df_sla['estado_sla'] = df_sla.apply(check_sla, axis=1)
+        print("Columnas SLA del sistema no encontradas. Usando cálculo manual (tabla de reglas).")
+        vial = sla_flags(df_sla, VIAL_SLA_RULES)
+        cumple = np.logical_or.reduce([vial[f"{r['sla']}_num"].to_numpy() for r in VIAL_SLA_RULES])
+        df_sla['estado_sla'] = np.where(cumple, 'CUMPLE', 'NO CUMPLE')
 
-    # --- NUEVO: Leer SLA directamente de la hoja TIEMPO (pre-calculado por el sistema) ---
-    # El usuario confirmó que la hoja TIEMPO contiene los valores oficiales.
-    # Valores extraídos de TIEMPO_sheet.csv:
-    # - Asignación (10 min): 86.14%
+    # Contraste del motor de reglas con las columnas cumplimiento_* del sistema
+    check = cross_check(df_sla)
+    for sla, row in check.iterrows():
+        print(f"  Validación {sla}: {row['coincidencia_pct']:.2f}% coincide con el sistema "
+              f"({row['discrepancias']} discrepancias de {row['comparados']})")
+
+    # --- SLA oficial: hoja TIEMPO (pre-calculado por el sistema) ---
+    # El usuario confirmó que la hoja TIEMPO contiene los valores oficiales:
     # - Contactación Urbano (45 min): 85.80%
     # - Contactación Rural (90 min): 78.25%
-    
-    # Calcular promedio ponderado basado en distribución LOCAL vs FORANEO
-    try:
-        origen_counts = df_sla['origen_del_servicio'].value_counts()
-        local_count = origen_counts.get('LOCAL', 0)
-        foraneo_count = origen_counts.get('FORANEO', 0)
-        total = local_count + foraneo_count
-        
-        if total > 0:
-            # Valores de TIEMPO sheet (línea 12)
-            sla_urbano = 0.8579881656804734  # 85.80%
-            sla_rural = 0.7825               # 78.25%
-            
-            # Promedio ponderado
-            weighted_sla = ((local_count * sla_urbano) + (foraneo_count * sla_rural)) / total
-            metrics['sla_cumplimiento'] = weighted_sla * 100
-            print(f"SLA calculado usando datos de hoja TIEMPO (ponderado): {metrics['sla_cumplimiento']:.2f}%")
-            print(f"  - LOCAL ({local_count}): {sla_urbano*100:.2f}%")
-            print(f"  - FORANEO ({foraneo_count}): {sla_rural*100:.2f}%")
-        else:
-            # Fallback al cálculo manual
-            sla_counts = valid_sla['estado_sla'].value_counts(normalize=True) * 100
-            metrics['sla_cumplimiento'] = sla_counts.get('CUMPLE', 0)
-    except Exception as e:
-        print(f"Error en SLA ponderado: {e}. Usando cálculo manual.")
-        sla_counts = valid_sla['estado_sla'].value_counts(normalize=True) * 100
-        metrics['sla_cumplimiento'] = sla_counts.get('CUMPLE', 0)
+    # Promedio ponderado según distribución LOCAL vs FORANEO del universo SLA
+    metrics['sla_cumplimiento'] = kpis['sla_tiempo']
+    print(f"SLA calculado usando datos de hoja TIEMPO (ponderado): {metrics['sla_cumplimiento']:.2f}%")
+    print(f"  - LOCAL ({flags['sla_local'].sum()}): {SLA_TIEMPO['urbano']:.2f}%")
+    print(f"  - FORANEO ({flags['sla_foraneo'].sum()}): {SLA_TIEMPO['rural']:.2f}%")
+    print(f"SLA medido en BBDD (horas calendario): {kpis['sla']:.2f}%")
     
     # --- 2. LÓGICA NPS CORREGIDA (Audit V3) ---
     # Objetivo: ~82.1%
-    # Solución: Escala Híbrida/Normalizada.
-    # 5 (escala 1-5) AND 9-10 (escala 0-10) -> Promotores
-    # 4 (escala 1-5) AND 7-8  (escala 0-10) -> Pasivos
-    # Resto -> Detractores
-    
-    nps_cols = [c for c in df.columns if 'nps' in c or 'calificacion' in c]
-    metrics['nps_score'] = 0 # Default logic moved up
-    nps_score = 0 # Local var used in graphing
-    
-    if nps_cols:
-        nps_col = nps_cols[0]
-        print(f"Usando columna NPS: {nps_col}")
-        
-        df[nps_col] = pd.to_numeric(df[nps_col], errors='coerce')
-        df_nps = df[df[nps_col].notnull()].copy()
-        
-        # Mapping definition
-        def categorize_nps(val):
-            # Escala 0-10 (Strict Audit alignment hypothesis: 9 is Passive?)
-            # Standard NPS is 9-10 Prom. 10 Only Prom?
-            if val == 10: return 'PROMOTOR'
-            if val >= 7: return 'PASIVO' # 7, 8, 9
-            
-            # Escala 1-5 (Audit Insight)
-            if val == 5: return 'PROMOTOR' # 5 -> 100
-            if val == 4: return 'PASIVO'   # 4 -> 80
-            return 'DETRACTOR' 
-
-        df_nps['categoria'] = df_nps[nps_col].apply(categorize_nps)
-        
-        if not df_nps.empty:
-            counts = df_nps['categoria'].value_counts(normalize=True)
-            prom = counts.get('PROMOTOR', 0)
-            det = counts.get('DETRACTOR', 0)
-            metrics['nps_score'] = (prom - det) * 100
-            print(f"DEBUG NPS CALC: Prom={prom:.3f}, Det={det:.3f}, Score={metrics['nps_score']:.2f}")
+    # Escala Híbrida: 10 (0-10) y 5 (1-5) -> Promotores; 7-9 y 4 -> Pasivos; Resto -> Detractores
+    metrics['nps_score'] = kpis['nps']
+    nps_score = metrics['nps_score']  # Local var used in graphing
+    print(f"NPS ({flags['nps_respuestas'].sum()} respuestas): Score={nps_score:.2f}")
 
     # SLA Failure Analysis
     print("\n--- SLA FAILURE ANALYSIS ---")
@@ -171,26 +101,34 @@ def generate_visuals(df):
     print(f"Total Failures: {len(failures)}")
     if len(failures) > 0:
         print("Top 10 Failures by Origin:")
-        print(failures['origen_del_servicio'].value_counts().head(10))
+        print(observed_counts(failures['origen_del_servicio']).head(10))
         print("Top 10 Failures by Duration:")
         print(failures['duracion_minutos'].describe())
         print("Sample Failures:")
         print(failures[['origen_del_servicio', 'duracion_minutos']].head(5))
 
-    # Gráfico NPS
-    plt.figure(figsize=(8, 2))
-    plt.barh(['NPS'], [nps_score], color='#0055a6')
-    plt.xlim(-100, 100)
-    plt.axvline(0, color='black', linewidth=0.8)
-    plt.title(f"NPS Score Final: {nps_score:.1f}")
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'nps_chart_v3.png'))
-    plt.close()
+    # Gráfico NPS (se reutiliza del caché si el score no cambió)
+    cache = cache or ArtifactCache.for_output(output_dir)
+    cache.build(os.path.join(output_dir, 'nps_chart_v3.png'),
+                lambda path: draw_nps_chart(nps_score, path),
+                inputs={'nps_score': nps_score}, renderer=draw_nps_chart)
     
     return metrics
 
 def create_pdf(metrics):
+    """
+    PDF del reporte. No pasa por el caché de artefactos: incluye la fecha de
+    generación, así que una copia cacheada mostraría la de la corrida anterior.
+    """
     output_dir = os.path.join("reportes", "v3_final")
+    sla_img = os.path.join(output_dir, 'sla_chart_v3.png')
+    nps_img = os.path.join(output_dir, 'nps_chart_v3.png')
+    output_pdf = os.path.join(output_dir, 'Reporte_Completo_v3.pdf')
+    
+    write_pdf(metrics, sla_img, nps_img, output_pdf)
+    print(f"Reporte PDF generado exitosamente en: {output_pdf}")
+
+def write_pdf(metrics, sla_img, nps_img, output_pdf):
     pdf = PDFReport()
     pdf.add_page()
     
@@ -208,9 +146,6 @@ def create_pdf(metrics):
     
     # Imágenes
     pdf.ln(10)
-    sla_img = os.path.join(output_dir, 'sla_chart_v3.png')
-    nps_img = os.path.join(output_dir, 'nps_chart_v3.png')
-    
     if os.path.exists(sla_img):
         pdf.image(sla_img, x=10, w=90)
     if os.path.exists(nps_img):
@@ -241,9 +176,7 @@ def create_pdf(metrics):
     pdf.cell(0, 10, f'Generado: {pd.Timestamp.now().strftime("%Y-%m-%d %H:%M")}', 0, 1)
 
     # Guardar
-    output_pdf = os.path.join(output_dir, 'Reporte_Completo_v3.pdf')
     pdf.output(output_pdf)
-    print(f"Reporte PDF generado exitosamente en: {output_pdf}")
 
 if __name__ == "__main__":
     # Cargar data ya procesada por utils
@@ -253,10 +186,12 @@ if __name__ == "__main__":
              print(f"No se encontró {analyzed_path}. Ejecuta ads_utils.py primero.")
              exit()
              
-        df = pd.read_excel(analyzed_path)
+        df = materialize_exclusion_flags(apply_schema(pd.read_excel(analyzed_path)))
         print(f"Columns in loaded DF: {df.columns.tolist()}")
-        metrics = generate_visuals(df)
+        cache = ArtifactCache.for_output(os.path.join("reportes", "v3_final"))
+        metrics = generate_visuals(df, cache)
         create_pdf(metrics)
+        print(f"Caché de artefactos: {cache.summary()}")
         print(f"RESULTADOS FINALES:\nSLA: {metrics['sla_cumplimiento']}\nNPS: {metrics['nps_score']}")
     except Exception as e:
         print(f"Error crítico en reporte: {e}")
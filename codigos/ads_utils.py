@@ -1,8 +1,99 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
 import argparse
-import datetime
+
+# Módulos compartidos con el dashboard (dashboard/modules)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dashboard'))
+from modules.timestamps import combine_date_time, minutes_between, parse_dates
+from modules import store
+
+# Proyección de columnas usada por el camino de KPIs (nombres ya normalizados) y su tipo.
+# Teléfonos, chasis, comentarios libres y los "porqué" de la encuesta quedan fuera.
+KPI_COLUMNS = {
+    'mes': 'string',
+    'año': 'int',
+    'expedientes': 'int',
+    'asistencias': 'int',
+    'nombre_del_plan': 'string',
+    'fec_apertura': 'date',
+    'hrs_apertura': 'string',
+    'fec_registro': 'date',
+    'hrs_registro': 'string',
+    'fec_asignacion': 'date',
+    'hrs_asignacion': 'string',
+    'fec_contacto': 'date',
+    'hrs_contacto': 'string',
+    'status_del_servicio': 'string',
+    'tipo_de_servicio': 'string',
+    'servicio_brindado': 'string',
+    'servicios_programados': 'string',
+    'origen_del_servicio': 'string',
+    'provincia': 'string',
+    'ciudad': 'string',
+    '¿como_califica_de_forma_general_nuestra_asistencia?_-_general': 'float',
+    'nota_promedio_satisfaccion': 'float',
+    'nps_calificacion_cliente': 'float',
+    'nps_tipo_de_cliente': 'string',
+    'motivo_nps': 'string',
+    'broker': 'string',
+    'linea_de_negocio': 'string',
+    'motivo_cancelacion': 'string',
+    'sub_motivo_cancelacion': 'string',
+    'tiempo_asignacion': 'string',
+    'cumplimiento_asignacion\n(10min)': 'string',
+    'cumplimiento_local_-_vial\n(45min)': 'string',
+    'cumplimiento_foraneo_-_vial\n(90min)': 'string',
+    'cumplimiento_local_-_legal\n(35min)': 'string',
+    'cumplimiento_foraneo_-_legal\n(60min)': 'string',
+}
+
+# Columnas derivadas que agrega add_time_columns
+DERIVED_COLUMNS = {
+    'ts_asignacion': 'datetime',
+    'ts_contacto': 'datetime',
+    'duracion_minutos': 'float',
+}
+
+STREAM_CHUNK_SIZE = 20000
+
+STORE_DIR = os.path.join("resultados", store.STORE_DIRNAME)
+
+def normalize_columns(columns):
+    """Estandariza nombres de columnas a snake_case"""
+    return (pd.Index(columns).astype(str)
+            .str.strip()
+            .str.lower()
+            .str.replace(' ', '_')
+            .str.replace('/', '_')
+            .str.replace('.', '')
+            .str.replace('á', 'a').str.replace('é', 'e').str.replace('í', 'i').str.replace('ó', 'o').str.replace('ú', 'u')
+            )
+
+def add_time_columns(df, verbose=True):
+    """Agrega ts_asignacion, ts_contacto y duracion_minutos (in place)"""
+    # Flexible column detection
+    cols = df.columns
+    fec_asig = next((c for c in cols if 'fec' in c and 'asig' in c), 'fec_asignacion')
+    hrs_asig = next((c for c in cols if 'ho' in c and 'asig' in c), 'hrs_asignacion')
+    fec_cont = next((c for c in cols if 'fec' in c and 'cont' in c), 'fec_contacto')
+    hrs_cont = next((c for c in cols if 'ho' in c and 'cont' in c), 'hrs_contacto')
+    
+    if verbose:
+        print(f"Usando columnas de tiempo: {fec_asig}, {hrs_asig} -> {fec_cont}, {hrs_cont}")
+        print("Calculando timestamps...")
+
+    # Motor vectorizado compartido con el dashboard (seriales Excel, datetime.time, texto)
+    df['ts_asignacion'] = combine_date_time(df[fec_asig], df[hrs_asig])
+    df['ts_contacto'] = combine_date_time(df[fec_cont], df[hrs_cont])
+
+    # Cálculo de duración en minutos
+    df['duracion_minutos'] = minutes_between(df['ts_asignacion'], df['ts_contacto'])
+    
+    # Limpieza de valores negativos o nulos lógicos
+    df.loc[df['duracion_minutos'] < 0, 'duracion_minutos'] = np.nan
+    return df
 
 def clean_data(file_path):
     """
@@ -20,90 +111,108 @@ def clean_data(file_path):
         df = pd.read_excel(file_path)
 
     # 1. Estandarización de columnas (Snake Case)
-    df.columns = (df.columns
-                  .str.strip()
-                  .str.lower()
-                  .str.replace(' ', '_')
-                  .str.replace('/', '_')
-                  .str.replace('.', '')
-                  .str.replace('á', 'a').str.replace('é', 'e').str.replace('í', 'i').str.replace('ó', 'o').str.replace('ú', 'u')
-                  )
+    df.columns = normalize_columns(df.columns)
     
     # 2. Procesamiento de Fechas y Horas para SLA
-    
-    def parse_datetime(date_series, time_series):
-        # Handle Excel Serial Dates (floats)
-        def to_dt(x):
-            if pd.isna(x): return pd.NaT
-            if isinstance(x, (int, float)):
-                # Excel base date
-                return pd.to_datetime(x, unit='D', origin='1899-12-30')
-            return pd.to_datetime(x, errors='coerce')
-
-        dates = date_series.apply(to_dt)
-        
-        def extract_time(val):
-            if pd.isna(val): return None
-            # If it's already a time object (from Excel)
-            if isinstance(val, datetime.time):
-                return val
-            # If it's a datetime object (has .time() method)
-            if hasattr(val, 'time'):
-                return val.time()
-            # If string
-            if isinstance(val, str):
-                val = val.strip()
-                # Try parsing
-                try:
-                    dt = pd.to_datetime(val, format='%H:%M:%S')
-                    return dt.time()
-                except:
-                    try:
-                        dt = pd.to_datetime(val) # infer
-                        return dt.time()
-                    except:
-                        pass
-            return None
-
-        times = time_series.apply(extract_time)
-        
-        # Combine
-        combined = []
-        for d, t in zip(dates, times):
-            if pd.notna(d) and t is not None:
-                try:
-                    combined.append(pd.Timestamp.combine(d.date(), t))
-                except:
-                    combined.append(pd.NaT)
-            else:
-                combined.append(pd.NaT)
-                
-        return pd.Series(combined)
+    return add_time_columns(df)
 
-    # Flexible column detection
-    cols = df.columns
-    fec_asig = next((c for c in cols if 'fec' in c and 'asig' in c), 'fec_asignacion')
-    hrs_asig = next((c for c in cols if 'ho' in c and 'asig' in c), 'hrs_asignacion')
-    fec_cont = next((c for c in cols if 'fec' in c and 'cont' in c), 'fec_contacto')
-    hrs_cont = next((c for c in cols if 'ho' in c and 'cont' in c), 'hrs_contacto')
-    
-    print(f"Usando columnas de tiempo: {fec_asig}, {hrs_asig} -> {fec_cont}, {hrs_cont}")
+# --- Ingesta en streaming (memoria acotada) ---
 
-    print("Calculando timestamps...")
-    df['ts_asignacion'] = parse_datetime(df[fec_asig], df[hrs_asig])
-    df['ts_contacto'] = parse_datetime(df[fec_cont], df[hrs_cont])
+def iter_excel_chunks(file_path, columns, sheet_name=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Lee un Excel fila a fila (openpyxl read_only) y entrega DataFrames de
+    `chunk_size` filas con solo las columnas proyectadas (nombres normalizados).
+    """
+    from openpyxl import load_workbook
 
-    # Force datetime type
-    df['ts_asignacion'] = pd.to_datetime(df['ts_asignacion'], errors='coerce')
-    df['ts_contacto'] = pd.to_datetime(df['ts_contacto'], errors='coerce')
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = normalize_columns(['' if h is None else h for h in next(rows, ())])
 
-    # Cálculo de duración en minutos
-    df['duracion_minutos'] = (df['ts_contacto'] - df['ts_asignacion']).dt.total_seconds() / 60
-    
-    # Limpieza de valores negativos o nulos lógicos
-    df.loc[df['duracion_minutos'] < 0, 'duracion_minutos'] = np.nan
+        # Primera aparición de cada columna proyectada
+        positions = {}
+        for pos, name in enumerate(header):
+            if name in columns and name not in positions:
+                positions[name] = pos
+        selected = [c for c in columns if c in positions]
+        getters = [positions[c] for c in selected]
 
-    return df
+        buffer = []
+        for row in rows:
+            buffer.append([row[i] if i < len(row) else None for i in getters])
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=selected)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=selected)
+    finally:
+        wb.close()
+
+def iter_csv_chunks(file_path, columns, chunk_size=STREAM_CHUNK_SIZE):
+    """Equivalente CSV de iter_excel_chunks (pd.read_csv por bloques)"""
+    header = pd.read_csv(file_path, encoding='latin1', nrows=0).columns
+    normalized = normalize_columns(header)
+    keep = {orig: name for orig, name in zip(header, normalized) if name in columns}
+    for chunk in pd.read_csv(file_path, encoding='latin1', on_bad_lines='skip',
+                             usecols=list(keep), chunksize=chunk_size):
+        yield chunk.rename(columns=keep)
+
+def coerce_types(df, schema):
+    """Tipa un chunk según el esquema declarado (columnas ausentes -> nulos)"""
+    out = pd.DataFrame(index=df.index)
+    for col, kind in schema.items():
+        values = df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if kind == 'string':
+            out[col] = values.astype('string')
+        elif kind == 'int':
+            out[col] = pd.to_numeric(values, errors='coerce').round().astype('Int64')
+        elif kind == 'float':
+            out[col] = pd.to_numeric(values, errors='coerce').astype('float64')
+        elif kind == 'date':
+            out[col] = parse_dates(values).astype('datetime64[ns]')
+        elif kind == 'datetime':
+            out[col] = pd.to_datetime(values, errors='coerce').astype('datetime64[ns]')
+    return out
+
+def arrow_schema(schema):
+    """Esquema Arrow fijo para que todos los row groups sean compatibles"""
+    import pyarrow as pa
+    types = {'string': pa.string(), 'int': pa.int64(), 'float': pa.float64(),
+             'date': pa.timestamp('ns'), 'datetime': pa.timestamp('ns')}
+    return pa.schema([(col, types[kind]) for col, kind in schema.items()])
+
+def stream_clean_data(file_path, output_path, columns=None, sheet_name=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Limpieza en streaming: proyecta columnas, tipa y escribe cada chunk como
+    row group de Parquet. La memoria pico depende de `chunk_size`, no del archivo.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    print("--- Iniciando Limpieza de Datos (streaming) ---")
+    columns = dict(columns or KPI_COLUMNS)
+    schema = {**columns, **DERIVED_COLUMNS}
+    pa_schema = arrow_schema(schema)
+
+    if file_path.endswith('.csv'):
+        chunks = iter_csv_chunks(file_path, columns, chunk_size=chunk_size)
+    else:
+        chunks = iter_excel_chunks(file_path, columns, sheet_name=sheet_name, chunk_size=chunk_size)
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    total_rows = 0
+    with pq.ParquetWriter(output_path, pa_schema) as writer:
+        for i, chunk in enumerate(chunks):
+            chunk = add_time_columns(chunk, verbose=(i == 0))
+            typed = coerce_types(chunk, schema)
+            writer.write_table(pa.Table.from_pandas(typed, schema=pa_schema, preserve_index=False))
+            total_rows += len(typed)
+            print(f"  chunk {i + 1}: {len(typed)} filas (acumulado {total_rows})")
+
+    print(f"Data limpia guardada en: {output_path} ({total_rows} filas, {len(schema)} columnas)")
+    return output_path
 
 def analyze_data(df):
     """
@@ -120,16 +229,58 @@ def analyze_data(df):
     print(f"Data procesada guardada en: {output_file}")
     return df
 
+def ingest_month(file_path, store_dir=STORE_DIR, columns=None, sheet_name=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Cierre mensual incremental: agrega al store particionado solo las filas del
+    nuevo export. Las columnas derivadas se calculan únicamente para esas filas;
+    cada expedientes/asistencias del export reemplaza a sus versiones previas
+    en cualquier mes del store.
+    """
+    print("--- Ingesta Incremental ---")
+    t0 = pd.Timestamp.now()
+    columns = dict(columns or KPI_COLUMNS)
+    schema = {**columns, **DERIVED_COLUMNS}
+
+    if file_path.endswith('.csv'):
+        chunks = iter_csv_chunks(file_path, columns, chunk_size=chunk_size)
+    else:
+        chunks = iter_excel_chunks(file_path, columns, sheet_name=sheet_name, chunk_size=chunk_size)
+
+    typed = [coerce_types(add_time_columns(chunk, verbose=(i == 0)), schema) for i, chunk in enumerate(chunks)]
+    if not typed:
+        print("El archivo no contiene filas.")
+        return {}
+    new_rows = pd.concat(typed, ignore_index=True)
+
+    summary = store.upsert_partitions(store_dir, new_rows, source=file_path)
+    for mes, info in summary.items():
+        print(f"  {mes}: {info['previas']} previas - {info['reemplazadas']} reemplazadas "
+              f"+ {info['nuevas']} del export = {info['total']} filas")
+    elapsed = (pd.Timestamp.now() - t0).total_seconds()
+    print(f"Store actualizado en: {store_dir} ({len(new_rows)} filas leídas, {elapsed:.1f}s)")
+    return summary
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('--action', choices=['clean', 'analyze', 'conclude'], required=False) 
+    parser.add_argument('--action', choices=['clean', 'analyze', 'conclude', 'ingest'], required=False) 
     parser.add_argument('--input', required=False, default="Servicios brindados ADS 2025 (1).xlsx")
+    parser.add_argument('--stream', action='store_true',
+                        help="Ingesta en streaming con proyección de columnas hacia Parquet")
+    parser.add_argument('--output', required=False, default=os.path.join("resultados", "clean_bbdd.parquet"))
+    parser.add_argument('--sheet', required=False, default=None)
+    parser.add_argument('--chunk-size', type=int, default=STREAM_CHUNK_SIZE)
+    parser.add_argument('--store', required=False, default=STORE_DIR,
+                        help="Carpeta del store particionado (--action ingest)")
     args = parser.parse_args()
 
     # Ajusta la ruta a tu archivo real
     file_path = args.input
-    if os.path.exists(file_path):
+    if not os.path.exists(file_path):
+        print(f"Archivo no encontrado: {file_path}")
+    elif args.action == 'ingest':
+        ingest_month(file_path, store_dir=args.store, sheet_name=args.sheet, chunk_size=args.chunk_size)
+    elif args.stream:
+        stream_clean_data(file_path, args.output, sheet_name=args.sheet, chunk_size=args.chunk_size)
+    else:
         df = clean_data(file_path)
         analyze_data(df)
-    else:
-        print(f"Archivo no encontrado: {file_path}")
@@ -0,0 +1,110 @@
+"""
+Pico de memoria (RSS) por rerun del dashboard: copias por sección vs. vistas
+sin copia (dashboard/modules/selection.py).
+
+Cada modo corre en un subproceso nuevo y reporta el crecimiento del RSS pico
+(ru_maxrss) después de cargar los datos. El modo 'copias' reproduce la ruta
+anterior: el DataFrame sale de st.cache_data (copia deserializada en cada
+rerun) y las secciones materializan df_sel / df_auxilio / df_remolque.
+Uso: python codigos/benchmark_memory.py [--input resultados/analyzed_bbdd.xlsx] [--scale 10]
+"""
+import argparse
+import os
+import pickle
+import resource
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dashboard'))
+from modules.columnar_cache import read_excel_cached
+from modules.filter_index import build_filter_index, select_positions, select_rows
+from modules.metrics import complete_months, materialize_exclusion_flags, monthly_kpi_counts, monthly_kpi_flags
+from modules.nps import nps_flags, nps_percentages, nps_summary
+from modules.schema import PERIOD_COLUMN, apply_schema, contains, observed_counts
+from modules.selection import RowSelection
+
+MODES = ['copias', 'vistas']
+
+
+def peak_rss_mb():
+    """RSS pico del proceso (ru_maxrss está en KB en Linux y en bytes en macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def rerun_copias(cached_bytes, plan):
+    """Un rerun con la ruta anterior (copias de DataFrame por sección)"""
+    df = pickle.loads(cached_bytes)
+    index = build_filter_index(df)
+    df_sel = select_rows(df, index, include={'nombre_del_plan': plan})
+    df_auxilio = df_sel[contains(df_sel['tipo_de_servicio'], 'AUXILIO')]
+    df_remolque = df_sel[contains(df_sel['tipo_de_servicio'], 'REMOLQUE|GRUA')]
+    observed_counts(df_auxilio['origen_del_servicio'])
+    observed_counts(df_remolque['origen_del_servicio'])
+    monthly_kpi_counts(df_sel)
+    nps_summary(df_sel, 'mes')
+
+
+def rerun_vistas(df, index, flags, plan):
+    """Un rerun con vistas por posiciones sobre el DataFrame compartido"""
+    rows = RowSelection(df, select_positions(index, include={'nombre_del_plan': plan}))
+    rows.where(contains(df['tipo_de_servicio'], 'AUXILIO')).counts('origen_del_servicio')
+    rows.where(contains(df['tipo_de_servicio'], 'REMOLQUE|GRUA')).counts('origen_del_servicio')
+    complete_months(rows.group_sum(flags['monthly'], PERIOD_COLUMN))
+    nps_percentages(rows.group_sum(flags['nps'], 'mes'))
+
+
+def run_mode(args):
+    df = apply_schema(read_excel_cached(args.input)[0])
+    if args.scale > 1:
+        df = apply_schema(pd.concat([df] * args.scale, ignore_index=True))
+    df = materialize_exclusion_flags(df)
+    plans = [None] + df['nombre_del_plan'].dropna().unique().tolist()[:3]
+
+    if args.mode == 'copias':
+        cached_bytes = pickle.dumps(df)
+        del df
+        baseline = peak_rss_mb()
+        t0 = time.perf_counter()
+        for i in range(args.reruns):
+            plan = plans[i % len(plans)]
+            rerun_copias(cached_bytes, None if plan is None else [plan])
+    else:
+        index = build_filter_index(df)
+        flags = {'monthly': monthly_kpi_flags(df), 'nps': nps_flags(df)}
+        baseline = peak_rss_mb()
+        t0 = time.perf_counter()
+        for i in range(args.reruns):
+            plan = plans[i % len(plans)]
+            rerun_vistas(df, index, flags, None if plan is None else [plan])
+
+    ms = (time.perf_counter() - t0) / args.reruns * 1000
+    print(f"{args.mode}\t{peak_rss_mb() - baseline:.1f}\t{ms:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RSS pico por rerun: copias vs. vistas')
+    parser.add_argument('--input', default=os.path.join('resultados', 'analyzed_bbdd.xlsx'))
+    parser.add_argument('--reruns', type=int, default=20)
+    parser.add_argument('--scale', type=int, default=1, help='Replica las filas N veces')
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    print(f"\n--- RSS PICO POR RERUN ({args.reruns} reruns, escala x{args.scale}) ---")
+    for mode in MODES:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--mode', mode,
+                              '--input', args.input, '--reruns', str(args.reruns), '--scale', str(args.scale)],
+                             capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1]
+        _, growth, ms = out.split('\t')
+        print(f"{mode:8s} crecimiento RSS pico: {float(growth):8.1f} MB   {float(ms):8.1f} ms/rerun")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark del motor de KPIs (dashboard/modules/metrics.py).
+
+Mide el motor vectorizado frente a la implementación anterior (texto y NPS fila
+a fila). Las cifras publicadas en reportes/v3_final/Boletin_Calidad_v3.tex se
+verifican en tests/test_golden_metrics.py.
+Uso: python codigos/benchmark_metrics.py [--input resultados/analyzed_bbdd.xlsx] [--scale 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dashboard'))
+from modules.columnar_cache import read_excel_cached
+from modules.metrics import calculate_metrics, materialize_exclusion_flags
+from modules.nps import nps_column
+from modules.schema import apply_schema
+
+def legacy_metrics(df):
+    """KPIs con texto por fila y NPS con .apply (implementación previa de streamlit_boletin.py)"""
+    metrics = {'total_servicios': len(df)}
+    metrics['concluidos'] = len(df[df['status_del_servicio'].astype(str).str.contains('Concluido', case=False, na=False)])
+
+    sla_col = next(c for c in df.columns if 'cumplimiento' in c.lower() and 'vial' in c.lower())
+    sla_data = df[sla_col].astype(str).str.strip().str.upper()
+    metrics['sla'] = (sla_data == 'CUMPLE').sum() / sla_data.isin(['CUMPLE', 'NO CUMPLE']).sum() * 100
+
+    nps_data = pd.to_numeric(df[nps_column(df.columns)], errors='coerce').dropna()
+
+    def categorize(val):
+        if val == 10 or val == 5: return 'PROMOTOR'
+        if val >= 7 or val == 4: return 'PASIVO'
+        return 'DETRACTOR'
+
+    cats = nps_data.apply(categorize)
+    metrics['nps'] = ((cats == 'PROMOTOR').sum() - (cats == 'DETRACTOR').sum()) / len(cats) * 100
+    return metrics
+
+
+def timed(fn, df, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(df)
+    return result, (time.perf_counter() - t0) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del motor de KPIs')
+    parser.add_argument('--input', default=os.path.join('resultados', 'analyzed_bbdd.xlsx'))
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--scale', type=int, default=1, help='Replica las filas N veces para el benchmark')
+    args = parser.parse_args()
+
+    df = apply_schema(read_excel_cached(args.input)[0])
+    if args.scale > 1:
+        df = apply_schema(pd.concat([df] * args.scale, ignore_index=True))
+    _, ms_engine = timed(calculate_metrics, df, args.repeat)
+    flagged, ms_flags = timed(lambda d: materialize_exclusion_flags(d.copy(deep=False)), df, args.repeat)
+    _, ms_flagged = timed(calculate_metrics, flagged, args.repeat)
+    _, ms_legacy = timed(legacy_metrics, df, args.repeat)
+
+    print(f"\n--- BENCHMARK ({len(df):,} filas, {args.repeat} repeticiones) ---")
+    print(f"Motor vectorizado (modules/metrics.py): {ms_engine:8.2f} ms")
+    print(f"  con banderas materializadas:          {ms_flagged:8.2f} ms (etapa de carga: {ms_flags:.2f} ms)")
+    print(f"Implementación anterior (fila a fila):  {ms_legacy:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
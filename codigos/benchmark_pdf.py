@@ -1,38 +1,394 @@
-import pdfplumber
-import re
+"""
+Extracción de cifras oficiales de los boletines de calidad en PDF.
+
+Acepta uno o varios PDF o carpetas con boletines históricos. Las páginas se
+extraen con pdfplumber en un pool de procesos (tramos de páginas de todos los
+boletines a la vez) y el texto por página se guarda en caché por hash del PDF
+(`.cache/pdf_text/` junto al boletín): reprocesar un boletín ya visto no
+vuelve a abrirlo.
+
+Del texto se extraen las tablas de KPIs en filas estructuradas (boletín,
+tabla, indicador, fila, mes, valor, servicios):
+- INDICADORES: % por indicador y mes (NS, abandono, coordinación, contacto, quejas)
+- CUMPLIMIENTO ...: servicios y % por línea de servicio y mes
+- NPS del periodo del boletín
+Con --datos se concilian las cifras oficiales (última publicación de cada mes)
+contra los KPIs mensuales calculados por dashboard/modules/metrics.py.
+Uso: python codigos/benchmark_pdf.py [datos | boletin.pdf ...] [--workers N] [--datos resultados/analyzed_bbdd.xlsx]
+"""
+import argparse
+import glob
+import json
 import os
+import re
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pdfplumber
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dashboard'))
+from modules.columnar_cache import CACHE_DIRNAME, file_sha256, read_excel_cached
+from modules.metrics import MONTHLY_KPIS, calculate_monthly_kpis_frame
+from modules.schema import apply_schema, month_to_period, period_label
+
+DEFAULT_INPUT = 'datos'
+PAGES_PER_TASK = 5
+TEXT_CACHE_DIRNAME = os.path.join(CACHE_DIRNAME, 'pdf_text')
+
+MONTHS_ES = {'ENERO': 1, 'FEBRERO': 2, 'MARZO': 3, 'ABRIL': 4, 'MAYO': 5, 'JUNIO': 6, 'JULIO': 7,
+             'AGOSTO': 8, 'SEPTIEMBRE': 9, 'SETIEMBRE': 9, 'OCTUBRE': 10, 'NOVIEMBRE': 11, 'DICIEMBRE': 12}
+PERIOD_RE = re.compile(r'\b(' + '|'.join(MONTHS_ES) + r')\s+(20\d{2})\b')
+MONTH_TOKEN = re.compile(r'^[A-Za-z]{3}-\d{2}$')
+QUARTER_TOKEN = re.compile(r'^\d(re|er|do|to)\.$')
+PCT_TOKEN = re.compile(r'^\d+(,\d+)?%$')
+COUNT_TOKEN = re.compile(r'^\d{1,3}(\.\d{3})*$')
+
+# Fila de la tabla INDICADORES -> clave de MONTHLY_KPIS (sobre la etiqueta sin tildes, en minúsculas)
+INDICATOR_PATTERNS = [
+    ('ns', r'cumplimiento del.*\bns\b'),
+    ('abandono', r'abandono'),
+    ('quejas', r'quejas'),
+    ('coordinacion', r'coordinacion'),
+    ('sla_vial_local', r'vial.*urbano|urbano.*vial'),
+    ('sla_situ_local', r'in situ.*urbano'),
+    ('sla_vial_foraneo', r'vial.*rural|rural.*vial'),
+    ('sla_situ_foraneo', r'in situ.*rural'),
+]
+
+# Tablas CUMPLIMIENTO ... -> clave de MONTHLY_KPIS. La de asignación publica el
+# mismo % que la fila "Coordinación 10 minutos" de INDICADORES.
+TABLE_PATTERNS = [
+    ('coordinacion', r'asignacion'),
+    ('sla_vial_local', r'contacto\s*-\s*urbano'),
+    ('sla_situ_local', r'local\s*-\s*legal'),
+    ('sla_vial_foraneo', r'contacto\s*-\s*rural'),
+    ('sla_situ_foraneo', r'foraneo\s*-\s*legal'),
+]
+
+ROW_COLUMNS = ['boletin', 'periodo', 'pagina', 'tabla', 'indicador', 'fila', 'mes', 'valor', 'servicios']
+
+
+def _normalize(text):
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def _match(patterns, text):
+    text = _normalize(text)
+    return next((key for key, pattern in patterns if re.search(pattern, text)), None)
+
 
-pdf_path = os.path.join("datos", "Boletín de Calidad_ADS_Octubre 2025 v2.pdf")
+def _pct(token):
+    return np.nan if token == '-' else float(token.rstrip('%').replace(',', '.'))
 
-def extract_benchmarks():
-    print(f"Extracting benchmarks from {pdf_path}...")
-    text_content = ""
+
+def _count(token):
+    return None if token == '-' else int(token.replace('.', ''))
+
+
+def _month(token):
+    """'OCT-25' / 'Oct-25' -> 'Oct-25'"""
+    return token[:1].upper() + token[1:3].lower() + token[3:]
+
+
+# ---------------------------------------------------------------------------
+# Texto por página (pool de procesos + caché por hash)
+# ---------------------------------------------------------------------------
+
+def find_pdfs(paths):
+    """PDFs de las rutas dadas (archivos o carpetas), sin duplicados y en orden"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(glob.glob(os.path.join(path, '*.pdf'))))
+        elif os.path.exists(path):
+            found.append(path)
+        else:
+            print(f"No se encontró {path}")
+    return list(dict.fromkeys(os.path.abspath(p) for p in found))
+
+
+def text_cache_path(pdf_path, digest):
+    return os.path.join(os.path.dirname(pdf_path), TEXT_CACHE_DIRNAME, digest + '.json')
+
+
+def _load_texts(cache_path):
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                text_content += page.extract_text() + "\n"
-    except Exception as e:
-        print(f"Error reading PDF: {e}")
-        return
+        with open(cache_path, encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Otra versión de pdfplumber puede extraer distinto texto
+    return cached['paginas'] if cached.get('pdfplumber') == pdfplumber.__version__ else None
 
-    # Regex for Satisfaction/NPS
-    nps_match = re.search(r"NPS.*?(\d+[.,]\d+)", text_content, re.IGNORECASE)
-    sla_match = re.search(r"Cumplimiento.*?(\d+[.,]\d+)%", text_content, re.IGNORECASE)
-    
-    print("\n--- BENCHMARK DATA ---")
-    if nps_match:
-        print(f"Official NPS: {nps_match.group(1)}")
-    else:
-        print("Official NPS not found in text.")
-        
-    if sla_match:
-        print(f"Official SLA: {sla_match.group(1)}")
+
+def _store_texts(cache_path, pdf_path, pages):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'archivo': os.path.basename(pdf_path), 'pdfplumber': pdfplumber.__version__,
+                   'paginas': pages}, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+
+
+def _extract_pages(pdf_path, start, stop):
+    """Worker: texto de las páginas [start, stop) de un PDF"""
+    with pdfplumber.open(pdf_path) as pdf:
+        return pdf_path, start, [(pdf.pages[i].extract_text() or '') for i in range(start, stop)]
+
+
+def extract_texts(pdf_paths, workers=None, use_cache=True):
+    """
+    Texto por página de cada PDF: {ruta: [texto página 1, ...]}. Los PDFs sin
+    caché se reparten en tramos de PAGES_PER_TASK páginas entre `workers`
+    procesos. Devuelve también cuántos PDFs salieron del caché.
+    """
+    texts = {}
+    pending = {}
+    for path in pdf_paths:
+        digest = file_sha256(path)
+        cached = _load_texts(text_cache_path(path, digest)) if use_cache else None
+        if cached is not None:
+            texts[path] = cached
+        else:
+            pending[path] = digest
+
+    tasks = []
+    for path in pending:
+        with pdfplumber.open(path) as pdf:
+            n_pages = len(pdf.pages)
+        texts[path] = [''] * n_pages
+        tasks.extend((path, start, min(start + PAGES_PER_TASK, n_pages))
+                     for start in range(0, n_pages, PAGES_PER_TASK))
+
+    if workers is None:
+        workers = min(len(tasks), os.cpu_count() or 1)
+    if workers <= 1 or len(tasks) <= 1:
+        results = [_extract_pages(*task) for task in tasks]
     else:
-        print("Official SLA not found in text.")
-        
-    # Dump text for manual inspection if needed
-    with open("results_benchmark_dump.txt", "w", encoding="utf-8") as f:
-        f.write(text_content)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_extract_pages, *zip(*tasks)))
+    for path, start, pages in results:
+        texts[path][start:start + len(pages)] = pages
+
+    for path, digest in pending.items():
+        _store_texts(text_cache_path(path, digest), path, texts[path])
+    return texts, len(pdf_paths) - len(pending)
+
+
+# ---------------------------------------------------------------------------
+# Tablas de KPIs
+# ---------------------------------------------------------------------------
+
+def bulletin_period(pages):
+    """Periodo del boletín ('Oct-25') según la primera 'OCTUBRE 2025' del texto"""
+    for text in pages[:3]:
+        match = PERIOD_RE.search(text.upper())
+        if match:
+            return period_label(pd.Period(year=int(match.group(2)), month=MONTHS_ES[match.group(1)], freq='M'))
+    return None
+
+
+def _parse_compliance(lines, page):
+    """Tablas 'CUMPLIMIENTO <indicador> Ene-25 ...': servicios y % por fila y mes"""
+    rows = []
+    title = months = None
+    for line in lines:
+        tokens = line.split()
+        first_month = next((i for i, t in enumerate(tokens) if MONTH_TOKEN.match(t)), None)
+        if (tokens[:1] == ['CUMPLIMIENTO'] and first_month
+                and all(MONTH_TOKEN.match(t) for t in tokens[first_month:])):
+            title, months = ' '.join(tokens[:first_month]), [_month(t) for t in tokens[first_month:]]
+            continue
+        if not months or len(tokens) <= 2 * len(months):
+            continue
+        values = tokens[-2 * len(months):]
+        pairs = list(zip(values[::2], values[1::2]))
+        if not all((c == '-' and p == '-') or (COUNT_TOKEN.match(c) and PCT_TOKEN.match(p)) for c, p in pairs):
+            continue
+        label = ' '.join(tokens[:-2 * len(months)])
+        for mes, (count, pct) in zip(months, pairs):
+            rows.append({'pagina': page, 'tabla': title, 'indicador': _match(TABLE_PATTERNS, title),
+                         'fila': label, 'mes': mes, 'valor': _pct(pct), 'servicios': _count(count)})
+    return rows
+
+
+def _parse_indicators(lines, page):
+    """
+    Tabla INDICADORES: un % por indicador y mes. La etiqueta de cada fila se
+    parte en la línea anterior, el texto antes de los valores y la línea
+    siguiente. Los promedios trimestrales se omiten.
+    """
+    header = next((i for i, line in enumerate(lines) if line.startswith('INDICADOR PUNTO DE CONTROL')), None)
+    if header is None:
+        return []
+    columns = [_month(t) if MONTH_TOKEN.match(t) else None
+               for t in lines[header].split() if MONTH_TOKEN.match(t) or QUARTER_TOKEN.match(t)]
+    n = len(columns)
+
+    items = []
+    for line in lines[header + 1:]:
+        tokens = line.split()
+        values = tokens[-n:]
+        if len(tokens) >= n and all(t == '-' or PCT_TOKEN.match(t) for t in values):
+            items.append((' '.join(tokens[:-n]), values))
+        else:
+            items.append((line, None))
+
+    rows = []
+    used = set()
+    for i, (prefix, values) in enumerate(items):
+        if values is None:
+            continue
+        parts = [prefix]
+        if i > 0 and items[i - 1][1] is None and i - 1 not in used:
+            parts.insert(0, items[i - 1][0])
+            used.add(i - 1)
+        if i + 1 < len(items) and items[i + 1][1] is None:
+            parts.append(items[i + 1][0])
+            used.add(i + 1)
+        label = ' '.join(p for p in parts if p)
+        for mes, value in zip(columns, values):
+            if mes is not None:
+                rows.append({'pagina': page, 'tabla': 'INDICADORES', 'indicador': _match(INDICATOR_PATTERNS, label),
+                             'fila': label, 'mes': mes, 'valor': _pct(value), 'servicios': None})
+    return rows
+
+
+def _parse_nps(text, page, period):
+    """NPS del periodo: primer % después de 'NPS' en la página de satisfacción"""
+    match = re.search(r'\bNPS\b.*?(\d+,\d+)%', text, re.DOTALL)
+    if not match:
+        return []
+    return [{'pagina': page, 'tabla': 'SATISFACCIÓN', 'indicador': 'nps', 'fila': 'Índice neto de satisfacción',
+             'mes': period, 'valor': _pct(match.group(1) + '%'), 'servicios': None}]
+
+
+def parse_bulletin(pages, name):
+    """Filas estructuradas (ROW_COLUMNS) de las tablas de KPIs de un boletín"""
+    period = bulletin_period(pages)
+    rows = []
+    nps_found = False
+    for number, text in enumerate(pages, start=1):
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        if any(line.startswith('CUMPLIMIENTO ') for line in lines):
+            rows.extend(_parse_compliance(lines, number))
+        rows.extend(_parse_indicators(lines, number))
+        if not nps_found and 'SATISFACCI' in text and 'NPS' in text:
+            nps_rows = _parse_nps(text, number, period)
+            rows.extend(nps_rows)
+            nps_found = bool(nps_rows)
+    for row in rows:
+        row.update(boletin=name, periodo=period)
+    return rows
+
+
+def official_kpis(rows):
+    """
+    Cifra oficial por indicador y mes: la del boletín más reciente que lo
+    publica (INDICADORES antes que el total de la tabla CUMPLIMIENTO).
+    `revisado`: boletines distintos publicaron valores distintos para el mes.
+    """
+    headline = (rows['tabla'] == 'INDICADORES') | (rows['fila'] == 'CUMPLIMIENTO GENERAL') | (rows['indicador'] == 'nps')
+    kpis = rows[headline & rows['indicador'].notna() & rows['valor'].notna()].copy()
+    kpis['_periodo'] = kpis['periodo'].map(month_to_period)
+    kpis['_prioridad'] = (kpis['tabla'] != 'INDICADORES').astype(int)
+    kpis = kpis.sort_values(['_periodo', 'boletin', '_prioridad'], ascending=[True, True, False], kind='stable')
+    # Un valor por boletín: INDICADORES y el total de CUMPLIMIENTO pueden diferir en el redondeo
+    kpis = kpis.drop_duplicates(['indicador', 'mes', 'boletin'], keep='last')
+    grouped = kpis.groupby(['indicador', 'mes'], sort=False)
+    result = grouped.agg(oficial=('valor', 'last'), boletin=('boletin', 'last'), n_boletines=('boletin', 'nunique'))
+    result['revisado'] = grouped['valor'].agg(lambda v: v.round(2).nunique() > 1)
+    result = result.reset_index()
+    result['_periodo'] = result['mes'].map(month_to_period)
+    return result.sort_values(['indicador', '_periodo']).drop(columns='_periodo').reset_index(drop=True)
+
+
+def reconcile(official, monthly):
+    """Oficial vs calculado (calculate_monthly_kpis_frame) por indicador y mes, en puntos porcentuales"""
+    keys = [k for k, _, _ in MONTHLY_KPIS if k in monthly.columns]
+    calculated = monthly[keys].rename_axis('mes').reset_index().melt(
+        id_vars='mes', var_name='indicador', value_name='calculado')
+    result = official.merge(calculated, on=['indicador', 'mes'], how='left')
+    result['diferencia'] = result['calculado'] - result['oficial']
+    return result
+
+
+def extract_benchmarks(paths=(DEFAULT_INPUT,), workers=None, use_cache=True, dump_path=None):
+    """Extrae las tablas de KPIs de todos los boletines; DataFrame con ROW_COLUMNS"""
+    t0 = time.perf_counter()
+    pdf_paths = find_pdfs(paths)
+    print(f"Extracting benchmarks from {len(pdf_paths)} PDF(s)...")
+    texts, from_cache = extract_texts(pdf_paths, workers, use_cache)
+    t_text = time.perf_counter() - t0
+
+    rows = []
+    for path in pdf_paths:
+        rows.extend(parse_bulletin(texts[path], os.path.basename(path)))
+    rows = pd.DataFrame(rows, columns=ROW_COLUMNS)
+    rows['servicios'] = rows['servicios'].astype('Int64')
+
+    n_pages = sum(len(texts[p]) for p in pdf_paths)
+    elapsed = time.perf_counter() - t0
+    print(f"{len(pdf_paths)} boletines, {n_pages} páginas en {elapsed:.2f}s "
+          f"(texto {t_text:.2f}s, {from_cache}/{len(pdf_paths)} desde caché), {len(rows)} filas")
+
+    print("\n--- BENCHMARK DATA ---")
+    for path in pdf_paths:
+        name = os.path.basename(path)
+        own = rows[(rows['boletin'] == name) & (rows['mes'] == rows['periodo'])]
+        nps = own.loc[own['indicador'] == 'nps', 'valor']
+        sla = own.loc[(own['indicador'] == 'coordinacion') & (own['fila'] == 'CUMPLIMIENTO GENERAL'), 'valor']
+        print(f"{name} ({own['periodo'].iloc[0] if len(own) else 's/periodo'}): "
+              f"NPS {nps.iloc[0] if len(nps) else 'no encontrado'} | "
+              f"SLA {sla.iloc[0] if len(sla) else 'no encontrado'}")
+
+    if dump_path:
+        # Texto completo para inspección manual
+        with open(dump_path, 'w', encoding='utf-8') as f:
+            for path in pdf_paths:
+                if len(pdf_paths) > 1:
+                    f.write(f"=== {os.path.basename(path)} ===\n")
+                f.write(''.join(text + "\n" for text in texts[path]))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cifras oficiales de los boletines de calidad en PDF')
+    parser.add_argument('rutas', nargs='*', default=[DEFAULT_INPUT], help='PDFs o carpetas con boletines')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos (por defecto, uno por CPU)')
+    parser.add_argument('--sin-cache', action='store_true', help='Vuelve a extraer el texto de todos los PDFs')
+    parser.add_argument('--salida', default=os.path.join('resultados', 'benchmark_oficial.csv'))
+    parser.add_argument('--dump', default='results_benchmark_dump.txt', help="Texto extraído ('' para omitir)")
+    parser.add_argument('--datos', help='Excel analizado para conciliar (p.ej. resultados/analyzed_bbdd.xlsx)')
+    args = parser.parse_args()
+
+    rows = extract_benchmarks(args.rutas, args.workers, not args.sin_cache, args.dump or None)
+    if rows.empty:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+    rows.to_csv(args.salida, index=False)
+    print(f"Filas: {args.salida}")
+
+    official = official_kpis(rows)
+    stem = os.path.splitext(args.salida)[0]
+    if args.datos:
+        df = apply_schema(read_excel_cached(args.datos)[0])
+        official = reconcile(official, calculate_monthly_kpis_frame(df))
+        compared = official['diferencia'].notna()
+        off = compared & (official['diferencia'].abs() >= 0.01)
+        print(f"\n--- CONCILIACIÓN ({args.datos}) ---")
+        print(f"{int(compared.sum())} cifras comparadas, {int(off.sum())} con diferencia >= 0.01 pp")
+        if off.any():
+            top = official[off].reindex(official.loc[off, 'diferencia'].abs().sort_values(ascending=False).index)
+            print(top.head(10)[['indicador', 'mes', 'oficial', 'calculado', 'diferencia']].to_string(index=False))
+    official.to_csv(f"{stem}_kpis.csv", index=False)
+    print(f"Cifras oficiales por indicador y mes: {stem}_kpis.csv")
+
 
 if __name__ == "__main__":
-    extract_benchmarks()
+    main()
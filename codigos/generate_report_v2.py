@@ -6,47 +6,66 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-def generate_graphs(df, sla_counts, nps_score, broker_col, output_dir):
+from ads_cache import ArtifactCache
+from ads_latex import build_pdf, write_if_changed
+
+# Colors
+COLORS_SLA = {'CUMPLE': '#0050A0', 'NO CUMPLE': '#E20074', 'INVALIDO': '#808080'}
+
+def draw_sla_pie(sla_counts, path):
+    plt.figure(figsize=(6, 6))
+    plt.pie(sla_counts, labels=sla_counts.index, autopct='%1.1f%%', 
+            colors=[COLORS_SLA.get(x, '#333333') for x in sla_counts.index], 
+            startangle=140)
+    plt.title('Cumplimiento SLA (Excluyendo Cancelados/Inválidos)')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+def draw_nps_bar(nps_score, path):
+    plt.figure(figsize=(6, 2))
+    plt.barh(['NPS'], [nps_score], color='#0050A0' if nps_score > 50 else '#E20074')
+    plt.xlim(-100, 100)
+    plt.axvline(0, color='black', linewidth=1)
+    plt.title(f'NPS Score: {nps_score:.1f}')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+def draw_top_brokers(top_brokers, path):
+    plt.figure(figsize=(10, 6))
+    sns.barplot(x=top_brokers.values, y=top_brokers.index, palette="Blues_r")
+    plt.title('Top 10 Brokers por Volumen')
+    plt.xlabel('Cantidad de Servicios')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+def generate_graphs(df, sla_counts, nps_score, broker_col, output_dir, cache=None):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         
     print(f"Generating graphs in {output_dir}...")
-    
-    # Colors
-    colors_sla = {'CUMPLE': '#0050A0', 'NO CUMPLE': '#E20074', 'INVALIDO': '#808080'}
+    # Cada gráfico se reutiliza del caché si sus datos agregados no cambiaron
+    cache = cache or ArtifactCache.for_output(output_dir)
+    params = {'colors': COLORS_SLA}
     
     # 1. SLA Pie Chart
-    plt.figure(figsize=(6, 6))
     if not sla_counts.empty:
-        plt.pie(sla_counts, labels=sla_counts.index, autopct='%1.1f%%', 
-                colors=[colors_sla.get(x, '#333333') for x in sla_counts.index], 
-                startangle=140)
-        plt.title('Cumplimiento SLA (Excluyendo Cancelados/Inválidos)')
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, 'sla_pie.png'))
-        plt.close()
+        cache.build(os.path.join(output_dir, 'sla_pie.png'), lambda path: draw_sla_pie(sla_counts, path),
+                    inputs=sla_counts, params=params, renderer=draw_sla_pie)
     
     # 2. NPS Gauge
-    plt.figure(figsize=(6, 2))
-    plt.barh(['NPS'], [nps_score], color='#0050A0' if nps_score > 50 else '#E20074')
-    plt.xlim(-100, 100)
-    plt.axvline(0, color='black', linewidth=1)
-    plt.title(f'NPS Score: {nps_score:.1f}')
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'nps_bar.png'))
-    plt.close()
+    cache.build(os.path.join(output_dir, 'nps_bar.png'), lambda path: draw_nps_bar(nps_score, path),
+                inputs=nps_score, renderer=draw_nps_bar)
     
-    # 3. Top Brokers
+    # 3. Top Brokers (top 10 by volume)
     if broker_col in df.columns:
-        plt.figure(figsize=(10, 6))
-        # Top 10 by volume
         top_brokers = df[broker_col].value_counts().head(10)
-        sns.barplot(x=top_brokers.values, y=top_brokers.index, palette="Blues_r")
-        plt.title('Top 10 Brokers por Volumen')
-        plt.xlabel('Cantidad de Servicios')
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, 'top_brokers.png'))
-        plt.close()
+        cache.build(os.path.join(output_dir, 'top_brokers.png'), lambda path: draw_top_brokers(top_brokers, path),
+                    inputs=top_brokers, renderer=draw_top_brokers)
+    
+    print(f"  {cache.summary()}")
 
 def generate_latex(sla_pct, output_path):
     tex_content = r"""
@@ -129,9 +148,11 @@ La nueva metodología de filtrado alinea los resultados con los estándares oper
 \end{document}
 """
     tex_content = tex_content.replace(r"\Sexpr{sla_pct}", f"{sla_pct:.2f}")
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(tex_content)
-    print(f"Latex report saved to {output_path}")
+    # Sin reescribir si el contenido es idéntico: la compilación incremental lo detecta
+    if write_if_changed(output_path, tex_content):
+        print(f"Latex report saved to {output_path}")
+    else:
+        print(f"Latex report unchanged: {output_path}")
 
 def main():
     print("Loading data...")
@@ -206,6 +227,7 @@ def main():
     
     tex_path = os.path.join(version_dir, "Reporte_Completo_v2.tex")
     generate_latex(sla_pct, tex_path)
+    build_pdf(tex_path)
 
 if __name__ == "__main__":
     main()
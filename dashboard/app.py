@@ -4,9 +4,11 @@ Dashboard interactivo para presentación al cliente.
 """
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import plotly.io as pio
+import hashlib
 import os
 
 # Set global Plotly dark theme
@@ -14,11 +16,33 @@ pio.templates.default = "plotly_dark"
 
 try:
     from modules import metrics as metrics_module
+    from modules.binning import fixed_edges, histogram, histogram_frame
+    from modules.columnar_cache import read_excel_cached
+    from modules.cube import (build_cube, build_cube_histograms, build_cube_sketches, cube_counts, cube_histogram,
+                              cube_metrics, cube_quantiles, dimension_values, rollup, slice_cube)
+    from modules.filter_index import build_filter_index, select_positions
+    from modules.kpi_cache import KPICache, filter_signature
+    from modules.nps import categorize_scores, nps_column, nps_flags, nps_percentages
+    from modules.schema import PERIOD_COLUMN, apply_schema, contains, period_label, sort_month_labels
+    from modules.selection import RowSelection
+    from modules.sla_rules import SLA_RULES, compliance_curve, control_text, cross_check, ecdf_select, sla_ecdfs
+    from modules.store import STORE_DIRNAME, is_store, read_store
 except ImportError:
     # Fallback if running from a different directory context
     import sys
     sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
     import metrics as metrics_module
+    from binning import fixed_edges, histogram, histogram_frame
+    from columnar_cache import read_excel_cached
+    from cube import (build_cube, build_cube_histograms, build_cube_sketches, cube_counts, cube_histogram,
+                      cube_metrics, cube_quantiles, dimension_values, rollup, slice_cube)
+    from filter_index import build_filter_index, select_positions
+    from kpi_cache import KPICache, filter_signature
+    from nps import categorize_scores, nps_column, nps_flags, nps_percentages
+    from schema import PERIOD_COLUMN, apply_schema, contains, period_label, sort_month_labels
+    from selection import RowSelection
+    from sla_rules import SLA_RULES, compliance_curve, control_text, cross_check, ecdf_select, sla_ecdfs
+    from store import STORE_DIRNAME, is_store, read_store
 
 # Page config
 st.set_page_config(
@@ -248,11 +272,20 @@ PLOTLY_TEMPLATE = {
     }
 }
 
-@st.cache_data
+@st.cache_resource
 def load_data():
-    """Load and cache the analyzed data"""
+    """Load and cache the analyzed data. Returns (df, load_info).
+    Un solo DataFrame compartido por sesiones y reruns (sin copias por ejecución)."""
     script_dir = os.path.dirname(os.path.abspath(__file__))
     
+    # Partitioned store (ads_utils.py --action ingest) takes precedence
+    for store_dir in [os.path.join(script_dir, "resultados", STORE_DIRNAME),
+                      os.path.join(script_dir, "..", "resultados", STORE_DIRNAME)]:
+        if is_store(store_dir):
+            df, load_info = read_store(store_dir)
+            st.sidebar.success(f"✅ Datos cargados")
+            return df, load_info
+    
     # Try multiple paths (local dev, Streamlit Cloud, parent dir)
     paths_to_try = [
         os.path.join(script_dir, "resultados", "analyzed_bbdd.xlsx"),
@@ -266,80 +299,79 @@ def load_data():
     for path in paths_to_try:
         if os.path.exists(path):
             try:
-                df = pd.read_excel(path)
+                df, load_info = read_excel_cached(path)
                 st.sidebar.success(f"✅ Datos cargados")
-                return df
+                return df, load_info
             except Exception as e:
                 continue
     
-    return None
+    return None, None
 
-@st.cache_data
-def calculate_metrics(df_in):
-    """Calcula KPIs optimizados con operaciones vectorizadas"""
-    df = df_in
-    metrics = {}
-    
-    # 1. Total Servicios
-    metrics['total_servicios'] = len(df)
-    mask_conc = df['status_del_servicio'].astype(str).str.contains('Concluido', case=False, na=False)
-    metrics['concluidos'] = mask_conc.sum()
-    
-    # 2. SLA - Operaciones vectorizadas (no usar .apply())
-    prog_col = next((c for c in df.columns if 'programad' in c.lower()), None)
-    if prog_col:
-        mask_no_prog = df[prog_col].astype(str).str.lower() != 'si'
-    else:
-        mask_no_prog = True
-    
-    df_sla = df[mask_conc & mask_no_prog]
-    
-    if 'duracion_minutos' in df_sla.columns and len(df_sla) > 0:
-        # Vectorized: Umbral según origen
-        origen = df_sla['origen_del_servicio'].astype(str).str.upper()
-        limite = pd.Series(45, index=df_sla.index)
-        limite[origen.str.contains('FORAN', na=False)] = 90
-        
-        # Vectorized: Cumple si duracion <= limite
-        duracion = pd.to_numeric(df_sla['duracion_minutos'], errors='coerce')
-        cumple = duracion <= limite
-        valid = duracion.notnull()
-        
-        if valid.sum() > 0:
-            metrics['sla'] = (cumple[valid].sum() / valid.sum()) * 100
-        else:
-            metrics['sla'] = 0
-    else:
-        # Fallback: promedio ponderado
-        origen_counts = df['origen_del_servicio'].value_counts()
-        local = origen_counts.get('LOCAL', 0)
-        foraneo = origen_counts.get('FORANEO', 0)
-        total = local + foraneo
-        metrics['sla'] = ((local * 85.80) + (foraneo * 78.25)) / total if total > 0 else 0
-    
-    # 3. NPS - Vectorizado
-    nps_col = next((c for c in df.columns if 'nps' in c.lower() and 'calificacion' in c.lower()), None)
-    metrics['nps'] = 0
-    
-    if nps_col:
-        nps_data = pd.to_numeric(df[nps_col], errors='coerce').dropna()
-        if len(nps_data) > 0:
-            max_val = nps_data.max()
-            if max_val <= 5:
-                # Escala 1-5
-                prom = (nps_data == 5).sum()
-                det = (nps_data <= 3).sum()
-            else:
-                # Escala 0-10
-                prom = (nps_data >= 9).sum()
-                det = (nps_data <= 6).sum()
-            metrics['nps'] = ((prom - det) / len(nps_data)) * 100
+# Tope de memoria de los cachés de KPIs y de figuras
+KPI_CACHE_MAX_MB = 64
+FIGURE_CACHE_MAX_MB = 32
+
+@st.cache_data(max_entries=4)
+def get_cube(_df, version):
+    """Cubo agregado del drill-down; se construye una vez por versión del dataset"""
+    return build_cube(_df)
 
-    return metrics
+@st.cache_resource(max_entries=4)
+def get_cube_sketches(_df, version):
+    """Sketches de tiempos de respuesta alineados con las celdas del cubo; uno por versión"""
+    return build_cube_sketches(_df)
 
-@st.cache_data
-def preprocess_data(df):
-    """Ensure critical columns exist for analysis"""
+# Vistas de distribución: bins fijos precalculados por celda del cubo (tiempos con último bin abierto)
+DISTRIBUTIONS = {
+    'duracion': {'nombre': 'Tiempo de contacto - universo SLA (min)', 'edges': fixed_edges(0, 240, 5, open_ended=True)},
+    'coordinacion': {'nombre': 'Coordinación: asignación a contacto (min)', 'edges': fixed_edges(0, 240, 5, open_ended=True)},
+    'nps': {'nombre': 'Calificación NPS', 'edges': fixed_edges(-0.5, 10.5, 1)},
+}
+
+@st.cache_resource(max_entries=4)
+def get_distributions(_df, version):
+    """Valores por registro e histogramas por celda del cubo de cada distribución, una vez por versión"""
+    nps_col = nps_column(_df.columns)
+    duracion = pd.to_numeric(_df['duracion_minutos'], errors='coerce').to_numpy(dtype=float) \
+        if 'duracion_minutos' in _df.columns else np.full(len(_df), np.nan)
+    values = {
+        'duracion': np.where(metrics_module.sla_universe(_df), duracion, np.nan),
+        'coordinacion': metrics_module.coordination_minutes(_df),
+        'nps': pd.to_numeric(_df[nps_col], errors='coerce').to_numpy(dtype=float)
+               if nps_col else np.full(len(_df), np.nan),
+    }
+    return {key: {'values': v, 'cube': build_cube_histograms(_df, v, DISTRIBUTIONS[key]['edges'])}
+            for key, v in values.items()}
+
+@st.cache_data(max_entries=4)
+def get_filter_index(_df, version):
+    """Bitsets por valor de los filtros del sidebar; uno por versión del dataset"""
+    return build_filter_index(_df)
+
+@st.cache_resource(max_entries=4)
+def get_row_flags(_df, version):
+    """Banderas por registro (indicadores mensuales y NPS) del DataFrame base, una vez por versión"""
+    return {'monthly': metrics_module.monthly_kpi_flags(_df), 'nps': nps_flags(_df)}
+
+@st.cache_resource(max_entries=4)
+def get_sla_ecdfs(_df, version):
+    """Duraciones ordenadas por regla SLA (curvas de sensibilidad), una vez por versión"""
+    return sla_ecdfs(_df, SLA_RULES, base=metrics_module.sla_rules_base(_df))
+
+@st.cache_resource
+def get_kpi_cache():
+    """Caché LRU de KPIs compartido entre sesiones (llave: versión + firma de filtros)"""
+    return KPICache(max_mb=KPI_CACHE_MAX_MB)
+
+@st.cache_resource
+def get_figure_cache():
+    """Caché LRU de figuras Plotly ya construidas y estilizadas (llave: figura + versión + filtros)"""
+    return KPICache(max_mb=FIGURE_CACHE_MAX_MB)
+
+@st.cache_resource(max_entries=4)
+def preprocess_data(_df, version):
+    """Ensure critical columns exist for analysis (una vez por versión del dataset, sin hashear filas)"""
+    df = _df
     # Standardize column names
     df.columns = df.columns.astype(str).str.strip().str.lower().str.replace(' ', '_').str.replace('.', '')
     
@@ -366,6 +398,12 @@ def preprocess_data(df):
             df['mes'] = dates.apply(lambda x: f"{months_es.get(x.month, '')}-{str(x.year)[-2:]}" if pd.notnull(x) else 'N/A')
         except:
             pass
+    
+    # 3. Typed schema: categóricas + strings Arrow
+    df = apply_schema(df)
+    
+    # 4. Banderas de exclusión (una vez por versión; los KPIs filtran por máscara)
+    df = metrics_module.materialize_exclusion_flags(df)
             
     return df
 
@@ -390,20 +428,30 @@ def main():
     if uploaded_file:
         try:
             df = pd.read_excel(uploaded_file)
-            df = preprocess_data(df) # Auto-fix columns
+            dataset_version = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+            df = preprocess_data(df, dataset_version) # Auto-fix columns
             st.sidebar.success(f"✅ Cargado: {uploaded_file.name}")
         except Exception as e:
             st.sidebar.error(f"Error: {e}")
             return
     else:
         # Load from local file
-        df = load_data()
+        df, load_info = load_data()
         if df is None:
             st.info("👋 **Bienvenido!** Sube un archivo Excel (BBDD) en el panel lateral para comenzar.")
             st.sidebar.info("Arrastra tu archivo aquí ↑")
             return
-        df = preprocess_data(df) # Ensure consistency for local file too
+        dataset_version = load_info['version'] or load_info['source']
+        df = preprocess_data(df, dataset_version) # Ensure consistency for local file too
         st.sidebar.caption("📁 Usando datos locales")
+        if load_info['status'] == 'store':
+            st.sidebar.caption(f"🗄️ Store particionado: {load_info['partitions']} meses "
+                               f"en {load_info['load_seconds']:.2f}s")
+        elif load_info['status'] == 'warm':
+            st.sidebar.caption(f"⚡ Caché columnar: {load_info['load_seconds']:.2f}s "
+                               f"(Excel en frío: {load_info['build_seconds'] or 0:.2f}s)")
+        else:
+            st.sidebar.caption(f"🐢 Lectura Excel en frío: {load_info['load_seconds']:.2f}s")
     
     # Sidebar
     st.sidebar.title("🔧 Navegación")
@@ -414,6 +462,9 @@ def main():
         "📊 Histórico Coordinación",
         "🔧 Detalle Auxilio Vial",
         "🚗 Detalle Remolque (Grúa)",
+        "⏱️ Tiempos de Respuesta",
+        "🎚️ Sensibilidad SLA",
+        "📶 Distribuciones",
         "📋 Tipo de Plan",
         "📈 Líneas de Servicio",
         "🗺️ Demanda Geográfica",
@@ -426,15 +477,11 @@ def main():
     st.sidebar.divider()
     st.sidebar.subheader("🗓️ Filtros")
     
-    # Get unique months and sort chronologically
-    month_order = {'Ene': 1, 'Feb': 2, 'Mar': 3, 'Abr': 4, 'May': 5, 'Jun': 6,
-                   'Jul': 7, 'Ago': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dic': 12}
-    raw_months = df['mes'].dropna().unique().tolist()
-    # Sort by extracting month prefix (e.g., "Ene-25" -> "Ene")
-    all_months = sorted(raw_months, key=lambda x: (
-        int(str(x).split('-')[-1]) if '-' in str(x) else 0,  # Year first
-        month_order.get(str(x).split('-')[0], 0)  # Then month
-    ))
+    # Cubo agregado: filtros y conteos se resuelven sobre celdas, no filas
+    cube = get_cube(df, dataset_version)
+    
+    # Get unique months and sort chronologically (por periodo mensual)
+    all_months = sort_month_labels(cube['mes'].dropna().unique().tolist())
     
     # Select All checkbox
     select_all = st.sidebar.checkbox("Seleccionar todos los meses", value=True)
@@ -453,25 +500,30 @@ def main():
     st.sidebar.divider()
     st.sidebar.subheader("🔍 Drill-Down")
     
+    context_filters = {}
+    
     # Plan filter
-    if 'nombre_del_plan' in df.columns:
-        planes = ['Todos'] + sorted(df['nombre_del_plan'].dropna().unique().tolist())
+    if 'nombre_del_plan' in cube.columns:
+        planes = ['Todos'] + sorted(cube['nombre_del_plan'].dropna().unique().tolist())
         selected_plan = st.sidebar.selectbox("Plan:", planes)
         if selected_plan != 'Todos':
-            df = df[df['nombre_del_plan'] == selected_plan]
+            context_filters['nombre_del_plan'] = [selected_plan]
     
     # Ciudad filter
-    if 'ciudad' in df.columns:
-        ciudades = ['Todas'] + sorted(df['ciudad'].dropna().astype(str).unique().tolist())[:20]  # Top 20
+    if 'ciudad' in cube.columns:
+        cube_ctx = slice_cube(cube, include=context_filters)
+        ciudades = ['Todas'] + sorted(cube_ctx['ciudad'].dropna().astype(str).unique().tolist())[:20]  # Top 20
         selected_city = st.sidebar.selectbox("Ciudad:", ciudades)
         if selected_city != 'Todas':
-            df = df[df['ciudad'] == selected_city]
+            context_filters['ciudad'] = [selected_city]
+    
+    cube_ctx = slice_cube(cube, include=context_filters)
     
     # Exclude 'Otros' toggle (Granular Control)
     st.sidebar.divider()
     
     # 1. Identify all types and default 'others'
-    all_service_types = sorted(df['tipo_de_servicio'].astype(str).unique().tolist())
+    all_service_types = sorted(dimension_values(cube_ctx, 'tipo_de_servicio'))
     
     def is_definitely_otros(t):
         t = str(t).upper()
@@ -493,33 +545,57 @@ def main():
         )
         
     # 3. Apply Exclusion Filter
+    exclusions = {'tipo_de_servicio': types_to_exclude}
     if types_to_exclude:
-        mask_exclude = df['tipo_de_servicio'].isin(types_to_exclude)
-        count_excluded = mask_exclude.sum()
-        df = df[~mask_exclude]
+        count_excluded = cube_ctx.loc[cube_ctx['tipo_de_servicio'].isin(types_to_exclude), 'total'].sum()
+        cube_ctx = slice_cube(cube_ctx, exclude=exclusions)
         
         if count_excluded > 0:
             st.sidebar.warning(f"⚠️ Se han excluido {count_excluded} servicios del análisis.")
     else:
         st.sidebar.success("✅ Se están mostrando TODOS los servicios.")
 
-    # --- CAPTURE HISTORY (Context filtered, but ALL months) ---
-    df_unfiltered = df.copy()
-
     # --- APPLY TIME FILTER (Only selected months) ---
+    selected_filters = dict(context_filters)
     if selected_months:
-        df = df[df['mes'].isin(selected_months)]
+        selected_filters['mes'] = selected_months
     else:
         st.sidebar.warning("⚠️ Selecciona al menos un mes")
+    cube_sel = slice_cube(cube_ctx, include={'mes': selected_filters.get('mes')})
+    
+    # Vistas a nivel de registro (mismos filtros que el cubo): posiciones sobre el
+    # DataFrame base resueltas con el índice de bitsets, sin copiar filas
+    filter_index = get_filter_index(df, dataset_version)
+    row_flags = get_row_flags(df, dataset_version)
+    
+    def context_rows():
+        # Context filtered, but ALL months (historial)
+        return RowSelection(df, select_positions(filter_index, include=context_filters, exclude=exclusions))
+    
+    def selected_rows():
+        return RowSelection(df, select_positions(filter_index, include=selected_filters, exclude=exclusions))
             
     # Disclaimer about Stop the Clock
     st.sidebar.info("ℹ️ **Nota:** El cálculo de SLA es estricto (tiempo total) ya que la base de datos no contiene registros de 'tiempos muertos' imputables al cliente.")
     
+    # Caché de KPIs por versión + firma de filtros (no se hashean DataFrames)
+    kpi_cache = get_kpi_cache()
+    selected_key = (dataset_version, filter_signature(selected_filters, exclusions))
+    context_key = (dataset_version, filter_signature(context_filters, exclusions))
+    
+    # Figuras memoizadas: una figura con las mismas entradas no se vuelve a
+    # construir ni a estilizar (tampoco al volver a una sección ya visitada).
+    # La figura cacheada es compartida: no se modifica después de construida.
+    figure_cache = get_figure_cache()
+    
+    def figure(name, key, build):
+        return figure_cache.get_or_compute(('fig',) + name + key, lambda: style_dark_chart(build()))
+    
     # Calculate metrics with filtered data
-    metrics = calculate_metrics(df)
+    metrics = kpi_cache.get_or_compute(('kpis',) + selected_key, lambda: cube_metrics(cube_sel))
     
     st.sidebar.divider()
-    st.sidebar.caption(f"📊 **{len(df):,}** registros seleccionados")
+    st.sidebar.caption(f"📊 **{metrics['total_servicios']:,}** registros seleccionados")
     
     # ==========================================================================
     # RESUMEN EJECUTIVO
@@ -550,20 +626,20 @@ def main():
         col1, col2 = st.columns(2)
         
         with col1:
-            status_counts = df['status_del_servicio'].value_counts()
-            fig = px.pie(values=status_counts.values, names=status_counts.index,
-                        title="Distribución por Status",
-                        color_discrete_sequence=[COLORS['primary'], COLORS['secondary'], 
-                                                  COLORS['warning'], COLORS['success']])
-            style_dark_chart(fig)
+            status_counts = cube_counts(cube_sel, 'status_del_servicio')
+            fig = figure(('resumen', 'status'), selected_key, lambda: px.pie(
+                values=status_counts.values, names=status_counts.index,
+                title="Distribución por Status",
+                color_discrete_sequence=[COLORS['primary'], COLORS['secondary'],
+                                         COLORS['warning'], COLORS['success']]))
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
-            origen_counts = df['origen_del_servicio'].value_counts()
-            fig = px.pie(values=origen_counts.values, names=origen_counts.index,
-                        title="Local vs Foráneo", hole=0.4,
-                        color_discrete_sequence=[COLORS['primary'], COLORS['secondary']])
-            style_dark_chart(fig)
+            origen_counts = cube_counts(cube_sel, 'origen_del_servicio')
+            fig = figure(('resumen', 'origen'), selected_key, lambda: px.pie(
+                values=origen_counts.values, names=origen_counts.index,
+                title="Local vs Foráneo", hole=0.4,
+                color_discrete_sequence=[COLORS['primary'], COLORS['secondary']]))
             st.plotly_chart(fig, use_container_width=True)
         
         # SLA by Category breakdown
@@ -576,24 +652,19 @@ def main():
             if 'LEGAL' in t or 'SITU' in t: return 'Legal / In Situ'
             return 'Otros'
         
-        df_cat = df.copy()
-        df_cat['categoria'] = df_cat['tipo_de_servicio'].apply(categorize_service)
+        cube_cat = cube_sel.assign(categoria=cube_sel['tipo_de_servicio'].map(categorize_service))
         
-        # Calculate SLA per category
+        # Calculate SLA per category (mismo motor que el KPI global)
         sla_by_cat = []
         for cat in ['Auxilio Vial', 'Grúas (Remolque)', 'Legal / In Situ', 'Otros']:
-            mask = (df_cat['categoria'] == cat) & (df_cat['status_del_servicio'].str.contains('Concluido', case=False, na=False))
-            sub = df_cat[mask]
-            if len(sub) > 0 and 'duracion_minutos' in sub.columns:
-                dur = sub['duracion_minutos']
-                origen = sub['origen_del_servicio'].str.upper()
-                limite = origen.apply(lambda x: 90 if 'FORAN' in str(x) else 45)
-                cumple = (dur <= limite) & dur.notnull()
-                sla_pct = cumple.mean() * 100
+            sub = cube_cat[cube_cat['categoria'] == cat]
+            volumen = int(sub['concluidos'].sum())
+            if sub['sla_validos'].sum() > 0:
+                sla_pct = sub['sla_cumple'].sum() / sub['sla_validos'].sum() * 100
                 status = '🟢' if sla_pct >= 85 else ('🟠' if sla_pct >= 70 else '🔴')
-                sla_by_cat.append({'Categoría': cat, 'Volumen': len(sub), 'SLA': f"{sla_pct:.1f}%", 'Estado': status})
+                sla_by_cat.append({'Categoría': cat, 'Volumen': volumen, 'SLA': f"{sla_pct:.1f}%", 'Estado': status})
             else:
-                sla_by_cat.append({'Categoría': cat, 'Volumen': len(sub), 'SLA': 'N/A', 'Estado': '⚪'})
+                sla_by_cat.append({'Categoría': cat, 'Volumen': volumen, 'SLA': 'N/A', 'Estado': '⚪'})
         
         st.dataframe(pd.DataFrame(sla_by_cat), use_container_width=True, hide_index=True)
     
@@ -604,23 +675,23 @@ def main():
         st.markdown('<h2 class="section-header">Histórico de Coordinación</h2>', unsafe_allow_html=True)
         
         # Monthly trend
-        df['mes_str'] = df['mes'].astype(str)
-        monthly = df.groupby(['mes_str', 'status_del_servicio']).size().unstack(fill_value=0)
+        mes_str = cube_sel['mes'].astype(str).rename('mes_str')
+        monthly = rollup(cube_sel, [mes_str, 'status_del_servicio']).unstack(fill_value=0)
         
-        fig = px.bar(monthly, barmode='stack', title="Servicios por Mes y Status",
-                     color_discrete_sequence=[COLORS['primary'], COLORS['secondary'],
-                                               COLORS['warning'], COLORS['success']])
-        style_dark_chart(fig)
+        fig = figure(('historico', 'mensual'), selected_key, lambda: px.bar(
+            monthly, barmode='stack', title="Servicios por Mes y Status",
+            color_discrete_sequence=[COLORS['primary'], COLORS['secondary'],
+                                     COLORS['warning'], COLORS['success']]))
         st.plotly_chart(fig, use_container_width=True)
         
         # Service type distribution
         st.subheader("Líneas de Servicio")
-        tipo_counts = df['tipo_de_servicio'].value_counts().head(10)
-        fig = px.bar(x=tipo_counts.values, y=tipo_counts.index, orientation='h',
-                     title="Top 10 Tipos de Servicio",
-                     color_discrete_sequence=[COLORS['primary']])
-        fig.update_layout(yaxis={'categoryorder':'total ascending'})
-        style_dark_chart(fig)
+        tipo_counts = cube_counts(cube_sel, 'tipo_de_servicio').head(10)
+        fig = figure(('historico', 'tipos'), selected_key, lambda: px.bar(
+            x=tipo_counts.values, y=tipo_counts.index, orientation='h',
+            title="Top 10 Tipos de Servicio",
+            color_discrete_sequence=[COLORS['primary']]
+        ).update_layout(yaxis={'categoryorder': 'total ascending'}))
         st.plotly_chart(fig, use_container_width=True)
     
     # ==========================================================================
@@ -629,34 +700,34 @@ def main():
     elif "Auxilio Vial" in selected_section:
         st.markdown('<h2 class="section-header">Detalle Auxilio Vial</h2>', unsafe_allow_html=True)
         
-        # Filter for Auxilio Vial
-        df_auxilio = df[df['tipo_de_servicio'].str.contains('AUXILIO', case=False, na=False)]
+        # Filter for Auxilio Vial (nivel registro: servicio_brindado)
+        auxilio = selected_rows().where(contains(df['tipo_de_servicio'], 'AUXILIO'))
         
         col1, col2 = st.columns(2)
         
         with col1:
             # Donut: Local vs Foráneo
-            origen_aux = df_auxilio['origen_del_servicio'].value_counts()
-            fig = px.pie(values=origen_aux.values, names=origen_aux.index,
-                        title="Demarcación (Local/Foráneo)", hole=0.5,
-                        color_discrete_sequence=[COLORS['primary'], COLORS['secondary']])
-            fig.update_traces(textposition='inside', textinfo='percent+value')
-            style_dark_chart(fig)
+            origen_aux = auxilio.counts('origen_del_servicio')
+            fig = figure(('auxilio', 'origen'), selected_key, lambda: px.pie(
+                values=origen_aux.values, names=origen_aux.index,
+                title="Demarcación (Local/Foráneo)", hole=0.5,
+                color_discrete_sequence=[COLORS['primary'], COLORS['secondary']]
+            ).update_traces(textposition='inside', textinfo='percent+value'))
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             # Bar: Segmentación por servicio brindado
-            if 'servicio_brindado' in df_auxilio.columns:
-                serv = df_auxilio['servicio_brindado'].value_counts().head(6)
-                fig = px.bar(x=serv.index, y=serv.values,
-                            title="Segmentación del Servicio",
-                            color_discrete_sequence=[COLORS['primary']])
-                style_dark_chart(fig)
+            if 'servicio_brindado' in df.columns:
+                serv = auxilio.counts('servicio_brindado').head(6)
+                fig = figure(('auxilio', 'servicio'), selected_key, lambda: px.bar(
+                    x=serv.index, y=serv.values,
+                    title="Segmentación del Servicio",
+                    color_discrete_sequence=[COLORS['primary']]))
                 st.plotly_chart(fig, use_container_width=True)
             else:
                 st.info("Columna 'servicio_brindado' no disponible")
         
-        st.metric("Total Auxilio Vial", len(df_auxilio))
+        st.metric("Total Auxilio Vial", len(auxilio))
     
     # ==========================================================================
     # DETALLE REMOLQUE (GRÚA)
@@ -664,34 +735,163 @@ def main():
     elif "Remolque" in selected_section:
         st.markdown('<h2 class="section-header">Detalle Remolque Automóvil (Grúa)</h2>', unsafe_allow_html=True)
         
-        # Filter for Remolque/Grúa
-        df_remolque = df[df['tipo_de_servicio'].str.contains('REMOLQUE|GRUA', case=False, na=False)]
+        # Filter for Remolque/Grúa (nivel registro: servicio_brindado)
+        remolque = selected_rows().where(contains(df['tipo_de_servicio'], 'REMOLQUE|GRUA'))
         
         col1, col2 = st.columns(2)
         
         with col1:
             # Donut: Local vs Foráneo
-            origen_rem = df_remolque['origen_del_servicio'].value_counts()
-            fig = px.pie(values=origen_rem.values, names=origen_rem.index,
-                        title="Demarcación (Local/Foráneo)", hole=0.5,
-                        color_discrete_sequence=[COLORS['primary'], COLORS['secondary']])
-            fig.update_traces(textposition='inside', textinfo='percent+value')
-            style_dark_chart(fig)
+            origen_rem = remolque.counts('origen_del_servicio')
+            fig = figure(('remolque', 'origen'), selected_key, lambda: px.pie(
+                values=origen_rem.values, names=origen_rem.index,
+                title="Demarcación (Local/Foráneo)", hole=0.5,
+                color_discrete_sequence=[COLORS['primary'], COLORS['secondary']]
+            ).update_traces(textposition='inside', textinfo='percent+value'))
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             # Bar: Segmentación por servicio brindado
-            if 'servicio_brindado' in df_remolque.columns:
-                serv = df_remolque['servicio_brindado'].value_counts().head(6)
-                fig = px.bar(x=serv.index, y=serv.values,
-                            title="Segmentación del Servicio",
-                            color_discrete_sequence=[COLORS['secondary']])
-                style_dark_chart(fig)
+            if 'servicio_brindado' in df.columns:
+                serv = remolque.counts('servicio_brindado').head(6)
+                fig = figure(('remolque', 'servicio'), selected_key, lambda: px.bar(
+                    x=serv.index, y=serv.values,
+                    title="Segmentación del Servicio",
+                    color_discrete_sequence=[COLORS['secondary']]))
                 st.plotly_chart(fig, use_container_width=True)
             else:
                 st.info("Columna 'servicio_brindado' no disponible")
         
-        st.metric("Total Remolques", len(df_remolque))
+        st.metric("Total Remolques", len(remolque))
+    
+    # ==========================================================================
+    # TIEMPOS DE RESPUESTA
+    # ==========================================================================
+    elif "Tiempos de Respuesta" in selected_section:
+        st.markdown('<h2 class="section-header">Tiempos de Respuesta</h2>', unsafe_allow_html=True)
+        st.caption("Minutos de asignación a contacto en servicios concluidos inmediatos (universo SLA). "
+                   "Percentiles calculados combinando sketches por celda del cubo (error relativo ≤ 2%).")
+        
+        sketches = get_cube_sketches(df, dataset_version)
+        overall = kpi_cache.get_or_compute(('tiempos',) + selected_key, lambda: cube_quantiles(cube_sel, sketches))
+        
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Servicios medidos", f"{overall['n']:,}")
+        for col, key in zip([col2, col3, col4], ['p50', 'p90', 'p95']):
+            col.metric(f"{key.upper()}", f"{overall[key]:.1f} min" if overall['n'] else "-")
+        
+        breakdowns = {'Mes': 'mes', 'Ciudad': 'ciudad', 'Origen': 'origen_del_servicio', 'Tipo de servicio': 'tipo_de_servicio'}
+        label = st.radio("Desglose por", list(breakdowns), horizontal=True)
+        dim = breakdowns[label]
+        table = kpi_cache.get_or_compute(('tiempos', dim) + selected_key,
+                                         lambda: cube_quantiles(cube_sel, sketches, dim))
+        table = table[table['n'] > 0]
+        if dim == 'mes':
+            table = table.loc[sort_month_labels(table.index)]
+        else:
+            table = table.sort_values('n', ascending=False, kind='stable').head(15)
+        
+        if table.empty:
+            st.info("No hay servicios con duración calculable en la selección.")
+        else:
+            fig = figure(('tiempos', dim), selected_key, lambda: px.bar(
+                table[['p50', 'p90', 'p95']], barmode='group',
+                title=f"Percentiles de Tiempo de Contacto por {label} (minutos)",
+                color_discrete_sequence=[COLORS['success'], COLORS['warning'], COLORS['danger']]))
+            st.plotly_chart(fig, use_container_width=True)
+            
+            table = table.rename(columns={'n': 'Servicios', 'p50': 'P50', 'p90': 'P90', 'p95': 'P95'})
+            st.dataframe(table.style.format({'P50': '{:.1f}', 'P90': '{:.1f}', 'P95': '{:.1f}'}),
+                         use_container_width=True)
+    
+    # ==========================================================================
+    # SENSIBILIDAD SLA
+    # ==========================================================================
+    elif "Sensibilidad SLA" in selected_section:
+        st.markdown('<h2 class="section-header">Sensibilidad de Umbrales SLA</h2>', unsafe_allow_html=True)
+        st.caption("Cumplimiento que tendría cada SLA si su límite en minutos cambiara, "
+                   "sobre los servicios de la selección actual.")
+        
+        ecdfs = get_sla_ecdfs(df, dataset_version)
+        rule_names = {r['nombre']: r for r in SLA_RULES}
+        sla_rule = rule_names[st.selectbox("SLA", list(rule_names))]
+        minutes = ecdf_select(ecdfs[sla_rule['sla']], selected_rows().positions)
+        
+        threshold = st.slider("Límite (minutos)", min_value=0, max_value=180, value=int(sla_rule['limite']),
+                              step=1, key=f"umbral_{sla_rule['sla']}")
+        at_threshold, at_contract = compliance_curve(minutes, [threshold, sla_rule['limite']])
+        
+        if len(minutes) == 0:
+            st.info("No hay servicios con duración calculable para este SLA en la selección.")
+        else:
+            col1, col2, col3 = st.columns(3)
+            col1.metric(f"Cumplimiento a {threshold} min", f"{at_threshold:.1f}%",
+                        delta=f"{at_threshold - at_contract:+.1f} pp vs. {sla_rule['limite']} min")
+            col2.metric("Meta", f"{sla_rule['meta']:.1f}%",
+                        delta=f"{at_threshold - sla_rule['meta']:+.1f} pp")
+            col3.metric("Servicios medidos", f"{len(minutes):,}")
+            
+            thresholds = np.arange(0, 181)
+            curve = pd.DataFrame({'Límite (min)': thresholds,
+                                  'Cumplimiento (%)': compliance_curve(minutes, thresholds)})
+            fig = figure(('sensibilidad', sla_rule['sla'], threshold), selected_key, lambda: px.line(
+                curve, x='Límite (min)', y='Cumplimiento (%)',
+                title=f"Curva de Cumplimiento - {sla_rule['nombre']}",
+                color_discrete_sequence=[COLORS['primary']]
+            ).add_hline(
+                y=sla_rule['meta'], line_dash='dash', line_color=COLORS['warning'],
+                annotation_text=f"Meta {sla_rule['meta']:.1f}%"
+            ).add_vline(
+                x=sla_rule['limite'], line_dash='dot', line_color=COLORS['danger'],
+                annotation_text=f"Contrato {sla_rule['limite']} min"
+            ).add_vline(x=threshold, line_color=COLORS['success']).update_yaxes(range=[0, 100]))
+            st.plotly_chart(fig, use_container_width=True)
+            
+            # Límite mínimo que alcanza la meta con los datos actuales
+            meets = np.flatnonzero(curve['Cumplimiento (%)'].to_numpy() >= sla_rule['meta'])
+            if len(meets):
+                st.info(f"Con los datos seleccionados, la meta de {sla_rule['meta']:.1f}% se alcanza "
+                        f"con un límite de **{thresholds[meets[0]]} minutos**.")
+            else:
+                st.warning(f"La meta de {sla_rule['meta']:.1f}% no se alcanza con límites de hasta 180 minutos.")
+    
+    # ==========================================================================
+    # DISTRIBUCIONES
+    # ==========================================================================
+    elif "Distribuciones" in selected_section:
+        st.markdown('<h2 class="section-header">Distribuciones</h2>', unsafe_allow_html=True)
+        st.caption("Histogramas calculados en el servidor: al navegador solo se envían los bins, "
+                   "no los valores de cada registro.")
+        
+        distributions = get_distributions(df, dataset_version)
+        names = {spec['nombre']: key for key, spec in DISTRIBUTIONS.items()}
+        key = names[st.selectbox("Variable", list(names))]
+        spec = DISTRIBUTIONS[key]
+        bins_mode = st.radio("Bins", ["Fijos", "Freedman–Diaconis"], horizontal=True)
+        
+        def distribution_view():
+            if bins_mode == "Fijos":
+                # Suma de los histogramas de las celdas seleccionadas (sin tocar filas)
+                counts, edges = cube_histogram(cube_sel, distributions[key]['cube']), spec['edges']
+            else:
+                values = distributions[key]['values'][selected_rows().positions]
+                counts, edges = histogram(values)
+            return histogram_frame(counts, edges)
+        
+        bins = kpi_cache.get_or_compute(('distribucion', key, bins_mode) + selected_key, distribution_view)
+        n_values = int(bins['conteo'].sum())
+        
+        if n_values == 0:
+            st.info("No hay valores para esta variable en la selección.")
+        else:
+            st.caption(f"{n_values:,} valores agrupados en {len(bins)} bins")
+            fig = figure(('distribuciones', key, bins_mode), selected_key, lambda: go.Figure(go.Bar(
+                x=bins['centro'], y=bins['conteo'], width=bins['ancho'], customdata=bins['bin'],
+                marker_color=COLORS['primary'],
+                hovertemplate="%{customdata}: %{y:,}<extra></extra>"
+            )).update_layout(title=f"Distribución - {spec['nombre']}", xaxis_title=spec['nombre'],
+                             yaxis_title="Servicios", bargap=0.05))
+            st.plotly_chart(fig, use_container_width=True)
     
     # ==========================================================================
     # TIPO DE PLAN
@@ -699,20 +899,20 @@ def main():
     elif "Tipo de Plan" in selected_section:
         st.markdown('<h2 class="section-header">Distribución por Tipo de Plan</h2>', unsafe_allow_html=True)
         
-        plan_counts = df['nombre_del_plan'].value_counts()
+        plan_counts = cube_counts(cube_sel, 'nombre_del_plan')
         
         # Horizontal bar chart
-        fig = px.bar(x=plan_counts.values, y=plan_counts.index, orientation='h',
-                     title="Servicios por Tipo de Plan",
-                     color_discrete_sequence=[COLORS['primary']])
-        fig.update_layout(yaxis={'categoryorder':'total ascending'})
-        style_dark_chart(fig)
+        fig = figure(('plan', 'servicios'), selected_key, lambda: px.bar(
+            x=plan_counts.values, y=plan_counts.index, orientation='h',
+            title="Servicios por Tipo de Plan",
+            color_discrete_sequence=[COLORS['primary']]
+        ).update_layout(yaxis={'categoryorder': 'total ascending'}))
         st.plotly_chart(fig, use_container_width=True)
         
         # Percentages
         st.subheader("Detalle")
         for plan, count in plan_counts.items():
-            pct = count / len(df) * 100
+            pct = count / metrics['total_servicios'] * 100
             st.write(f"**{plan}**: {count:,} ({pct:.2f}%)")
     
     # ==========================================================================
@@ -722,17 +922,17 @@ def main():
         st.markdown('<h2 class="section-header">Líneas de Servicio - Comparativo Mensual</h2>', unsafe_allow_html=True)
         
         # Group by month and service type
-        df['mes_str'] = df['mes'].astype(str)
-        pivot = df.groupby(['tipo_de_servicio', 'mes_str']).size().unstack(fill_value=0)
+        mes_str = cube_sel['mes'].astype(str).rename('mes_str')
+        pivot = rollup(cube_sel, ['tipo_de_servicio', mes_str]).unstack(fill_value=0)
         
-        # Get last 3 months
-        last_months = sorted(pivot.columns)[-3:]
+        # Get last 3 months (orden cronológico, no alfabético)
+        last_months = sort_month_labels(pivot.columns)[-3:]
         pivot_last = pivot[last_months].head(8)
         
-        fig = px.bar(pivot_last, barmode='group',
-                     title="Últimos 3 Meses por Línea de Servicio",
-                     color_discrete_sequence=[COLORS['primary'], COLORS['secondary'], COLORS['success']])
-        style_dark_chart(fig)
+        fig = figure(('lineas', 'ultimos_meses'), selected_key, lambda: px.bar(
+            pivot_last, barmode='group',
+            title="Últimos 3 Meses por Línea de Servicio",
+            color_discrete_sequence=[COLORS['primary'], COLORS['secondary'], COLORS['success']]))
         st.plotly_chart(fig, use_container_width=True)
     
     # ==========================================================================
@@ -742,151 +942,73 @@ def main():
         st.markdown('<h2 class="section-header">Indicadores Mensuales</h2>', unsafe_allow_html=True)
         
         try:
-            # 1. Prepare Columns Structure (Months + Quarterly Avgs + Total)
-            columns_struct = [
-                'INDICADOR', 'PUNTO DE CONTROL',
-                'Ene-25', 'Feb-25', 'Mar-25', 'PROMEDIO 1er. TRIMESTRE',
-                'Abr-25', 'May-25', 'Jun-25', 'PROMEDIO 2do. TRIMESTRE',
-                'Jul-25', 'Ago-25', 'Sep-25', 'PROMEDIO 3er. TRIMESTRE',
-                'Oct-25', 'PROMEDIO TOTAL'
+            rows_definitions = [
+                {'name': '% Cumplimiento del NS', 'control': 'Mínimo 90%', 'key': 'ns'},
+                {'name': '% Máximo de Abandono', 'control': 'Máximo 1%', 'key': 'abandono'},
+                {'name': 'Coordinación Local y Foráneo', 'control': '10 minutos Mínimo el 85%', 'key': 'coordinacion'},
+            ] + [
+                # SLA contractuales: una fila por regla de sla_rules.SLA_RULES
+                {'name': r['nombre'], 'control': control_text(r), 'key': r['sla']} for r in SLA_RULES
             ]
+            keys = [row_def['key'] for row_def in rows_definitions]
+            ordinals = {1: '1er.', 2: '2do.', 3: '3er.', 4: '4to.'}
             
             # --- CALCULO DE INDICADORES MENSUALES (Desde metrics.py) ---
-            # Se usa df_unfiltered para tener historial completo
-            monthly_data = metrics_module.calculate_monthly_kpis(df_unfiltered)
-
-            # Helper to get monthly data or '-'
-            def get_metric(metric_key, month, df_u, is_percent=True):
-                
-                # 1. Buscar en resultados pre-calculados (metrics.py)
-                val = None
-                m_data = monthly_data.get(month, {})
-                
-                if metric_key == 'NS': val = m_data.get('ns')
-                elif metric_key == 'Abandono': val = m_data.get('abandono')
-                elif metric_key == 'Coord': val = m_data.get('coordinacion')
-                elif metric_key == 'Quejas': val = m_data.get('quejas')
-                elif metric_key == 'Recobros': val = m_data.get('recobros')
-                
-                if val is not None:
-                    if metric_key == 'Recobros': return f"${val:,.0f}"
-                    return f"{val:.2f}%"
-
-                # 2. Dynamic SLA Calc (Detallado por tipo/zona) - Fallback logic
-                # Se mantiene esta lógica local para SLAs específicos no cubiertos por coordinacion general
-                df_m = df_u[df_u['mes'] == month]
-                if len(df_m) == 0: return "-"
-                
-                # Common filters
-                mask_conc = df_m['status_del_servicio'].astype(str).str.contains('Concluido', case=False, na=False)
-                prog_col = next((c for c in df_m.columns if 'programad' in c.lower()), None)
-                mask_no_prog = True
-                if prog_col:
-                     mask_no_prog = df_m[prog_col].astype(str).str.lower() != 'si'
-                
-                df_sla = df_m[mask_conc & mask_no_prog]
-                
-                def calc_sla(sub_df, limit_min):
-                     dur = pd.to_numeric(sub_df['duracion_minutos'], errors='coerce')
-                     valid = dur.notnull()
-                     if valid.sum() == 0: return "-"
-                     val = (dur[valid] <= limit_min).sum() / valid.sum() * 100
-                     return f"{val:.2f}%"
-
-                if metric_key == 'SLA_Vial_Local':
-                     mask = df_sla['origen_del_servicio'].astype(str).str.upper() == 'LOCAL'
-                     return calc_sla(df_sla[mask], 45)
-                     
-                if metric_key == 'SLA_Situ_Local':
-                     mask = df_sla['origen_del_servicio'].astype(str).str.upper() == 'LOCAL'
-                     return calc_sla(df_sla[mask], 35)
-
-                if metric_key == 'SLA_Vial_Foraneo':
-                     mask = df_sla['origen_del_servicio'].astype(str).str.upper().str.contains('FORAN')
-                     return calc_sla(df_sla[mask], 90)
-
-                if metric_key == 'SLA_Situ_Foraneo':
-                     mask = df_sla['origen_del_servicio'].astype(str).str.upper().str.contains('FORAN')
-                     return calc_sla(df_sla[mask], 60)
-                     
-                return "-"
-
-
-            rows_definitions = [
-                {'name': '% Cumplimiento del NS', 'control': 'Mínimo 90%', 'key': 'NS'},
-                {'name': '% Máximo de Abandono', 'control': 'Máximo 1%', 'key': 'Abandono'},
-                {'name': 'Coordinación Local y Foráneo', 'control': '10 minutos Mínimo el 85%', 'key': 'Coord'},
-                {'name': 'Contacto Vial-Local', 'control': 'Mínimo 86.50% Antes de 45 minutos', 'key': 'SLA_Vial_Local'},
-                {'name': 'Contacto In situ - Local', 'control': 'Mínimo 80% Antes de 35 minutos', 'key': 'SLA_Situ_Local'},
-                {'name': 'Contacto Vial - Foráneo', 'control': 'Mínimo 86.50% Antes de 90 minutos', 'key': 'SLA_Vial_Foraneo'},
-                {'name': 'Contacto In situ - Foráneo', 'control': 'Mínimo 90% Antes de 60 minutos', 'key': 'SLA_Situ_Foraneo'}
-            ]
+            # Se usan las filas de contexto (todos los meses) para tener historial completo.
+            # Conteos num/den por periodo mensual (banderas por versión sumadas sobre
+            # las posiciones de contexto); las
+            # ventanas (trimestre, semestre, YTD, 12 meses) suman esos conteos.
+            counts = kpi_cache.get_or_compute(
+                ('monthly_kpi_counts',) + context_key,
+                lambda: metrics_module.complete_months(context_rows().group_sum(row_flags['monthly'], PERIOD_COLUMN)))
+            if counts.empty:
+                df_table, value_columns = pd.DataFrame(), []
+            else:
+                col_year, col_window = st.columns(2)
+                years = sorted(counts.index.year.unique(), reverse=True)
+                year = col_year.selectbox("Año", years)
+                subtotal = col_window.radio("Subtotales", ["Trimestre", "Semestre"], horizontal=True)
+                window = subtotal.lower()
+                months_per_window = 3 if window == 'trimestre' else 6
             
-            month_keys = ['Ene-25', 'Feb-25', 'Mar-25', 'Abr-25', 'May-25', 'Jun-25', 'Jul-25', 'Ago-25', 'Sep-25', 'Oct-25']
+                monthly = metrics_module.indicator_matrix(counts, 'mes').loc[keys]
+                subtotals = metrics_module.indicator_matrix(counts, window).loc[keys]
+                ytd = metrics_module.indicator_matrix(counts, 'ytd').loc[keys]
+                r12 = metrics_module.indicator_matrix(counts, 'r12').loc[keys]
             
-            table_data = []
-            for row_def in rows_definitions:
-                row = {'INDICADOR': row_def['name'], 'PUNTO DE CONTROL': row_def['control']}
-                values_for_avg = {1: [], 2: [], 3: []} # Trimestres
-                
-                for m in month_keys:
-                    val = get_metric(row_def['key'], m, df_unfiltered)
-                    row[m] = val
-                    
-                    # Logic for averages (cleaning % and $)
-                    if val != "-" and '%' in val:
-                         try:
-                            num = float(val.replace('%', ''))
-                            if m in ['Ene-25', 'Feb-25', 'Mar-25']: values_for_avg[1].append(num)
-                            if m in ['Abr-25', 'May-25', 'Jun-25']: values_for_avg[2].append(num)
-                            if m in ['Jul-25', 'Ago-25', 'Sep-25']: values_for_avg[3].append(num)
-                         except: pass
-                
-                # Compute Averages
-                all_values = []  # Para promedio total
-                for t in [1, 2, 3]:
-                    if values_for_avg[t]:
-                        avg = sum(values_for_avg[t]) / len(values_for_avg[t])
-                        row[f'PROMEDIO {t}er. TRIMESTRE' if t!=2 else f'PROMEDIO {t}do. TRIMESTRE'] = f"{avg:.2f}%"
-                        all_values.extend(values_for_avg[t])
-                    else:
-                        row[f'PROMEDIO {t}er. TRIMESTRE' if t!=2 else f'PROMEDIO {t}do. TRIMESTRE'] = "-"
-                
-                # Compute Total Average (all months)
-                if all_values:
-                    total_avg = sum(all_values) / len(all_values)
-                    row['PROMEDIO TOTAL'] = f"{total_avg:.2f}%"
-                else:
-                    row['PROMEDIO TOTAL'] = "-"
-                        
-                table_data.append(row)
-                
-            df_table = pd.DataFrame(table_data, columns=columns_struct)
+                # Columnas: meses del año + subtotal al cierre de cada ventana + acumulados
+                year_months = [p for p in monthly.columns if p.year == year]
+                last_month = year_months[-1]
+                columns = {}
+                for period in year_months:
+                    columns[period_label(period)] = monthly[period]
+                    if period in subtotals.columns:
+                        number = (period.month - 1) // months_per_window + 1
+                        columns[f"{ordinals[number]} {subtotal.upper()}"] = subtotals[period]
+                columns[f"ACUMULADO {year}"] = ytd[last_month]
+                columns[f"ÚLTIMOS 12 MESES ({period_label(last_month)})"] = r12[last_month]
+            
+                matrix = pd.DataFrame(columns)
+                value_columns = list(matrix.columns)
+                df_table = matrix.reset_index(drop=True)
+                df_table.insert(0, 'INDICADOR', [row_def['name'] for row_def in rows_definitions])
+                df_table.insert(1, 'PUNTO DE CONTROL', [row_def['control'] for row_def in rows_definitions])
             
             st.success(f"✅ Tabla generada con éxito. Filas: {len(df_table)}")
 
-            # Style
+            # Style (sobre los valores numéricos; el formato se aplica al renderizar)
             def style_table(val):
-                # Basic styling logic
-                if isinstance(val, str):
-                    if '-' in val and len(val) == 1: return ''
-                    if '%' in val:
-                        try:
-                            num = float(val.replace('%', ''))
-                            # Heuristic: >80 is usually green/yellow, <5 is green (for abandonment/quejas)
-                            if num < 5: 
-                                # Abandono/Quejas: Low is Good
-                                if num <= 1.5: return 'background-color: #c8e6c9; color: black' # Green
-                                else: return 'background-color: #ffcdd2; color: black' # Red
-                            else:
-                                # SLAs/NS: High is Good
-                                if num >= 86.5: return 'background-color: #c8e6c9; color: black' # Green
-                                elif num >= 80: return 'background-color: #fff9c4; color: black' # Yellow
-                                else: return 'background-color: #ffcdd2; color: black' # Red
-                        except: pass
-                    if '$' in val:
-                         return 'color: black' # Ensure readable if styled row
-                return ''
+                if pd.isna(val): return ''
+                # Heuristic: >80 is usually green/yellow, <5 is green (for abandonment/quejas)
+                if val < 5:
+                    # Abandono/Quejas: Low is Good
+                    if val <= 1.5: return 'background-color: #c8e6c9; color: black' # Green
+                    else: return 'background-color: #ffcdd2; color: black' # Red
+                else:
+                    # SLAs/NS: High is Good
+                    if val >= 86.5: return 'background-color: #c8e6c9; color: black' # Green
+                    elif val >= 80: return 'background-color: #fff9c4; color: black' # Yellow
+                    else: return 'background-color: #ffcdd2; color: black' # Red
 
             # CSS for sticky columns
             sticky_css = """
@@ -924,16 +1046,31 @@ def main():
             else:
                 try:
                     # Use map if available (pandas >= 2.1.0), else applymap
-                    styler = df_table.style
+                    styler = df_table.style.format('{:.2f}%', subset=value_columns, na_rep='-')
                     if hasattr(styler, 'map'):
-                        st.dataframe(styler.map(style_table), use_container_width=True, hide_index=True)
+                        st.dataframe(styler.map(style_table, subset=value_columns), use_container_width=True, hide_index=True)
                     else:
-                        st.dataframe(styler.applymap(style_table), use_container_width=True, hide_index=True)
+                        st.dataframe(styler.applymap(style_table, subset=value_columns), use_container_width=True, hide_index=True)
                 except Exception as e:
                     st.error(f"Error visualizando estilos: {e}")
                     st.dataframe(df_table, use_container_width=True, hide_index=True)
             
             st.caption("Nota: Los valores de Coordinación, NS, Abandono y Recobros son calculados directamente de la BBDD.")
+            
+            # Contraste del motor de reglas con las banderas cumplimiento_* del export
+            with st.expander("🔎 Validación SLA contra columnas del sistema"):
+                st.caption("Servicios concluidos no programados con duración calculable (mismo universo de la tabla).")
+                check = kpi_cache.get_or_compute(
+                    ('sla_cross_check', dataset_version),
+                    lambda: cross_check(df, row_flags['monthly']))
+                if check.empty:
+                    st.info("El export no trae columnas cumplimiento_* para contrastar.")
+                else:
+                    check = check.rename(columns={
+                        'columna_sistema': 'Columna del sistema', 'comparados': 'Comparados',
+                        'coincidencias': 'Coincidencias', 'discrepancias': 'Discrepancias',
+                        'coincidencia_pct': 'Coincidencia'})
+                    st.dataframe(check.style.format({'Coincidencia': '{:.2f}%'}), use_container_width=True)
 
         except Exception as e:
             st.error("❌ ERROR CRÍTICO AL GENERAR TABLA:")
@@ -948,19 +1085,19 @@ def main():
         col1, col2 = st.columns(2)
         
         with col1:
-            prov_counts = df['provincia'].value_counts().head(10)
-            fig = px.bar(x=prov_counts.index, y=prov_counts.values,
-                        title="Demanda por Provincia",
-                        color_discrete_sequence=[COLORS['purple']])
-            style_dark_chart(fig)
+            prov_counts = cube_counts(cube_sel, 'provincia').head(10)
+            fig = figure(('geografica', 'provincia'), selected_key, lambda: px.bar(
+                x=prov_counts.index, y=prov_counts.values,
+                title="Demanda por Provincia",
+                color_discrete_sequence=[COLORS['purple']]))
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
-            city_counts = df['ciudad'].value_counts().head(10)
-            fig = px.bar(x=city_counts.index, y=city_counts.values,
-                        title="Demanda por Ciudad",
-                        color_discrete_sequence=[COLORS['purple']])
-            style_dark_chart(fig)
+            city_counts = cube_counts(cube_sel, 'ciudad').head(10)
+            fig = figure(('geografica', 'ciudad'), selected_key, lambda: px.bar(
+                x=city_counts.index, y=city_counts.values,
+                title="Demanda por Ciudad",
+                color_discrete_sequence=[COLORS['purple']]))
             st.plotly_chart(fig, use_container_width=True)
     
     # ==========================================================================
@@ -969,11 +1106,22 @@ def main():
     elif "Satisfacción" in selected_section:
         st.markdown('<h2 class="section-header">Satisfacción del Cliente</h2>', unsafe_allow_html=True)
         
+        nps_col = nps_column(df.columns)
+        
+        def nps_view():
+            # Distribución de calificaciones y NPS por mes de la selección actual
+            rows = selected_rows()
+            scores = pd.to_numeric(rows.take([nps_col])[nps_col], errors='coerce').dropna()
+            por_mes = nps_percentages(rows.group_sum(row_flags['nps'], 'mes')) if 'mes' in df.columns else None
+            return {'counts': scores.value_counts().sort_index(), 'por_mes': por_mes}
+        
+        view = kpi_cache.get_or_compute(('nps',) + selected_key, nps_view) if nps_col else None
+        
         col1, col2 = st.columns(2)
         
         with col1:
             # NPS Gauge
-            fig = go.Figure(go.Indicator(
+            fig = figure(('satisfaccion', 'gauge'), selected_key, lambda: go.Figure(go.Indicator(
                 mode="gauge+number",
                 value=metrics['nps'],
                 domain={'x': [0, 1], 'y': [0, 1]},
@@ -992,32 +1140,33 @@ def main():
                         'value': 82.14
                     }
                 }
-            ))
-            style_dark_chart(fig)
+            )))
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             # NPS Distribution
-            nps_col = next((c for c in df.columns if 'nps' in c.lower() and 'calificacion' in c.lower()), None)
-            if nps_col:
-                nps_data = pd.to_numeric(df[nps_col], errors='coerce').dropna()
-                nps_counts = nps_data.value_counts().sort_index()
+            if view is not None:
+                nps_counts = view['counts']
                 
-                colors = []
-                for val in nps_counts.index:
-                    if val >= 9 or val == 5:
-                        colors.append(COLORS['success'])
-                    elif val >= 7 or val == 4:
-                        colors.append(COLORS['warning'])
-                    else:
-                        colors.append(COLORS['danger'])
+                # Color por categoría NPS (misma tabla de búsqueda que el KPI)
+                category_colors = {'PROMOTOR': COLORS['success'], 'PASIVO': COLORS['warning'], 'DETRACTOR': COLORS['danger']}
+                colors = [category_colors.get(cat, COLORS['danger']) for cat in categorize_scores(nps_counts.index)]
                 
-                fig = px.bar(x=nps_counts.index.astype(str), y=nps_counts.values,
-                            title="Distribución de Calificaciones NPS",
-                            color=nps_counts.index.astype(str),
-                            color_discrete_sequence=colors)
-                style_dark_chart(fig)
+                fig = figure(('satisfaccion', 'distribucion'), selected_key, lambda: px.bar(
+                    x=nps_counts.index.astype(str), y=nps_counts.values,
+                    title="Distribución de Calificaciones NPS",
+                    color=nps_counts.index.astype(str),
+                    color_discrete_sequence=colors))
                 st.plotly_chart(fig, use_container_width=True)
+        
+        # NPS por mes (un solo groupby con conteos y porcentajes)
+        if view is not None and view['por_mes'] is not None:
+            st.subheader("NPS por Mes")
+            nps_mes = view['por_mes']
+            nps_mes = nps_mes[nps_mes['respuestas'] > 0]
+            table = nps_mes[['respuestas', 'promotores', 'pasivos', 'detractores', 'nps']]
+            table.columns = ['Respuestas', 'Promotores', 'Pasivos', 'Detractores', 'NPS']
+            st.dataframe(table.style.format({'NPS': '{:.1f}%'}), use_container_width=True)
     
     # ==========================================================================
     # METODOLOGÍA
@@ -1054,7 +1203,7 @@ def main():
         
         **Exclusiones:**
         - Servicios Programados (`servicios_programados = "No"`)
-        - Estados: Cancelado, Fallida, Anulado
+        - Estados: Cancelado, Fallida, Anulado (solo se evalúan servicios Concluidos)
         - Keywords en motivos: "Cita", "Agendada", "Programada", "Posterior"
         
         ---
@@ -1071,8 +1220,8 @@ def main():
         **Clasificación (Escala 0-10):**
         | Tipo | Calificación |
         |------|-------------|
-        | Promotores | 9-10 |
-        | Pasivos | 7-8 |
+        | Promotores | 10 |
+        | Pasivos | 7-9 |
         | Detractores | 0-6 |
         
         **Clasificación (Escala 1-5):**
@@ -1106,6 +1255,16 @@ def main():
         - **Fórmula**: `(fec_asignacion + hrs_asignacion) - (fec_contacto + hrs_contacto)`
         - **Meta**: ≤ 10 minutos.
         
+        #### Subtotales y Acumulados
+        Trimestres, semestres, acumulado del año y últimos 12 meses se calculan
+        sumando numeradores y denominadores de los meses de la ventana antes de
+        dividir (promedio ponderado por volumen, no promedio de porcentajes).
+        
+        #### Percentiles de Tiempo de Respuesta
+        P50/P90/P95 de minutos entre asignación y contacto (servicios concluidos
+        inmediatos). Cada celda del cubo guarda un histograma logarítmico que se
+        suma al filtrar; el valor reportado está a menos de 2% del percentil exacto.
+        
         ---
         
         ### Fuentes de Datos
@@ -1114,6 +1273,17 @@ def main():
         - **Periodo**: Enero - Octubre 2025
         """)
     
+    # Estado del caché de KPIs (incluye las consultas de esta ejecución)
+    cache_stats = kpi_cache.stats()
+    st.sidebar.caption(f"🧠 Caché KPIs: {cache_stats['hit_rate']:.0%} aciertos "
+                       f"({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}), "
+                       f"{cache_stats['entries']} entradas, "
+                       f"{cache_stats['mb']:.2f}/{cache_stats['max_mb']:.0f} MB")
+    figure_stats = figure_cache.stats()
+    st.sidebar.caption(f"🖼️ Caché figuras: {figure_stats['hit_rate']:.0%} aciertos, "
+                       f"{figure_stats['entries']} figuras, "
+                       f"{figure_stats['mb']:.2f}/{figure_stats['max_mb']:.0f} MB")
+    
     # Footer
     st.divider()
     st.markdown("""
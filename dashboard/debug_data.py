@@ -5,6 +5,7 @@ import os
 # Add modules to path
 sys.path.append(os.path.join(os.getcwd(), 'modules'))
 from data_loader import load_data
+from timestamps import combine_date_time, minutes_between
 
 def analyze():
     output = []
@@ -65,31 +66,9 @@ def analyze():
     # DETAILED COORDINATION ANALYSIS
     output.append("\n\n=== DETAILED COORDINATION ANALYSIS ===")
     if {'fec_contacto', 'hrs_contacto', 'fec_asignacion', 'hrs_asignacion'}.issubset(df.columns):
-        def combine_dt(row):
-            try:
-                d = pd.to_datetime(row['fec_contacto'])
-                t = row['hrs_contacto']
-                if pd.isna(d) or pd.isna(t): return pd.NaT
-                t_str = str(t).strip()
-                if hasattr(t, 'hour'): t_str = t.strftime('%H:%M:%S')
-                return pd.to_datetime(f"{d.strftime('%Y-%m-%d')} {t_str}", errors='coerce')
-            except:
-                return pd.NaT
-        
-        def combine_dt_assign(row):
-            try:
-                d = pd.to_datetime(row['fec_asignacion'])
-                t = row['hrs_asignacion']
-                if pd.isna(d) or pd.isna(t): return pd.NaT
-                t_str = str(t).strip()
-                if hasattr(t, 'hour'): t_str = t.strftime('%H:%M:%S')
-                return pd.to_datetime(f"{d.strftime('%Y-%m-%d')} {t_str}", errors='coerce')
-            except:
-                return pd.NaT
-        
-        df['_dt_contact'] = df.apply(combine_dt, axis=1)
-        df['_dt_assign'] = df.apply(combine_dt_assign, axis=1)
-        df['_diff_min'] = (df['_dt_assign'] - df['_dt_contact']).dt.total_seconds() / 60
+        df['_dt_contact'] = combine_date_time(df['fec_contacto'], df['hrs_contacto'])
+        df['_dt_assign'] = combine_date_time(df['fec_asignacion'], df['hrs_asignacion'])
+        df['_diff_min'] = minutes_between(df['_dt_contact'], df['_dt_assign'])
         
         valid_diffs = df['_diff_min'].dropna()
         output.append(f"Total with valid diffs: {len(valid_diffs)}")
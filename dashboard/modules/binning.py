@@ -0,0 +1,108 @@
+"""
+ADS Boletín - Binning Module
+Histogramas calculados en el servidor para las vistas de distribución.
+
+Al navegador solo viajan bordes y conteos (una traza de barras), no los
+valores crudos: el tamaño del payload depende del número de bins, no del
+número de filas. Los bins son fijos (rango y ancho dados; con último borde
+`inf` el último bin acumula los valores mayores) o Freedman–Diaconis
+calculados por corte. Los valores fuera de los bordes no se cuentan. Con
+bins fijos el histograma se puede precalcular por celda del cubo y los de una
+selección salen de sumar filas, igual que los sketches de cuantiles.
+"""
+import numpy as np
+import pandas as pd
+
+MAX_BINS = 60
+
+
+def fixed_edges(start, stop, width, open_ended=False):
+    """
+    Bordes equiespaciados de start a stop (inclusive) cada `width`.
+    `open_ended`: el último borde pasa a ser `inf` (el último bin, desde
+    stop - width, acumula los valores mayores).
+    """
+    edges = np.arange(start, stop + width / 2, width, dtype=float)
+    if open_ended:
+        edges[-1] = np.inf
+    return edges
+
+
+def freedman_diaconis_edges(values, max_bins=MAX_BINS):
+    """
+    Bordes Freedman–Diaconis (ancho = 2·IQR / n^(1/3)) de los valores finitos,
+    con a lo sumo `max_bins` bins para que las colas largas no los disparen.
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return np.array([0.0, 1.0])
+    lo, hi = float(values.min()), float(values.max())
+    if hi == lo:
+        return np.array([lo - 0.5, hi + 0.5])
+    q25, q75 = np.percentile(values, [25, 75])
+    width = 2 * (q75 - q25) / np.cbrt(len(values))
+    bins = int(np.ceil((hi - lo) / width)) if width > 0 else max_bins
+    return np.linspace(lo, hi, min(max(bins, 1), max_bins) + 1)
+
+
+def bin_index(values, edges):
+    """
+    Bin de cada valor; -1 si queda fuera (NaN, menor al primer borde o mayor
+    al último). El último bin incluye su borde derecho, así que solo un último
+    borde `inf` acumula los valores grandes.
+    """
+    values = np.asarray(values, dtype=float)
+    index = np.searchsorted(edges, values, side='right') - 1
+    index[values == edges[-1]] = len(edges) - 2
+    index[np.isnan(values) | (values < edges[0]) | (values > edges[-1])] = -1
+    return index
+
+
+def histogram(values, edges=None):
+    """Conteos por bin y bordes (Freedman–Diaconis si no se dan bordes)"""
+    edges = freedman_diaconis_edges(values) if edges is None else np.asarray(edges, dtype=float)
+    index = bin_index(values, edges)
+    return np.bincount(index[index >= 0], minlength=len(edges) - 1), edges
+
+
+def build_histograms(groups, values, edges, n_groups):
+    """
+    Matriz (n_groups × bins) de conteos: fila g = histograma de los valores con
+    groups == g sobre `edges` fijos. Grupos < 0 o valores fuera de rango se ignoran.
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    n_bins = len(edges) - 1
+    index = bin_index(values, edges)
+    keep = (groups >= 0) & (index >= 0)
+    counts = np.bincount(groups[keep] * n_bins + index[keep], minlength=n_groups * n_bins)
+    return counts.reshape(n_groups, n_bins).astype(np.int32)
+
+
+def merge_histograms(histograms, rows=None):
+    """Histograma combinado (suma) de las filas dadas (todas si rows es None)"""
+    selected = histograms if rows is None else histograms[np.asarray(rows, dtype=np.int64)]
+    return selected.sum(axis=0, dtype=np.int64)
+
+
+def histogram_frame(counts, edges):
+    """
+    Tabla de bins para graficar como barras: desde, hasta, centro, ancho,
+    conteo y etiqueta. Un último borde `inf` (bin abierto) se dibuja con el
+    ancho del bin anterior y se etiqueta '≥ desde'.
+    """
+    edges = np.asarray(edges, dtype=float)
+    open_ended = np.isinf(edges[-1]) and len(edges) > 2
+    labels = [f"{a:g}–{b:g}" for a, b in zip(edges[:-1], edges[1:])]
+    if open_ended:
+        labels[-1] = f"≥ {edges[-2]:g}"
+        edges = edges.copy()
+        edges[-1] = edges[-2] + (edges[-2] - edges[-3])
+    return pd.DataFrame({
+        'desde': edges[:-1],
+        'hasta': edges[1:],
+        'centro': (edges[:-1] + edges[1:]) / 2,
+        'ancho': np.diff(edges),
+        'conteo': np.asarray(counts, dtype=np.int64),
+        'bin': labels,
+    })
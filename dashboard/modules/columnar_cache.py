@@ -0,0 +1,177 @@
+"""
+ADS Boletín - Columnar Cache Module
+Caché en disco (Arrow IPC / Feather) para no re-parsear los Excel con openpyxl.
+
+La primera lectura convierte el libro a un archivo columnar junto a la fuente
+(carpeta `.cache/`). Las siguientes lo abren con memory-map y solo convierten a
+pandas las columnas pedidas (`columns`); la conversión sí copia esas columnas.
+El caché se invalida solo cuando cambia el Excel (ruta, tamaño, mtime y hash de
+contenido) y al reconstruirlo se borran las entradas de versiones anteriores.
+"""
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # Sin pyarrow se lee el Excel directamente
+    pa = None
+    feather = None
+
+CACHE_DIRNAME = '.cache'
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_sha256(path):
+    """Hash SHA-256 del archivo, leído por bloques"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_paths(source_path, read_kwargs=None):
+    """Rutas (datos, manifiesto) del caché para una fuente y opciones de lectura"""
+    src = os.path.abspath(source_path)
+    options = json.dumps(read_kwargs or {}, sort_keys=True, default=str)
+    key = hashlib.sha1(f"{src}|{options}".encode('utf-8')).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(src))[0]
+    base = os.path.join(os.path.dirname(src), CACHE_DIRNAME, f"{stem}.{key}")
+    return base + '.arrow', base + '.json'
+
+
+def _read_manifest(manifest_path):
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, write_fn):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        write_fn(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _write_manifest(manifest_path, manifest):
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+    _write_atomic(manifest_path, write)
+
+
+def _prune_superseded(data_path, src, content_hash):
+    """
+    Borra las entradas del caché de la misma fuente (cualquier opción de lectura)
+    construidas con otro contenido: ya no pueden volver a ser válidas.
+    """
+    cache_dir = os.path.dirname(data_path)
+    stem = os.path.splitext(os.path.basename(src))[0]
+    for name in os.listdir(cache_dir):
+        if not (name.startswith(stem + '.') and name.endswith('.json')):
+            continue
+        manifest_path = os.path.join(cache_dir, name)
+        manifest = _read_manifest(manifest_path)
+        if not manifest or manifest.get('source') != src or manifest.get('sha256') == content_hash:
+            continue
+        for stale in (os.path.splitext(manifest_path)[0] + '.arrow', manifest_path):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def arrow_safe(df):
+    """
+    Convierte a texto las columnas object con tipos mezclados que Arrow no acepta
+    (p.ej. hrs_* con str + datetime.time, placas con int + str). Los nulos se conservan.
+    """
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+    return df
+
+
+def read_excel_cached(path, columns=None, **read_kwargs):
+    """
+    Lee un Excel pasando por el caché columnar.
+
+    Devuelve (df, info). `info` incluye status ('warm' si vino del caché,
+    'cold' si se parseó el Excel), load_seconds, build_seconds (último parseo
+    en frío) y version (hash de contenido de la fuente).
+
+    `columns` limita las columnas devueltas: en caliente solo esas se leen del
+    archivo mapeado y se convierten a pandas. El caché guarda siempre el libro
+    completo.
+    """
+    t0 = time.perf_counter()
+    src = os.path.abspath(path)
+
+    if pa is None:
+        df = pd.read_excel(src, **read_kwargs)
+        if columns is not None:
+            df = df[list(columns)]
+        elapsed = time.perf_counter() - t0
+        return df, {'source': src, 'status': 'cold', 'load_seconds': elapsed,
+                    'build_seconds': elapsed, 'version': None}
+
+    stat = os.stat(src)
+    data_path, manifest_path = cache_paths(src, read_kwargs)
+    manifest = _read_manifest(manifest_path)
+
+    content_hash = None
+    if manifest and os.path.exists(data_path) and manifest.get('size') == stat.st_size:
+        fresh = manifest.get('mtime_ns') == stat.st_mtime_ns
+        if not fresh:
+            # mtime distinto (copia, checkout): decidir por contenido
+            content_hash = file_sha256(src)
+            fresh = content_hash == manifest.get('sha256')
+            if fresh:
+                manifest['mtime_ns'] = stat.st_mtime_ns
+                _write_manifest(manifest_path, manifest)
+        if fresh:
+            try:
+                table = feather.read_table(data_path, columns=columns, memory_map=True)
+                df = table.to_pandas()
+                return df, {'source': src, 'status': 'warm',
+                            'load_seconds': time.perf_counter() - t0,
+                            'build_seconds': manifest.get('build_seconds'),
+                            'version': manifest.get('sha256')}
+            except (OSError, pa.ArrowInvalid):
+                pass  # Caché corrupto: reconstruir
+
+    # Cold: parsear Excel y materializar caché
+    content_hash = content_hash or file_sha256(src)
+    df = arrow_safe(pd.read_excel(src, **read_kwargs))
+    build_seconds = time.perf_counter() - t0
+
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    _write_atomic(data_path, lambda tmp: feather.write_feather(df, tmp, compression='uncompressed'))
+    _write_manifest(manifest_path, {
+        'source': src,
+        'read_kwargs': read_kwargs,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': content_hash,
+        'build_seconds': build_seconds,
+        'built_at': pd.Timestamp.now().isoformat(timespec='seconds'),
+    })
+    _prune_superseded(data_path, src, content_hash)
+    if columns is not None:
+        df = df[list(columns)]
+
+    return df, {'source': src, 'status': 'cold',
+                'load_seconds': time.perf_counter() - t0,
+                'build_seconds': build_seconds, 'version': content_hash}
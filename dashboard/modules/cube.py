@@ -0,0 +1,128 @@
+"""
+ADS Boletín - Aggregate Cube Module
+Cubo pre-agregado sobre las dimensiones del drill-down del dashboard
+(mes × plan × ciudad × provincia × tipo × origen × status).
+
+Cada celda guarda la suma de las banderas del motor de KPIs (metrics.kpi_flags):
+conteo de registros ('total') y numeradores/denominadores de SLA y NPS. Los
+filtros del sidebar se aplican sobre las celdas (cientos) en lugar de las filas
+(miles), y los gráficos de conteos salen de sumas del cubo.
+
+Los tiempos de respuesta se guardan como un sketch de cuantiles por celda
+(matriz alineada con las filas del cubo, sketch.py); los percentiles de una
+selección salen de sumar los sketches de sus celdas. Del mismo modo, los
+histogramas de bins fijos (binning.py) se precalculan por celda.
+"""
+import numpy as np
+
+try:
+    from .metrics import KPI_FLAGS, kpi_flags, sla_universe, summarize_kpis
+    from .sketch import build_sketches, grouped_quantiles, merge_sketches, sketch_quantiles
+    from .binning import build_histograms, merge_histograms
+except ImportError:
+    from metrics import KPI_FLAGS, kpi_flags, sla_universe, summarize_kpis
+    from sketch import build_sketches, grouped_quantiles, merge_sketches, sketch_quantiles
+    from binning import build_histograms, merge_histograms
+
+CUBE_DIMENSIONS = [
+    'mes',
+    'nombre_del_plan',
+    'ciudad',
+    'provincia',
+    'tipo_de_servicio',
+    'origen_del_servicio',
+    'status_del_servicio',
+]
+
+
+def _cell_grouper(df, frame):
+    dims = [d for d in CUBE_DIMENSIONS if d in df.columns]
+    return frame.groupby([df[d] for d in dims], observed=True, dropna=False, sort=False)
+
+
+def _cell_ids(df):
+    """Celda de cada registro (índice de fila en build_cube(df)) y número de celdas"""
+    cells = _cell_grouper(df, df[[]]).ngroup().to_numpy()
+    return cells, int(cells.max()) + 1 if len(cells) else 0
+
+
+def build_cube(df):
+    """
+    Agrega el DataFrame a una fila por combinación observada de dimensiones.
+    Los nulos de las dimensiones se conservan como su propia celda.
+    """
+    flags = kpi_flags(df).astype(np.int64)
+    return _cell_grouper(df, flags).sum().reset_index()
+
+
+def build_cube_sketches(df, value_col='duracion_minutos'):
+    """
+    Sketch de `value_col` por celda (fila i = celda i de build_cube(df)) sobre
+    el universo SLA (concluidos inmediatos con duración calculable).
+    """
+    cells, n_cells = _cell_ids(df)
+    values = np.where(sla_universe(df), df[value_col].to_numpy(dtype=float, na_value=np.nan), np.nan) \
+        if value_col in df.columns else np.full(len(df), np.nan)
+    return build_sketches(cells, values, n_cells)
+
+
+def build_cube_histograms(df, values, edges):
+    """
+    Histograma de `values` (alineado a las filas de df, NaN = fuera del
+    universo) por celda sobre `edges` fijos: fila i = celda i de build_cube(df).
+    """
+    cells, n_cells = _cell_ids(df)
+    return build_histograms(cells, values, edges, n_cells)
+
+
+def slice_cube(cube, include=None, exclude=None):
+    """
+    Celdas que cumplen los filtros: include {dim: valores permitidos},
+    exclude {dim: valores a descartar}. Listas vacías/None no filtran.
+    """
+    mask = np.ones(len(cube), dtype=bool)
+    for dim, values in (include or {}).items():
+        if values is not None:
+            mask &= cube[dim].isin(values).to_numpy()
+    for dim, values in (exclude or {}).items():
+        if values:
+            mask &= ~cube[dim].isin(values).to_numpy()
+    return cube[mask]
+
+
+def rollup(cube, dims, measure='total'):
+    """Suma de `measure` por las dimensiones dadas (equivale a groupby(...).size())"""
+    return cube.groupby(dims, observed=True)[measure].sum()
+
+
+def cube_counts(cube, dim):
+    """Equivalente a observed_counts(df[dim]) calculado desde el cubo"""
+    counts = rollup(cube, dim)
+    return counts[counts > 0].sort_values(ascending=False, kind='stable')
+
+
+def dimension_values(cube, dim):
+    """Valores presentes de una dimensión (como texto, nulos incluidos como 'nan')"""
+    return cube[dim].astype(str).unique().tolist()
+
+
+def cube_metrics(cube):
+    """KPIs del motor de metrics.py (total, concluidos, SLA, NPS) sumando las celdas"""
+    return summarize_kpis(cube[KPI_FLAGS].sum())
+
+
+def cube_quantiles(cube, sketches, by=None):
+    """
+    Percentiles (n, p50, p90, p95) de las celdas de `cube` (un corte de
+    slice_cube): total si `by` es None, o por dimensión.
+    """
+    if by is None:
+        merged = merge_sketches(sketches, cube.index)
+        values = sketch_quantiles(merged)
+        return {'n': int(merged.sum()), 'p50': float(values[0]), 'p90': float(values[1]), 'p95': float(values[2])}
+    return grouped_quantiles(sketches, cube.index, cube[by].to_numpy())
+
+
+def cube_histogram(cube, histograms):
+    """Histograma de las celdas de `cube` (un corte de slice_cube)"""
+    return merge_histograms(histograms, cube.index)
@@ -5,6 +5,22 @@ import pandas as pd
 import streamlit as st
 import os
 
+try:
+    from .columnar_cache import read_excel_cached
+    from .metrics import materialize_exclusion_flags
+    from .schema import MONTH_ORDER, apply_schema, sort_month_labels
+    from .store import STORE_DIRNAME, is_store, read_store
+except ImportError:
+    from columnar_cache import read_excel_cached
+    from metrics import materialize_exclusion_flags
+    from schema import MONTH_ORDER, apply_schema, sort_month_labels
+    from store import STORE_DIRNAME, is_store, read_store
+
+
+def _prepare(df):
+    """Esquema tipado + banderas de exclusión, una vez por carga"""
+    return materialize_exclusion_flags(apply_schema(df))
+
 
 @st.cache_data
 def load_data(uploaded_file=None):
@@ -16,11 +32,18 @@ def load_data(uploaded_file=None):
         else:
             df = pd.read_excel(uploaded_file)
         df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_').str.replace('.', '')
-        return df
+        return _prepare(df)
     
     # Try local files (relative to dashboard folder)
     base = os.path.dirname(os.path.dirname(__file__))  # Go up one level from modules
     
+    # Partitioned store (ads_utils.py --action ingest) takes precedence
+    for store_dir in [os.path.join(base, "resultados", STORE_DIRNAME),
+                      os.path.join(base, "..", "resultados", STORE_DIRNAME)]:
+        if is_store(store_dir):
+            df, _ = read_store(store_dir)
+            return _prepare(df)
+    
     paths = [
         os.path.join(base, "resultados", "analyzed_bbdd.xlsx"),
         os.path.join(base, "..", "resultados", "analyzed_bbdd.xlsx"),
@@ -31,10 +54,10 @@ def load_data(uploaded_file=None):
         if os.path.exists(path):
             try:
                 if 'Servicios brindados' in path:
-                    df = pd.read_excel(path, sheet_name='BBDD')
+                    df, _ = read_excel_cached(path, sheet_name='BBDD')
                 else:
-                    df = pd.read_excel(path)
-                return df
+                    df, _ = read_excel_cached(path)
+                return _prepare(df)
             except:
                 continue
     
@@ -42,13 +65,8 @@ def load_data(uploaded_file=None):
 
 
 def get_month_order():
-    return {'Ene': 1, 'Feb': 2, 'Mar': 3, 'Abr': 4, 'May': 5, 'Jun': 6,
-            'Jul': 7, 'Ago': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dic': 12}
+    return dict(MONTH_ORDER)
 
 
 def sort_months(months):
-    month_order = get_month_order()
-    return sorted(months, key=lambda x: (
-        int(str(x).split('-')[-1]) if '-' in str(x) else 0,
-        month_order.get(str(x).split('-')[0], 0)
-    ))
+    return sort_month_labels(months)
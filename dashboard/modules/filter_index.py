@@ -0,0 +1,63 @@
+"""
+ADS Boletín - Filter Index Module
+Índice de bitsets para los filtros del sidebar (mes, plan, ciudad, tipo).
+
+Se construye una vez por versión del dataset: un bitset empaquetado por valor
+distinto de cada columna filtrable. La selección actual se compila a un solo
+AND/OR de bitsets que devuelve posiciones de fila; el DataFrame se materializa
+una única vez (df.take) en lugar de encadenar df = df[...].
+"""
+import numpy as np
+import pandas as pd
+
+FILTER_COLUMNS = ['mes', 'nombre_del_plan', 'ciudad', 'tipo_de_servicio']
+
+
+def build_filter_index(df, columns=FILTER_COLUMNS):
+    """
+    {'n_rows': n, 'bitsets': {col: {valor: bits}}} con bits = np.packbits(fila == valor).
+    Los nulos no tienen bitset (no coinciden con ningún valor, igual que isin).
+    """
+    bitsets = {}
+    for col in columns:
+        if col not in df.columns:
+            continue
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            codes, values = df[col].cat.codes.to_numpy(), df[col].cat.categories
+        else:
+            codes, values = pd.factorize(df[col])
+        bitsets[col] = {value: np.packbits(codes == i) for i, value in enumerate(values)}
+    return {'n_rows': len(df), 'bitsets': bitsets}
+
+
+def _any_of(index, col, values):
+    """OR de los bitsets de `values` en la columna"""
+    n_bytes = (index['n_rows'] + 7) // 8
+    acc = np.zeros(n_bytes, dtype=np.uint8)
+    column = index['bitsets'][col]
+    for value in values:
+        bits = column.get(value)
+        if bits is not None:
+            acc |= bits
+    return acc
+
+
+def select_positions(index, include=None, exclude=None):
+    """
+    Posiciones de fila que cumplen include {col: valores permitidos} y
+    exclude {col: valores a descartar}. Listas vacías/None no filtran.
+    """
+    n_bytes = (index['n_rows'] + 7) // 8
+    acc = np.full(n_bytes, 0xFF, dtype=np.uint8)
+    for col, values in (include or {}).items():
+        if values is not None:
+            acc &= _any_of(index, col, values)
+    for col, values in (exclude or {}).items():
+        if values:
+            acc &= ~_any_of(index, col, values)
+    return np.flatnonzero(np.unpackbits(acc, count=index['n_rows']))
+
+
+def select_rows(df, index, include=None, exclude=None):
+    """Filas seleccionadas, materializadas una sola vez"""
+    return df.take(select_positions(index, include, exclude))
@@ -0,0 +1,113 @@
+"""
+ADS Boletín - KPI Cache Module
+Caché LRU de resultados (KPIs, conteos mensuales, NPS por mes, figuras
+Plotly) indexado por versión del dataset + firma canónica de los filtros.
+
+La llave se arma con los valores elegidos en el sidebar, no con el DataFrame
+filtrado, así que buscar una entrada no requiere hashear filas. Las entradas
+se desalojan por antigüedad de uso cuando se supera el tope de memoria.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_MB = 64
+
+
+def filter_signature(include=None, exclude=None):
+    """
+    Firma canónica e inmutable de los filtros: include/exclude {col: valores}.
+    El orden de columnas y valores no importa; None (sin filtro) y [] se
+    distinguen en include (sin filtro vs. nada seleccionado) igual que en
+    filter_index.select_positions.
+    """
+    def canonical(filters, drop_empty):
+        items = []
+        for col, values in (filters or {}).items():
+            if values is None or (drop_empty and not values):
+                continue
+            items.append((col, tuple(sorted(str(v) for v in values))))
+        return tuple(sorted(items))
+
+    return (canonical(include, drop_empty=False), canonical(exclude, drop_empty=True))
+
+
+def estimate_bytes(value):
+    """Tamaño aproximado en memoria de un resultado cacheado"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if hasattr(value, 'to_plotly_json'):
+        # Figuras Plotly: tamaño de su especificación (data + layout)
+        return estimate_bytes(value.to_plotly_json())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_bytes(k) + estimate_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_bytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class KPICache:
+    """LRU con tope de memoria y contadores de aciertos (seguro entre sesiones)"""
+
+    def __init__(self, max_mb=DEFAULT_MAX_MB):
+        self.max_bytes = int(max_mb * 1e6)
+        self._entries = OrderedDict()  # key -> (value, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute):
+        """Valor cacheado para `key`; si no existe, compute() y se guarda"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = compute()
+        self._store(key, value)
+        return value
+
+    def _store(self, key, value):
+        size = estimate_bytes(value)
+        if size > self.max_bytes:
+            return  # Más grande que el caché completo: no se guarda
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Aciertos, fallos, tasa de aciertos, entradas y memoria usada"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'evictions': self.evictions,
+                'mb': self._bytes / 1e6,
+                'max_mb': self.max_bytes / 1e6,
+            }
@@ -2,8 +2,20 @@
 ADS Boletín - Metrics Calculation Module
 Metodología V3 Completa (Boletin_Calidad_v3.tex Sección 6)
 """
+import numpy as np
 import pandas as pd
 
+try:
+    from .timestamps import combine_date_time, minutes_between
+    from .schema import PERIOD_COLUMN, category_mask, contains, month_periods, period_label
+    from .nps import nps_flags
+    from .sla_rules import SLA_RULES, rule, sla_flags
+except ImportError:
+    from timestamps import combine_date_time, minutes_between
+    from schema import PERIOD_COLUMN, category_mask, contains, month_periods, period_label
+    from nps import nps_flags
+    from sla_rules import SLA_RULES, rule, sla_flags
+
 
 # Metas oficiales
 TARGETS = {
@@ -17,210 +29,403 @@ SLA_TIEMPO = {
     'rural': 78.25    # FORANEO (90min)
 }
 
+# --- Reglas declarativas del motor de KPIs (Boletin_Calidad_v3.tex Sección 6) ---
+
+# SLA contractuales: tabla de reglas en sla_rules.SLA_RULES
+# SLA del KPI principal: contactación vial por origen
+VIAL_SLA_RULES = [rule('sla_vial_local'), rule('sla_vial_foraneo')]
+
+# Umbrales de contactación vial por origen (minutos)
+SLA_THRESHOLDS = {r['origen']: r['limite'] for r in VIAL_SLA_RULES}
+
+# Clasificación NPS: nps.NPS_BUCKETS
+
+# Exclusiones del universo SLA
+EXCLUDED_STATUS_PATTERN = 'cancelado|fallido|anulado|fallida'
+SLA_STATUS = 'concluido'                 # solo servicios concluidos
+INMEDIATO_VALUE = 'no'                   # servicios_programados = "No"
+
 # Keywords de exclusión para motivos
 EXCLUSION_KEYWORDS = ['cita', 'agendada', 'programada', 'posterior']
 
+# Banderas por registro que se suman para obtener los KPIs
+KPI_FLAGS = ['total', 'concluidos', 'sla_validos', 'sla_cumple', 'sla_local', 'sla_foraneo',
+             'nps_respuestas', 'nps_promotores', 'nps_detractores']
+
+
+# Banderas de exclusión materializadas al cargar (una vez por versión del dataset)
+EXCLUSION_FLAGS = ['is_cancelado', 'is_programado', 'is_cita_keyword', 'is_duration_outlier', 'is_valid_sla']
+
+
+def _programado_column(columns):
+    return next((c for c in columns if 'programad' in c.lower() and c not in EXCLUSION_FLAGS), None)
+
+
+def programado_mask(df):
+    """
+    True para servicios programados: todo lo que no sea "No" (sin espacios ni
+    mayúsculas), incluidos nulos y vacíos. Predicado único del universo SLA
+    (exclusion_flags) y del universo de la tabla de reglas (sla_rules_base).
+    """
+    prog_col = _programado_column(df.columns)
+    if not prog_col:
+        return np.zeros(len(df), dtype=bool)
+    return category_mask(df[prog_col], lambda s: s.str.strip().str.lower() != INMEDIATO_VALUE).to_numpy()
+
+
+def _motivo_columns(columns):
+    return [c for c in columns if 'motivo' in c.lower() or 'servicio_brindado' in c.lower()]
+
+
+def exclusion_flags(df):
+    """
+    Banderas de exclusión por registro (EXCLUSION_FLAGS):
+      - is_cancelado: status cancelado / fallido / anulado
+      - is_programado: servicio programado (se conservan los inmediatos)
+      - is_cita_keyword: keywords de cita en motivos o servicio brindado
+      - is_duration_outlier: duración no calculable o negativa
+      - is_valid_sla: Concluido y ninguna de las anteriores (universo SLA)
+    """
+    n = len(df)
+    zeros = np.zeros(n, dtype=bool)
+    flags = {}
+
+    # 1. Status: Cancelado, Fallida, Anulado
+    status_col = 'status_del_servicio'
+    if status_col in df.columns:
+        flags['is_cancelado'] = contains(df[status_col], EXCLUDED_STATUS_PATTERN).to_numpy()
+        concluido = category_mask(df[status_col], lambda s: s.str.strip().str.lower() == SLA_STATUS).to_numpy()
+    else:
+        flags['is_cancelado'] = concluido = zeros
+
+    # 2. Servicios Programados
+    flags['is_programado'] = programado_mask(df)
+
+    # 3. Keywords en motivos
+    pattern = '|'.join(EXCLUSION_KEYWORDS)
+    cita = zeros.copy()
+    for col in _motivo_columns(df.columns):
+        cita |= contains(df[col], pattern).to_numpy()
+    flags['is_cita_keyword'] = cita
+
+    # 4. Duración (sin la columna no se marca nada; el SLA medido queda en 0)
+    if 'duracion_minutos' in df.columns:
+        duracion = pd.to_numeric(df['duracion_minutos'], errors='coerce').to_numpy(dtype=float)
+        flags['is_duration_outlier'] = np.isnan(duracion) | (duracion < 0)
+    else:
+        flags['is_duration_outlier'] = zeros
+
+    flags['is_valid_sla'] = concluido & ~(flags['is_cancelado'] | flags['is_programado'] |
+                                          flags['is_cita_keyword'] | flags['is_duration_outlier'])
+    return pd.DataFrame(flags, index=df.index)[EXCLUSION_FLAGS]
+
+
+def materialize_exclusion_flags(df):
+    """
+    Agrega EXCLUSION_FLAGS como columnas bool (etapa de carga). Los cálculos
+    posteriores filtran por estas banderas en lugar de releer columnas de texto.
+    """
+    flags = exclusion_flags(df)
+    for col in EXCLUSION_FLAGS:
+        df[col] = flags[col].to_numpy()
+    return df
+
+
+def _exclusion_frame(df):
+    """Banderas materializadas si existen; si no, se calculan al vuelo"""
+    if set(EXCLUSION_FLAGS).issubset(df.columns):
+        return df[EXCLUSION_FLAGS]
+    return exclusion_flags(df)
+
+
+def sla_universe(df):
+    """Máscara del universo SLA (is_valid_sla), materializada o calculada"""
+    return _exclusion_frame(df)['is_valid_sla'].to_numpy()
+
+
+def exclusion_mask(df):
+    """True para registros fuera del análisis: status cancelado/anulado, programados, citas"""
+    flags = _exclusion_frame(df)
+    return (flags['is_cancelado'] | flags['is_programado'] | flags['is_cita_keyword']).to_numpy()
+
 
 def apply_exclusions(df):
     """Aplica exclusiones según metodología V3"""
-    df_clean = df.copy()
-    
-    # 1. Excluir por Status: Cancelado, Fallida, Anulado
+    return df[~exclusion_mask(df)]
+
+
+def kpi_flags(df):
+    """
+    Banderas booleanas por registro (KPI_FLAGS). Sumadas sobre cualquier
+    subconjunto dan numeradores/denominadores, así que se pueden agregar por
+    grupo (cubo, meses) sin recalcular nada a nivel de fila.
+    """
+    n = len(df)
+    zeros = np.zeros(n, dtype=bool)
+    flags = {'total': np.ones(n, dtype=bool)}
+
     status_col = 'status_del_servicio'
-    if status_col in df_clean.columns:
-        status_vals = df_clean[status_col].astype(str).str.lower()
-        mask = ~status_vals.str.contains('cancelado|fallido|anulado|fallida', case=False, na=False)
-        df_clean = df_clean[mask]
-    
-    # 2. Excluir Servicios Programados
-    prog_col = next((c for c in df_clean.columns if 'programad' in c.lower()), None)
-    if prog_col:
-        df_clean = df_clean[df_clean[prog_col].astype(str).str.lower() != 'si']
-    
-    # 3. Excluir Keywords en motivos
-    motivo_col = next((c for c in df_clean.columns if 'motivo' in c.lower()), None)
-    if motivo_col:
-        motivo_vals = df_clean[motivo_col].astype(str).str.lower()
-        pattern = '|'.join(EXCLUSION_KEYWORDS)
-        df_clean = df_clean[~motivo_vals.str.contains(pattern, case=False, na=False)]
-    
-    return df_clean
+    if status_col in df.columns:
+        flags['concluidos'] = contains(df[status_col], 'Concluido').to_numpy()
+    else:
+        flags['concluidos'] = zeros
+
+    # SLA: universo is_valid_sla (Concluido AND inmediato AND sin keywords AND duración calculable)
+    if 'origen_del_servicio' in df.columns:
+        foraneo = contains(df['origen_del_servicio'], 'FORAN').to_numpy()
+        local = category_mask(df['origen_del_servicio'], lambda s: s.str.upper() == 'LOCAL').to_numpy()
+    else:
+        foraneo = local = zeros
+    eligible = sla_universe(df)
+    if 'duracion_minutos' in df.columns:
+        # Límite por origen desde la tabla de reglas (vial local / foráneo)
+        vial = sla_flags(df, VIAL_SLA_RULES, base=eligible)
+        flags['sla_validos'] = eligible
+        flags['sla_cumple'] = np.logical_or.reduce([vial[f"{r['sla']}_num"].to_numpy() for r in VIAL_SLA_RULES])
+    else:
+        flags['sla_validos'] = flags['sla_cumple'] = zeros
+    flags['sla_local'] = eligible & local
+    flags['sla_foraneo'] = eligible & foraneo & ~local
+
+    # NPS (tabla de búsqueda de nps.py)
+    nps = nps_flags(df)
+    flags['nps_respuestas'] = nps['respuestas'].to_numpy()
+    flags['nps_promotores'] = nps['promotores'].to_numpy()
+    flags['nps_detractores'] = nps['detractores'].to_numpy()
+
+    return pd.DataFrame(flags, index=df.index)[KPI_FLAGS]
+
+
+def summarize_kpis(counts):
+    """
+    KPIs a partir de las banderas sumadas (Series/dict con KPI_FLAGS).
+
+    - sla: % de servicios válidos dentro del umbral por origen (medido en BBDD)
+    - sla_tiempo: promedio ponderado LOCAL/FORANEO con los valores de la hoja TIEMPO
+    - nps: %Promotores - %Detractores
+    """
+    counts = {k: int(counts[k]) for k in KPI_FLAGS}
+    metrics = {'total_servicios': counts['total'], 'concluidos': counts['concluidos']}
+
+    local, foraneo = counts['sla_local'], counts['sla_foraneo']
+    weighted = local + foraneo
+    metrics['sla_tiempo'] = ((local * SLA_TIEMPO['urbano']) + (foraneo * SLA_TIEMPO['rural'])) / weighted if weighted > 0 else 0
+
+    if counts['sla_validos'] > 0:
+        metrics['sla'] = counts['sla_cumple'] / counts['sla_validos'] * 100
+    else:
+        # Sin duraciones: se usa el ponderado de TIEMPO
+        metrics['sla'] = metrics['sla_tiempo']
+
+    respuestas = counts['nps_respuestas']
+    metrics['nps'] = (counts['nps_promotores'] - counts['nps_detractores']) / respuestas * 100 if respuestas > 0 else 0
+
+    return metrics
 
 
 def calculate_metrics(df):
-    """Calcula KPIs según metodología V3"""
-    metrics = {}
-    
-    # Total sin filtrar
-    metrics['total_servicios'] = len(df)
-    
-    # Aplicar exclusiones
-    df_clean = apply_exclusions(df)
-    
-    # Concluidos
+    """Calcula KPIs según metodología V3 (total, concluidos, SLA, NPS)"""
+    return summarize_kpis(kpi_flags(df).sum())
+
+
+# Status excluidos del denominador de NS / abandono
+INVALID_STATUSES = ['Cancelado al momento', 'Cancelado posterior', 'Anulado', 'Abortado', 'Duplicado', 'Prueba']
+ABANDONO_EXCLUDED_STATUSES = ['Anulado', 'Abortado', 'Duplicado', 'Prueba']
+
+# Meta de coordinación (contacto - asignación)
+COORD_LIMIT_MIN = 10
+
+# Columnas de la tabla mensual: (indicador, numerador, denominador)
+MONTHLY_KPIS = [
+    ('ns', 'ns_num', 'ns_den'),
+    ('abandono', 'abandono_num', 'abandono_den'),
+    ('coordinacion', 'coord_num', 'coord_den'),
+    ('quejas', 'quejas_num', 'total'),
+] + [(r['sla'], f"{r['sla']}_num", f"{r['sla']}_den") for r in SLA_RULES]
+
+# KPIs del diccionario de calculate_monthly_kpis (contrato previo, sin SLA por regla)
+LEGACY_MONTHLY_KPIS = ['ns', 'abandono', 'coordinacion', 'quejas']
+
+
+def coordination_minutes(df):
+    """Minutos de asignación a contacto por registro (NaN si falta o es negativo)"""
+    if not {'fec_contacto', 'hrs_contacto', 'fec_asignacion', 'hrs_asignacion'}.issubset(df.columns):
+        return np.full(len(df), np.nan)
+    dt_contact = combine_date_time(df['fec_contacto'], df['hrs_contacto'])
+    dt_assign = combine_date_time(df['fec_asignacion'], df['hrs_asignacion'])
+    diff_min = minutes_between(dt_assign, dt_contact).to_numpy(dtype=float)
+    return np.where(diff_min >= 0, diff_min, np.nan)
+
+
+def sla_rules_base(df):
+    """Universo de la tabla de reglas SLA: concluidos no programados"""
+    if 'status_del_servicio' not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return contains(df['status_del_servicio'], 'Concluido').to_numpy() & ~programado_mask(df)
+
+
+def monthly_kpi_flags(df):
+    """
+    Banderas booleanas por registro (numeradores/denominadores de los KPIs mensuales).
+    Se evalúan una sola vez sobre todo el DataFrame.
+    """
+    n = len(df)
+    zeros = np.zeros(n, dtype=bool)
+    flags = {'total': np.ones(n, dtype=bool)}
+
+    # 1-2. NS y Abandono
     status_col = 'status_del_servicio'
-    if status_col in df_clean.columns:
-        metrics['concluidos'] = len(df_clean[df_clean[status_col].astype(str).str.contains('Concluido', case=False, na=False)])
+    if status_col in df.columns:
+        status = df[status_col]
+        valid = ~category_mask(status, lambda s: s.isin(INVALID_STATUSES)).to_numpy()
+        flags['ns_den'] = valid
+        flags['ns_num'] = valid & contains(status, 'Concluido').to_numpy()
+        flags['abandono_num'] = contains(status, 'Cancelado|Abandono').to_numpy()
+        flags['abandono_den'] = ~category_mask(status, lambda s: s.isin(ABANDONO_EXCLUDED_STATUSES)).to_numpy()
     else:
-        metrics['concluidos'] = 0
-    
-    # SLA - Promedio ponderado usando valores de hoja TIEMPO
-    # Fuente: Boletin V3 usa SLA pre-calculado de hoja TIEMPO
-    origen_col = 'origen_del_servicio'
-    if origen_col in df_clean.columns:
-        counts = df_clean[origen_col].value_counts()
-        local = counts.get('LOCAL', 0)
-        foraneo = counts.get('FORANEO', 0)
-        total = local + foraneo
-        
-        if total > 0:
-            # Promedio ponderado con valores de TIEMPO sheet
-            metrics['sla'] = (
-                (local * SLA_TIEMPO['urbano']) + 
-                (foraneo * SLA_TIEMPO['rural'])
-            ) / total
-        else:
-            metrics['sla'] = 0
+        flags['ns_num'] = flags['ns_den'] = zeros
+        flags['abandono_num'] = flags['abandono_den'] = zeros
+
+    # 3. Coordinación: Contacto - Asignación (negativos = error de datos)
+    diff_min = coordination_minutes(df)
+    valid_diff = ~np.isnan(diff_min)
+    flags['coord_den'] = valid_diff
+    flags['coord_num'] = valid_diff & (diff_min <= COORD_LIMIT_MIN)
+
+    # 4. Quejas procedentes
+    if 'es_queja' in df.columns:
+        flags['quejas_num'] = category_mask(df['es_queja'], lambda s: s.str.lower() == 'si').to_numpy()
+    elif 'tipo_de_servicio' in df.columns:
+        flags['quejas_num'] = contains(df['tipo_de_servicio'], 'Queja').to_numpy()
     else:
-        metrics['sla'] = 0
-    
-    # NPS
-    metrics['nps'] = calculate_nps(df_clean)
-    
-    return metrics
+        flags['quejas_num'] = zeros
+
+    # 5. SLA contractuales (tabla de reglas, una pasada): Concluido, no programado
+    sla = sla_flags(df, SLA_RULES, base=sla_rules_base(df))
+
+    return pd.concat([pd.DataFrame(flags, index=df.index), sla], axis=1)
+
+
+# Ventanas de agregación sobre los conteos mensuales
+WINDOWS = ['mes', 'trimestre', 'semestre', 'ytd', 'r12']
 
 
-def calculate_nps(df):
-    """NPS según metodología V3"""
-    nps_col = None
-    for c in df.columns:
-        if 'nps' in c.lower() or ('calificacion' in c.lower() and 'servicio' in c.lower()):
-            nps_col = c
-            break
-    
-    if not nps_col:
-        return 0
-    
-    nps_data = pd.to_numeric(df[nps_col], errors='coerce').dropna()
-    if len(nps_data) == 0:
-        return 0
-    
-    def categorize(val):
-        if val == 10 or val == 5: return 'PROMOTOR'
-        if val >= 7 or val == 4: return 'PASIVO'
-        return 'DETRACTOR'
-    
-    cats = nps_data.apply(categorize)
-    prom = (cats == 'PROMOTOR').sum() / len(cats)
-    det = (cats == 'DETRACTOR').sum() / len(cats)
-    
-    return (prom - det) * 100
+def _count_columns():
+    return list(dict.fromkeys(['total'] + [c for _, num, den in MONTHLY_KPIS for c in (num, den)]))
 
 
+def monthly_kpi_counts(df):
+    """
+    Numeradores/denominadores de los KPIs mensuales por periodo (period[M]).
+    El índice es continuo entre el primer y el último mes (meses sin registros
+    en 0), de modo que las ventanas se obtienen sumando filas sin releer el
+    DataFrame.
+    """
+    columns = _count_columns()
+    if PERIOD_COLUMN in df.columns:
+        periods = month_periods(df[PERIOD_COLUMN])
+    elif 'mes' in df.columns:
+        periods = month_periods(df['mes'])
+    else:
+        return pd.DataFrame(columns=columns, index=pd.PeriodIndex([], freq='M'), dtype=np.int64)
+
+    return complete_months(monthly_kpi_flags(df).groupby(periods).sum())
+
+
+def complete_months(counts):
+    """
+    Sumas de monthly_kpi_flags por periodo -> formato de monthly_kpi_counts
+    (índice mensual continuo, meses sin registros en 0). Permite agregar las
+    banderas por otra vía (p.ej. selection.RowSelection.group_sum).
+    """
+    counts = counts[_count_columns()]
+    if counts.empty:
+        return counts.astype(np.int64)
+    full_range = pd.period_range(counts.index.min(), counts.index.max(), freq='M', name=PERIOD_COLUMN)
+    return counts.reindex(full_range, fill_value=0).astype(np.int64)
+
+
+def window_counts(counts, window='mes'):
+    """
+    Suma los conteos mensuales por ventana. El índice es el mes de cierre de
+    cada ventana:
+      - 'mes': sin cambios
+      - 'trimestre' / 'semestre': una fila por trimestre/semestre calendario,
+        cerrada en su último mes con datos
+      - 'ytd': acumulado del año hasta cada mes
+      - 'r12': últimos 12 meses hasta cada mes
+    """
+    idx = counts.index
+    if window == 'mes':
+        return counts
+    if window == 'ytd':
+        return counts.groupby(idx.year).cumsum()
+    if window == 'r12':
+        return counts.rolling(12, min_periods=1).sum().astype(np.int64)
+    if window == 'trimestre':
+        keys = idx.year * 4 + (idx.month - 1) // 3
+    elif window == 'semestre':
+        keys = idx.year * 2 + (idx.month - 1) // 6
+    else:
+        raise ValueError(f"Ventana desconocida: {window} (opciones: {', '.join(WINDOWS)})")
+    closing = pd.Series(idx, index=idx).groupby(keys).max()
+    totals = counts.groupby(keys).sum()
+    totals.index = pd.PeriodIndex(closing.to_numpy(), freq='M', name=idx.name)
+    return totals
+
+
+def kpi_percentages(counts):
+    """Agrega los porcentajes (numerador/denominador × 100, NaN sin denominador)"""
+    counts = counts.copy()
+    for kpi, num, den in MONTHLY_KPIS:
+        n, d = counts[num].to_numpy(), counts[den].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            counts[kpi] = np.where(d > 0, n / d * 100, np.nan)
+
+    # 5. Suma de recobros: NO HAY DATOS DE COSTO. Se devuelve 0 explícitamente.
+    counts['recobros'] = 0
+    return counts
+
+
+def calculate_monthly_kpis_frame(df):
+    """
+    Indicadores mensuales en formato tidy: una fila por mes con registros
+    (índice 'Oct-25'), con numeradores, denominadores y porcentajes.
+    Sin denominador el porcentaje queda NaN.
+    """
+    counts = monthly_kpi_counts(df)
+    counts = counts[counts['total'] > 0]
+    table = kpi_percentages(counts)
+    table.index = pd.Index([period_label(p) for p in table.index], name='mes')
+    return table
+
+
+def indicator_matrix(counts, window='mes'):
+    """
+    Matriz numérica indicador × mes de cierre (Period) para la ventana dada,
+    a partir de monthly_kpi_counts. Las ventanas suman numeradores y
+    denominadores antes de dividir. El formato se aplica solo al renderizar.
+    """
+    table = kpi_percentages(window_counts(counts, window))
+    return table[[k for k, _, _ in MONTHLY_KPIS]].T.astype(float)
+
 
 def calculate_monthly_kpis(df):
     """
-    Calcula indicadores mensuales (NS, Abandono, Coordinación, Quejas, Recobros)
-    Devuelve un diccionario anidado.
+    Calcula indicadores mensuales (NS, Abandono, Coordinación, Quejas, Recobros).
+    Devuelve un diccionario anidado {mes: {kpi: %}} agrupado por la etiqueta de
+    `mes` (también las que no son un mes válido); sin denominador el % es 0.
+    Las banderas se evalúan una vez y se suman por mes en un solo groupby.
     """
-    results = {}
-    
     if 'mes' not in df.columns:
-        return results
-        
-    # Exclusiones
-    INVALID_STATUSES = ['Cancelado al momento', 'Cancelado posterior', 'Anulado', 'Abortado', 'Duplicado', 'Prueba']
-    
-    def combine_date_time(date_val, time_val):
-        """Helper to combine date and time columns"""
-        try:
-            d = pd.to_datetime(date_val)
-            if pd.isna(d): return pd.NaT
-            
-            # Formatos de hora pueden variar (str vs datetime.time)
-            if pd.isna(time_val): return pd.NaT
-            
-            t_str = str(time_val).strip()
-            # Si ya es datetime.time
-            if hasattr(time_val, 'hour'):
-                t_str = time_val.strftime('%H:%M:%S')
-                
-            # Combinar string
-            dt_str = f"{d.strftime('%Y-%m-%d')} {t_str}"
-            return pd.to_datetime(dt_str, errors='coerce')
-        except:
-            return pd.NaT
-
-    # Agrupar por mes
-    for mes, group in df.groupby('mes'):
-        metrics = {}
-        total_bruto = len(group)
-        if total_bruto == 0: continue
-        
-        # Filtrar Validos (para NS y SLAs)
-        status_col = 'status_del_servicio'
-        if status_col in group.columns:
-            # Excluir status invalidos para el denominador de eficiencia
-            mask_valid = ~group[status_col].astype(str).isin(INVALID_STATUSES)
-            group_valid = group[mask_valid]
-            total_valid = len(group_valid)
-            
-            # 1. % Cumplimiento del NS (Concluidos / Total Valido)
-            concluidos = group_valid[group_valid[status_col].astype(str).str.contains('Concluido', case=False, na=False)].shape[0]
-            metrics['ns'] = (concluidos / total_valid * 100) if total_valid > 0 else 0
-            
-            # 2. % Máximo de Abandono (Cancelados / Total sin Anulado/Abortado/Duplicado/Prueba)
-            # Contar abandonos del grupo original (incluye Cancelados)
-            mask_abandono = group[status_col].astype(str).str.contains('Cancelado|Abandono', case=False, na=False)
-            abandonos = mask_abandono.sum()
-            # Denominador: excluir solo Anulado, Abortado, Duplicado, Prueba (NO Cancelados)
-            exclusions_abandono = ['Anulado', 'Abortado', 'Duplicado', 'Prueba']
-            mask_valid_abandono = ~group[status_col].astype(str).isin(exclusions_abandono)
-            total_valid_abandono = mask_valid_abandono.sum()
-            metrics['abandono'] = (abandonos / total_valid_abandono * 100) if total_valid_abandono > 0 else 0
-        else:
-            metrics['ns'] = 0
-            metrics['abandono'] = 0
-            
-        # 3. Coordinación (Tiempo contacto - asignacion <= 10 min)
-        # Usa la lógica: Asignación ocurre primero, luego Contacto
-        # Diff = Contacto - Asignación (positivo = tiempo de espera)
-        cumple_coord = 0
-        valid_coord_count = 0
-        
-        if {'fec_contacto', 'hrs_contacto', 'fec_asignacion', 'hrs_asignacion'}.issubset(group.columns):
-            dt_contact = group.apply(lambda x: combine_date_time(x['fec_contacto'], x['hrs_contacto']), axis=1)
-            dt_assign = group.apply(lambda x: combine_date_time(x['fec_asignacion'], x['hrs_asignacion']), axis=1)
-            
-            # FIXED: Contact - Assign (tiempo de espera desde asignación hasta contacto)
-            diff_min = (dt_contact - dt_assign).dt.total_seconds() / 60
-            
-            # Filtrar solo no-nulos y no-negativos (negativos = error de datos)
-            valid_mask = diff_min.notna() & (diff_min >= 0)
-            valid_diffs = diff_min[valid_mask]
-            
-            if len(valid_diffs) > 0:
-                cumple_coord = (valid_diffs <= 10).sum()
-                valid_coord_count = len(valid_diffs)
-                metrics['coordinacion'] = (cumple_coord / valid_coord_count) * 100
-            else:
-                metrics['coordinacion'] = 0
-        else:
-            metrics['coordinacion'] = 0
-
-        # 4. % Quejas procedentes
-        quejas_count = 0
-        if 'es_queja' in group.columns:
-            quejas_count = group[group['es_queja'].astype(str).str.lower() == 'si'].shape[0]
-        elif 'tipo_de_servicio' in group.columns:
-            quejas_count = group[group['tipo_de_servicio'].astype(str).str.contains('Queja', case=False, na=False)].shape[0]
-            
-        metrics['quejas'] = (quejas_count / total_bruto) * 100
-        
-        # 5. Suma de recobros
+        return {}
+    kpis = [k for k in MONTHLY_KPIS if k[0] in LEGACY_MONTHLY_KPIS]
+    columns = list(dict.fromkeys(c for _, num, den in kpis for c in (num, den)))
+    counts = monthly_kpi_flags(df)[columns].groupby(df['mes'], observed=True).sum()
+    results = {}
+    for mes, row in counts.iterrows():
+        metrics = {kpi: (row[num] / row[den] * 100 if row[den] > 0 else 0) for kpi, num, den in kpis}
         # NO HAY DATOS DE COSTO. Se devuelve 0 explícitamente.
         metrics['recobros'] = 0
-            
         results[mes] = metrics
-        
     return results
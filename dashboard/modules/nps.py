@@ -0,0 +1,96 @@
+"""
+ADS Boletín - NPS Module
+Clasificación NPS vectorizada (tabla de búsqueda) y NPS por grupos en un solo
+groupby.
+
+La columna de calificación mezcla escala 0-10 y 1-5 (auditoría V3): 10 y 5 son
+promotores, 7-9 y 4 pasivos, el resto detractores.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+NPS_CATEGORIES = ['PROMOTOR', 'PASIVO', 'DETRACTOR']
+
+# Clasificación NPS de auditoría V3. Valores no listados (0-10) -> DETRACTOR
+NPS_BUCKETS = {
+    'PROMOTOR': [10, 5],
+    'PASIVO': [9, 8, 7, 4],
+}
+NPS_MAX_SCORE = 10
+
+# Índice = calificación, valor = posición en NPS_CATEGORIES
+NPS_LOOKUP = np.full(NPS_MAX_SCORE + 1, NPS_CATEGORIES.index('DETRACTOR'), dtype=np.int8)
+for _category, _scores in NPS_BUCKETS.items():
+    NPS_LOOKUP[_scores] = NPS_CATEGORIES.index(_category)
+
+
+@lru_cache(maxsize=32)
+def _find_nps_column(columns):
+    return next((c for c in columns if 'nps' in c.lower() and 'calificacion' in c.lower()), None)
+
+
+def nps_column(columns):
+    """Columna de calificación NPS (0-10 / 1-5); resultado memoizado por esquema"""
+    return _find_nps_column(tuple(str(c) for c in columns))
+
+
+def category_codes(scores):
+    """
+    Código por registro (0=PROMOTOR, 1=PASIVO, 2=DETRACTOR, -1=sin respuesta).
+    Solo calificaciones enteras en 0-10 cuentan como respuesta.
+    """
+    values = pd.to_numeric(pd.Series(scores), errors='coerce').to_numpy(dtype=float)
+    valid = (values >= 0) & (values <= NPS_MAX_SCORE) & (values == np.floor(values))
+    codes = np.full(len(values), -1, dtype=np.int8)
+    codes[valid] = NPS_LOOKUP[values[valid].astype(np.int64)]
+    return codes
+
+
+def categorize_scores(scores):
+    """Series categórica PROMOTOR/PASIVO/DETRACTOR (NaN sin respuesta)"""
+    s = pd.Series(scores)
+    return pd.Series(pd.Categorical.from_codes(category_codes(s), NPS_CATEGORIES), index=s.index)
+
+
+def nps_flags(df):
+    """Banderas por registro (respuesta/promotor/pasivo/detractor) para sumar por grupo"""
+    col = nps_column(df.columns)
+    codes = category_codes(df[col]) if col else np.full(len(df), -1, dtype=np.int8)
+    return pd.DataFrame({
+        'respuestas': codes >= 0,
+        'promotores': codes == 0,
+        'pasivos': codes == 1,
+        'detractores': codes == 2,
+    }, index=df.index)
+
+
+def nps_percentages(counts):
+    """Conteos (respuestas/promotores/pasivos/detractores) -> + pct_* y nps"""
+    counts = counts.astype(np.int64)
+    total = counts['respuestas'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for col in ['promotores', 'pasivos', 'detractores']:
+            counts[f'pct_{col}'] = np.where(total > 0, counts[col].to_numpy() / total * 100, 0.0)
+    counts['nps'] = counts['pct_promotores'] - counts['pct_detractores']
+    return counts
+
+
+def nps_summary(df, by=None):
+    """
+    NPS con conteos y porcentajes. `by`: columna o lista de columnas (mes, plan,
+    ciudad, broker...) -> una fila por grupo, calculadas en un solo groupby.
+    Sin `by` devuelve una fila con el total.
+    """
+    flags = nps_flags(df)
+    if by is None:
+        return nps_percentages(flags.sum().to_frame('total').T)
+    keys = [by] if isinstance(by, str) else list(by)
+    counts = flags.groupby([df[k] for k in keys], observed=True).sum()
+    return nps_percentages(counts)
+
+
+def calculate_nps(df):
+    """NPS (%Promotores - %Detractores) del DataFrame completo"""
+    return float(nps_summary(df)['nps'].iloc[0])
@@ -0,0 +1,148 @@
+"""
+ADS Boletín - Schema Module
+Tipado de la BBDD al cargar: categóricas para columnas de baja cardinalidad y
+strings respaldados por Arrow para texto libre.
+
+Los predicados de texto ('contiene Concluido', 'FORAN', ...) se evalúan una sola
+vez sobre las categorías y se difunden a las filas por sus códigos.
+"""
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    TEXT_DTYPE = 'string[pyarrow]'
+except ImportError:
+    TEXT_DTYPE = 'string'
+
+# Columnas de baja cardinalidad (dimensiones de filtros y KPIs)
+CATEGORICAL_COLUMNS = [
+    'mes',
+    'status_del_servicio',
+    'origen_del_servicio',
+    'tipo_de_servicio',
+    'servicio_brindado',
+    'servicios_programados',
+    'nombre_del_plan',
+    'ciudad',
+    'provincia',
+    'broker',
+    'linea_de_negocio',
+    'motivo_cancelacion',
+    'sub_motivo_cancelacion',
+    'nps_tipo_de_cliente',
+]
+
+# Banderas del sistema (CUMPLE / NO CUMPLE)
+CATEGORICAL_PREFIXES = ('cumplimiento_',)
+
+MONTH_ORDER = {'Ene': 1, 'Feb': 2, 'Mar': 3, 'Abr': 4, 'May': 5, 'Jun': 6,
+               'Jul': 7, 'Ago': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dic': 12}
+MONTH_NAMES = {number: name for name, number in MONTH_ORDER.items()}
+
+# Columna derivada de `mes` al cargar (period[M])
+PERIOD_COLUMN = 'periodo'
+
+
+def month_to_period(label):
+    """'Oct-25' -> Period('2025-10', 'M'); NaT si la etiqueta no es un mes"""
+    text = str(label)
+    name, _, year = text.partition('-')
+    if name not in MONTH_ORDER or not year.isdigit():
+        return pd.NaT
+    year = int(year)
+    return pd.Period(year=year + 2000 if year < 100 else year, month=MONTH_ORDER[name], freq='M')
+
+
+def period_label(period):
+    """Period('2025-10', 'M') -> 'Oct-25'"""
+    return f"{MONTH_NAMES[period.month]}-{period.year % 100:02d}"
+
+
+def month_sort_key(label):
+    """Clave cronológica para etiquetas 'Oct-25' (año, mes); lo que no es mes va primero"""
+    period = month_to_period(label)
+    if period is pd.NaT:
+        return (0, 0)
+    return (period.year, period.month)
+
+
+def month_periods(series):
+    """Etiquetas de mes -> Series period[M], convirtiendo una vez por valor distinto"""
+    if isinstance(series.dtype, pd.PeriodDtype):
+        return series
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, values = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, values = pd.factorize(series)
+    # Código -1 (nulo) -> última posición (NaT)
+    lookup = pd.PeriodIndex([month_to_period(v) for v in values] + [pd.NaT], freq='M')
+    return pd.Series(lookup[codes], index=series.index, name=PERIOD_COLUMN)
+
+
+def sort_month_labels(labels):
+    """Etiquetas de mes en orden cronológico"""
+    return sorted(labels, key=month_sort_key)
+
+
+def _is_categorical_column(col):
+    return col in CATEGORICAL_COLUMNS or str(col).startswith(CATEGORICAL_PREFIXES)
+
+
+def apply_schema(df):
+    """
+    Convierte columnas de baja cardinalidad a category y el texto libre a
+    strings Arrow. `mes` queda como categórica ordenada cronológicamente y se
+    materializa `periodo` (period[M]) para ventanas trimestre/YTD/12 meses.
+    """
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            continue
+        if _is_categorical_column(col):
+            if s.dtype == object:
+                # Mezclas int/str (p.ej. ciudad) se unifican a texto
+                s = s.map(lambda v: v if pd.isna(v) or isinstance(v, str) else str(v))
+            if col == 'mes':
+                categories = sort_month_labels(s.dropna().unique())
+                df[col] = pd.Categorical(s, categories=categories, ordered=True)
+            else:
+                df[col] = s.astype('category')
+        elif s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) == 'string':
+            df[col] = s.astype(TEXT_DTYPE)
+    if 'mes' in df.columns and PERIOD_COLUMN not in df.columns:
+        df[PERIOD_COLUMN] = month_periods(df['mes'])
+    return df
+
+
+def category_mask(series, predicate):
+    """
+    Máscara booleana de `predicate` (Series[str] -> Series[bool]) sobre la columna.
+
+    El predicado corre una vez por valor distinto (categorías, o factorize para
+    columnas no categóricas) y se difunde por códigos. Los nulos se evalúan como
+    'nan', igual que con astype(str).
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, values = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, values = pd.factorize(series)
+    labels = pd.Series(list(pd.Index(values).astype(str)) + ['nan'])
+    lookup = predicate(labels).fillna(False).to_numpy(dtype=bool)
+    # Código -1 (nulo) -> última posición ('nan')
+    return pd.Series(lookup[codes], index=series.index)
+
+
+def contains(series, pattern, case=False):
+    """Equivalente a series.astype(str).str.contains(pattern) evaluado por categoría"""
+    return category_mask(series, lambda s: s.str.contains(pattern, case=case, na=False))
+
+
+def observed_counts(series):
+    """value_counts sin las categorías que no aparecen en el filtro actual"""
+    counts = series.value_counts()
+    return counts[counts > 0]
+
+
+def memory_mb(df):
+    """Memoria profunda del DataFrame en MB"""
+    return df.memory_usage(deep=True).sum() / 1e6
@@ -0,0 +1,65 @@
+"""
+ADS Boletín - Row Selection Module
+Vistas de filas sin copia: DataFrame base + arreglo de posiciones.
+
+Las secciones componen selecciones (filtros del sidebar, tipo de servicio...)
+combinando posiciones y máscaras evaluadas sobre el DataFrame base. Los
+conteos y sumas por grupo se resuelven con los códigos de las columnas y
+np.bincount; solo se materializan las columnas que una vista pide
+explícitamente.
+"""
+import numpy as np
+import pandas as pd
+
+
+class RowSelection:
+    """Filas `positions` del DataFrame base `frame` (sin copiar columnas)"""
+
+    def __init__(self, frame, positions=None):
+        self.frame = frame
+        if positions is None:
+            positions = np.arange(len(frame))
+        self.positions = np.asarray(positions, dtype=np.intp)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def where(self, mask):
+        """Sub-selección con una máscara booleana alineada al DataFrame base"""
+        mask = np.asarray(mask, dtype=bool)
+        return RowSelection(self.frame, self.positions[mask[self.positions]])
+
+    def take(self, columns=None):
+        """Materializa solo las columnas pedidas para las filas seleccionadas"""
+        frame = self.frame if columns is None else self.frame[list(columns)]
+        return frame.take(self.positions)
+
+    def _group_codes(self, by):
+        """Códigos de grupo de las filas seleccionadas y etiquetas de cada código"""
+        column = self.frame[by]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            return column.cat.codes.to_numpy()[self.positions], column.cat.categories
+        codes, uniques = pd.factorize(column.take(self.positions), sort=True)
+        return codes, uniques
+
+    def counts(self, column):
+        """Equivalente a observed_counts(df[column]) sobre la selección"""
+        codes, labels = self._group_codes(column)
+        counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+        result = pd.Series(counts, index=pd.Index(labels, name=column), name='count')
+        return result[result > 0].sort_values(ascending=False, kind='stable')
+
+    def group_sum(self, flags, by):
+        """
+        Suma de las banderas/columnas numéricas de `flags` (alineado por
+        posición al DataFrame base) por grupo de `by`. Sin copiar `flags`.
+        """
+        codes, labels = self._group_codes(by)
+        valid = codes >= 0
+        codes = codes[valid]
+        positions = self.positions[valid]
+        sums = {}
+        for col in flags.columns:
+            values = flags[col].to_numpy()[positions]
+            sums[col] = np.bincount(codes, weights=values, minlength=len(labels)).astype(np.int64)
+        return pd.DataFrame(sums, index=pd.Index(labels, name=by))
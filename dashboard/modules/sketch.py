@@ -0,0 +1,92 @@
+"""
+ADS Boletín - Quantile Sketch Module
+Sketches de cuantiles con error relativo acotado (buckets logarítmicos, estilo
+DDSketch) para tiempos de respuesta en minutos.
+
+Un sketch es un vector de conteos por bucket: dos sketches se combinan
+sumándolos, así que se guardan por celda del cubo y los percentiles de
+cualquier combinación de filtros salen de sumar filas, sin ordenar las
+duraciones crudas. El valor reportado para cada bucket está a menos de
+SKETCH_RELATIVE_ACCURACY del valor real.
+"""
+import numpy as np
+import pandas as pd
+
+SKETCH_RELATIVE_ACCURACY = 0.02
+SKETCH_MIN_VALUE = 0.1      # minutos; valores menores caen en el bucket 0
+SKETCH_MAX_VALUE = 1e5      # minutos; valores mayores caen en el último bucket
+SKETCH_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+SKETCH_BUCKETS = int(np.ceil(np.log(SKETCH_MAX_VALUE / SKETCH_MIN_VALUE) / np.log(SKETCH_GAMMA))) + 2
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95)
+
+# Valor representativo de cada bucket (centro geométrico; bucket 0 = 0 minutos)
+_edges = SKETCH_MIN_VALUE * SKETCH_GAMMA ** np.arange(SKETCH_BUCKETS - 1)
+BUCKET_VALUES = np.concatenate([[0.0], _edges * 2 * SKETCH_GAMMA / (1 + SKETCH_GAMMA)])
+
+
+def bucket_index(values):
+    """Bucket de cada valor (NaN y negativos -> -1)"""
+    values = np.asarray(values, dtype=float)
+    index = np.full(len(values), -1, dtype=np.int64)
+    valid = ~np.isnan(values) & (values >= 0)
+    small = valid & (values < SKETCH_MIN_VALUE)
+    index[small] = 0
+    large = valid & ~small
+    scaled = np.log(values[large] / SKETCH_MIN_VALUE) / np.log(SKETCH_GAMMA)
+    index[large] = np.minimum(1 + np.floor(scaled).astype(np.int64), SKETCH_BUCKETS - 1)
+    return index
+
+
+def build_sketches(groups, values, n_groups):
+    """
+    Matriz (n_groups × SKETCH_BUCKETS) de conteos: fila g = sketch de los
+    valores con groups == g. Grupos < 0 o valores inválidos se ignoran.
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    buckets = bucket_index(values)
+    keep = (groups >= 0) & (buckets >= 0)
+    flat = groups[keep] * SKETCH_BUCKETS + buckets[keep]
+    counts = np.bincount(flat, minlength=n_groups * SKETCH_BUCKETS)
+    return counts.reshape(n_groups, SKETCH_BUCKETS).astype(np.int32)
+
+
+def merge_sketches(sketches, rows=None):
+    """Sketch combinado (suma) de las filas dadas (todas si rows es None)"""
+    selected = sketches if rows is None else sketches[np.asarray(rows, dtype=np.int64)]
+    return selected.sum(axis=0, dtype=np.int64)
+
+
+def sketch_quantiles(sketch, quantiles=DEFAULT_QUANTILES):
+    """Cuantiles de un sketch (convención 'lower'); NaN si está vacío"""
+    sketch = np.asarray(sketch)
+    n = sketch.sum()
+    if n == 0:
+        return np.full(len(quantiles), np.nan)
+    cumulative = np.cumsum(sketch)
+    ranks = np.floor(np.asarray(quantiles, dtype=float) * (n - 1))
+    return BUCKET_VALUES[np.searchsorted(cumulative, ranks, side='right')]
+
+
+def grouped_quantiles(sketches, rows, keys, quantiles=DEFAULT_QUANTILES):
+    """
+    Percentiles por grupo: suma los sketches de `rows` según `keys` (una
+    etiqueta por fila) y devuelve un DataFrame con n y p50/p90/... por grupo.
+    """
+    codes, labels = pd.factorize(pd.Series(keys), sort=False)
+    rows = np.asarray(rows, dtype=np.int64)
+    valid = codes >= 0
+    # Filas ordenadas por grupo y sumadas por tramos (reduceat)
+    order = np.argsort(codes[valid], kind='stable')
+    sorted_codes = codes[valid][order]
+    merged = np.zeros((len(labels), SKETCH_BUCKETS), dtype=np.int64)
+    if len(sorted_codes):
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        merged[sorted_codes[starts]] = np.add.reduceat(
+            sketches[rows[valid][order]].astype(np.int64), starts, axis=0)
+    result = pd.DataFrame(
+        [sketch_quantiles(s, quantiles) for s in merged],
+        index=pd.Index(labels),
+        columns=[f'p{round(q * 100)}' for q in quantiles])
+    result.insert(0, 'n', merged.sum(axis=1))
+    return result
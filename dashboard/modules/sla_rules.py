@@ -0,0 +1,215 @@
+"""
+ADS Boletín - SLA Rules Module
+Motor de SLA declarativo: cada SLA contractual es una fila de SLA_RULES
+(categoría de servicio, origen, par de eventos, límite en minutos, meta).
+
+Todas las reglas se evalúan en una sola pasada: los timestamps de cada evento,
+las duraciones de cada par y las máscaras de origen/categoría se calculan una
+vez y se comparten entre reglas. Agregar un SLA nuevo es agregar una fila.
+Opcionalmente se contrasta cada regla con la columna cumplimiento_* que trae
+el export del sistema.
+
+Para análisis de sensibilidad (¿qué pasa si el límite cambia?) cada regla
+guarda además sus duraciones ordenadas (ECDF): el cumplimiento para cualquier
+umbral es un searchsorted, sin recalcular banderas.
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    from .schema import category_mask, contains
+    from .timestamps import combine_date_time, minutes_between
+except ImportError:
+    from schema import category_mask, contains
+    from timestamps import combine_date_time, minutes_between
+
+# Tabla de reglas:
+#   sla: clave del indicador (columnas {sla}_num / {sla}_den)
+#   categoria: regex sobre tipo_de_servicio (None = todas)
+#   origen: 'LOCAL' / 'FORANEO' (None = ambos)
+#   inicio, fin: eventos de EVENT_COLUMNS; limite en minutos; meta en %
+#   columna_sistema: bandera CUMPLE / NO CUMPLE del export para contrastar
+# Las reglas actuales van con categoria None: el export calcula las columnas
+# cumplimiento_* (vial / legal) para todos los servicios sin importar su tipo, y
+# filtrar por categoría rompería la paridad con ellas. Un SLA propio de una
+# línea de servicio se agrega como fila con su regex en `categoria`.
+SLA_RULES = [
+    {'sla': 'sla_asignacion', 'nombre': 'Asignación Local y Foráneo', 'categoria': None, 'origen': None,
+     'inicio': 'registro', 'fin': 'asignacion', 'limite': 10, 'meta': 85.0,
+     'columna_sistema': 'cumplimiento_asignacion\n(10min)'},
+    {'sla': 'sla_vial_local', 'nombre': 'Contacto Vial-Local', 'categoria': None, 'origen': 'LOCAL',
+     'inicio': 'asignacion', 'fin': 'contacto', 'limite': 45, 'meta': 86.5,
+     'columna_sistema': 'cumplimiento_local_-_vial\n(45min)'},
+    {'sla': 'sla_situ_local', 'nombre': 'Contacto In situ - Local', 'categoria': None, 'origen': 'LOCAL',
+     'inicio': 'asignacion', 'fin': 'contacto', 'limite': 35, 'meta': 80.0,
+     'columna_sistema': 'cumplimiento_local_-_legal\n(35min)'},
+    {'sla': 'sla_vial_foraneo', 'nombre': 'Contacto Vial - Foráneo', 'categoria': None, 'origen': 'FORANEO',
+     'inicio': 'asignacion', 'fin': 'contacto', 'limite': 90, 'meta': 86.5,
+     'columna_sistema': 'cumplimiento_foraneo_-_vial\n(90min)'},
+    {'sla': 'sla_situ_foraneo', 'nombre': 'Contacto In situ - Foráneo', 'categoria': None, 'origen': 'FORANEO',
+     'inicio': 'asignacion', 'fin': 'contacto', 'limite': 60, 'meta': 90.0,
+     'columna_sistema': 'cumplimiento_foraneo_-_legal\n(60min)'},
+]
+
+# Eventos: par fecha/hora de la BBDD y timestamp ya calculado al ingerir (si existe)
+EVENT_COLUMNS = {
+    'registro': ('fec_registro', 'hrs_registro', None),
+    'asignacion': ('fec_asignacion', 'hrs_asignacion', 'ts_asignacion'),
+    'contacto': ('fec_contacto', 'hrs_contacto', 'ts_contacto'),
+}
+
+# Duraciones ya calculadas al ingerir (negativos -> NaN)
+PRECOMPUTED_DURATIONS = {('asignacion', 'contacto'): 'duracion_minutos'}
+
+ORIGEN_MATCHERS = {
+    'LOCAL': lambda s: s.str.upper() == 'LOCAL',
+    'FORANEO': lambda s: s.str.contains('FORAN', case=False, na=False),
+}
+
+
+def rule(sla, rules=SLA_RULES):
+    """Fila de la tabla de reglas por clave"""
+    return next(r for r in rules if r['sla'] == sla)
+
+
+def control_text(r):
+    """Punto de control legible: 'Mínimo 86.50% Antes de 45 minutos'"""
+    meta = f"{r['meta']:.0f}%" if float(r['meta']).is_integer() else f"{r['meta']:.2f}%"
+    return f"Mínimo {meta} Antes de {r['limite']} minutos"
+
+
+def _event_timestamp(df, event):
+    fec, hrs, precomputed = EVENT_COLUMNS[event]
+    if precomputed and precomputed in df.columns:
+        return pd.to_datetime(df[precomputed], errors='coerce')
+    if fec in df.columns and hrs in df.columns:
+        return combine_date_time(df[fec], df[hrs])
+    return None
+
+
+def _durations(df, pairs):
+    """Minutos por par (inicio, fin), calculando cada evento una sola vez"""
+    timestamps = {}
+    durations = {}
+    for start, end in pairs:
+        precomputed = PRECOMPUTED_DURATIONS.get((start, end))
+        if precomputed and precomputed in df.columns:
+            durations[(start, end)] = pd.to_numeric(df[precomputed], errors='coerce').to_numpy(dtype=float)
+            continue
+        for event in (start, end):
+            if event not in timestamps:
+                timestamps[event] = _event_timestamp(df, event)
+        if timestamps[start] is None or timestamps[end] is None:
+            durations[(start, end)] = np.full(len(df), np.nan)
+            continue
+        minutes = minutes_between(timestamps[start], timestamps[end]).to_numpy(dtype=float)
+        durations[(start, end)] = np.where(minutes >= 0, minutes, np.nan)
+    return durations
+
+
+def _rule_minutes(df, rules, base):
+    """(regla, máscara donde aplica, minutos) para cada regla, en una pasada"""
+    n = len(df)
+    base = np.ones(n, dtype=bool) if base is None else np.asarray(base, dtype=bool)
+    durations = _durations(df, list(dict.fromkeys((r['inicio'], r['fin']) for r in rules)))
+
+    origen_masks = {}
+    categoria_masks = {}
+    for r in rules:
+        applies = base.copy()
+        if r['origen'] is not None:
+            if r['origen'] not in origen_masks:
+                origen_masks[r['origen']] = (
+                    category_mask(df['origen_del_servicio'], ORIGEN_MATCHERS[r['origen']]).to_numpy()
+                    if 'origen_del_servicio' in df.columns else np.zeros(n, dtype=bool))
+            applies &= origen_masks[r['origen']]
+        if r['categoria'] is not None:
+            if r['categoria'] not in categoria_masks:
+                categoria_masks[r['categoria']] = (
+                    contains(df['tipo_de_servicio'], r['categoria']).to_numpy()
+                    if 'tipo_de_servicio' in df.columns else np.zeros(n, dtype=bool))
+            applies &= categoria_masks[r['categoria']]
+        minutes = durations[(r['inicio'], r['fin'])]
+        applies &= ~np.isnan(minutes)
+        yield r, applies, minutes
+
+
+def sla_flags(df, rules=SLA_RULES, base=None):
+    """
+    Banderas de todas las reglas en una pasada: {sla}_den (la regla aplica,
+    `base` y duración calculable) y {sla}_num (además dentro del límite).
+    `base`: máscara adicional del universo (p.ej. concluidos no programados).
+    """
+    flags = {}
+    for r, applies, minutes in _rule_minutes(df, rules, base):
+        flags[f"{r['sla']}_den"] = applies
+        flags[f"{r['sla']}_num"] = applies & (minutes <= r['limite'])
+    return pd.DataFrame(flags, index=df.index)
+
+
+def sla_ecdfs(df, rules=SLA_RULES, base=None):
+    """
+    Duraciones ordenadas por regla (mismo universo que sla_flags):
+    {sla: {'minutes': minutos ascendentes, 'positions': fila de cada minuto}}.
+    """
+    ecdfs = {}
+    for r, applies, minutes in _rule_minutes(df, rules, base):
+        positions = np.flatnonzero(applies)
+        order = np.argsort(minutes[positions], kind='stable')
+        ecdfs[r['sla']] = {'minutes': minutes[positions][order], 'positions': positions[order],
+                           'n_rows': len(df)}
+    return ecdfs
+
+
+def ecdf_select(ecdf, positions=None):
+    """Minutos ordenados de las filas `positions` (sin reordenar; None = todas)"""
+    if positions is None:
+        return ecdf['minutes']
+    selected = np.zeros(ecdf['n_rows'], dtype=bool)
+    selected[positions] = True
+    return ecdf['minutes'][selected[ecdf['positions']]]
+
+
+def compliance_curve(minutes, thresholds):
+    """% de duraciones <= cada umbral (minutos ordenados); NaN si no hay datos"""
+    thresholds = np.asarray(thresholds, dtype=float)
+    if len(minutes) == 0:
+        return np.full(thresholds.shape, np.nan)
+    return np.searchsorted(minutes, thresholds, side='right') / len(minutes) * 100
+
+
+def sla_summary(flags, rules=SLA_RULES):
+    """% de cumplimiento por regla (sumando las banderas) frente a su meta"""
+    sums = flags.sum()
+    rows = []
+    for r in rules:
+        num, den = int(sums[f"{r['sla']}_num"]), int(sums[f"{r['sla']}_den"])
+        pct = num / den * 100 if den > 0 else np.nan
+        rows.append({'sla': r['sla'], 'nombre': r['nombre'], 'cumple': num, 'validos': den,
+                     'cumplimiento': pct, 'meta': r['meta'], 'en_meta': bool(pct >= r['meta']) if den > 0 else False})
+    return pd.DataFrame(rows).set_index('sla')
+
+
+def cross_check(df, flags=None, rules=SLA_RULES):
+    """
+    Contraste del motor con las columnas cumplimiento_* del sistema: sobre las
+    filas donde la regla aplica y el sistema trae CUMPLE / NO CUMPLE, cuántas
+    coinciden. Reglas sin columna en el export se omiten.
+    """
+    flags = sla_flags(df, rules) if flags is None else flags
+    rows = []
+    for r in rules:
+        col = r.get('columna_sistema')
+        if not col or col not in df.columns:
+            continue
+        system = df[col]
+        known = category_mask(system, lambda s: s.str.strip().str.upper().isin(['CUMPLE', 'NO CUMPLE'])).to_numpy()
+        system_ok = category_mask(system, lambda s: s.str.strip().str.upper() == 'CUMPLE').to_numpy()
+        compared = flags[f"{r['sla']}_den"].to_numpy() & known
+        agree = compared & (flags[f"{r['sla']}_num"].to_numpy() == system_ok)
+        n_compared, n_agree = int(compared.sum()), int(agree.sum())
+        rows.append({'sla': r['sla'], 'columna_sistema': col.replace('\n', ' '), 'comparados': n_compared,
+                     'coincidencias': n_agree, 'discrepancias': n_compared - n_agree,
+                     'coincidencia_pct': n_agree / n_compared * 100 if n_compared else np.nan})
+    return pd.DataFrame(rows, columns=['sla', 'columna_sistema', 'comparados', 'coincidencias',
+                                       'discrepancias', 'coincidencia_pct']).set_index('sla')
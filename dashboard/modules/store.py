@@ -0,0 +1,249 @@
+"""
+ADS Boletín - Partitioned Store Module
+Almacén persistente de la BBDD particionado por año/mes (Parquet).
+
+Cada cierre mensual agrega (o reemplaza) solo las particiones de los meses que
+trae el nuevo export; el resto del histórico no se vuelve a procesar. Un
+manifiesto JSON registra filas, hash y origen de cada partición.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .schema import month_sort_key
+except ImportError:
+    from schema import month_sort_key
+
+STORE_DIRNAME = 'bbdd_store'
+MANIFEST_NAME = 'manifest.json'
+DEDUPE_KEYS = ['expedientes', 'asistencias']
+NO_MONTH = 'sin_mes'
+
+
+def is_store(store_dir):
+    """True si la carpeta contiene un store con manifiesto"""
+    return os.path.exists(os.path.join(store_dir, MANIFEST_NAME))
+
+
+def read_manifest(store_dir):
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'partitions': {}, 'version': None}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_manifest(store_dir, manifest):
+    digests = sorted(p['sha256'] for p in manifest['partitions'].values())
+    manifest['version'] = hashlib.sha256('|'.join(digests).encode('utf-8')).hexdigest()
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def partition_path(mes):
+    """Ruta relativa de la partición: year=2025/mes=Oct-25/data.parquet"""
+    if mes == NO_MONTH:
+        return os.path.join('year=0000', f'mes={NO_MONTH}', 'data.parquet')
+    year, _ = month_sort_key(mes)
+    if 0 < year < 100:
+        year += 2000
+    safe = re.sub(r'[^\w-]', '_', str(mes))
+    return os.path.join(f'year={year:04d}', f'mes={safe}', 'data.parquet')
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_partition(store_dir, entry, columns=None):
+    import pyarrow.parquet as pq
+    return pq.read_table(os.path.join(store_dir, entry['path']), columns=columns, memory_map=True)
+
+
+def _key_index(df, keys):
+    """Llaves completas de las filas (MultiIndex) y máscara de filas con llave"""
+    has_key = df[keys].notna().all(axis=1).to_numpy()
+    return pd.MultiIndex.from_frame(df.loc[has_key, keys].astype(object)), has_key
+
+
+def _replaced_rows(table, keys, new_keys):
+    """Máscara de filas almacenadas cuya llave trae el nuevo export"""
+    stored = table.select(keys).to_pandas()
+    has_key = stored.notna().all(axis=1).to_numpy()
+    replaced = np.zeros(len(stored), dtype=bool)
+    replaced[has_key] = pd.MultiIndex.from_frame(stored.loc[has_key].astype(object)).isin(new_keys)
+    return replaced
+
+
+def _unify_schemas(schemas):
+    """
+    Esquema común de varias tablas: promoción permisiva de Arrow (null -> tipo,
+    int -> float, ...) campo por campo; tipos incompatibles pasan a string.
+    """
+    import pyarrow as pa
+
+    fields = {}
+    for schema in schemas:
+        for field in schema:
+            current = fields.get(field.name)
+            if current is None:
+                fields[field.name] = field
+                continue
+            try:
+                fields[field.name] = pa.unify_schemas([pa.schema([current]), pa.schema([field])],
+                                                      promote_options='permissive').field(0)
+            except (pa.ArrowTypeError, pa.ArrowInvalid):
+                fields[field.name] = pa.field(field.name, pa.string())
+    return pa.schema(list(fields.values()))
+
+
+def _conform(table, schema):
+    """Tabla con exactamente `schema`: columnas faltantes en nulo y tipos casteados"""
+    import pyarrow as pa
+
+    arrays = [table[f.name].cast(f.type) if f.name in table.column_names else pa.nulls(table.num_rows, f.type)
+              for f in schema]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _concat_unified(tables):
+    """Concatena tablas con esquemas distintos sobre su esquema unificado"""
+    import pyarrow as pa
+
+    schema = _unify_schemas([t.schema for t in tables])
+    # Metadatos de pandas (dtypes) de la última tabla si sus tipos se conservan
+    latest = tables[-1].schema
+    if all(schema.field(f.name).type == f.type for f in latest):
+        schema = schema.with_metadata(latest.metadata)
+    return pa.concat_tables([_conform(t, schema) for t in tables])
+
+
+def _write_partition(store_dir, mes, table):
+    import pyarrow.parquet as pq
+
+    rel_path = partition_path(mes)
+    path = os.path.join(store_dir, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    return rel_path, path
+
+
+def upsert_partitions(store_dir, df, keys=DEDUPE_KEYS, source=None):
+    """
+    Escribe las filas nuevas en sus particiones de mes. Cada llave (`keys`)
+    del nuevo export reemplaza a las filas almacenadas con esa llave en
+    cualquier partición (un expediente corregido puede cambiar de mes). Las
+    filas del export se guardan todas, incluidas las que repiten llave dentro
+    del mismo export (servicios distintos del mismo expediente/asistencia);
+    filas sin llave completa no se pueden reemplazar y se agregan siempre.
+    Los esquemas se unifican explícitamente (_unify_schemas). Solo se
+    reescriben las particiones tocadas. Devuelve un resumen por mes.
+    """
+    import pyarrow as pa
+
+    os.makedirs(store_dir, exist_ok=True)
+    manifest = read_manifest(store_dir)
+    keys = [k for k in keys if k in df.columns]
+    new_keys = _key_index(df, keys)[0] if keys else None
+
+    months = df['mes'].astype(object).where(df['mes'].notna(), NO_MONTH)
+    new_parts = {mes: part for mes, part in df.groupby(months, sort=False)}
+
+    # Particiones a reescribir: las del export y las que guardan alguna de sus llaves
+    stored = {}
+    for mes, entry in manifest['partitions'].items():
+        if mes in new_parts:
+            stored[mes] = _read_partition(store_dir, entry)
+        elif keys and len(new_keys):
+            # Solo las columnas llave para decidir si hay que reescribirla
+            key_table = _read_partition(store_dir, entry, columns=keys)
+            if _replaced_rows(key_table, keys, new_keys).any():
+                stored[mes] = _read_partition(store_dir, entry)
+
+    summary = {}
+    for mes in list(new_parts) + [m for m in stored if m not in new_parts]:
+        entry = manifest['partitions'].get(mes)
+        tables = []
+        previas = reemplazadas = 0
+        if mes in stored:
+            table = stored[mes]
+            previas = table.num_rows
+            if keys and len(new_keys) and set(keys).issubset(table.column_names):
+                replaced = _replaced_rows(table, keys, new_keys)
+                reemplazadas = int(replaced.sum())
+                table = table.filter(pa.array(~replaced))
+            tables.append(table)
+        if mes in new_parts:
+            tables.append(pa.Table.from_pandas(new_parts[mes], preserve_index=False))
+
+        merged = _concat_unified(tables)
+        nuevas = len(new_parts[mes]) if mes in new_parts else 0
+        summary[mes] = {'previas': previas, 'reemplazadas': reemplazadas, 'nuevas': nuevas,
+                        'total': merged.num_rows}
+
+        if merged.num_rows == 0:
+            # Todas sus filas se movieron a otro mes
+            os.remove(os.path.join(store_dir, entry['path']))
+            del manifest['partitions'][mes]
+            continue
+
+        rel_path, path = _write_partition(store_dir, mes, merged)
+        sources = list((entry or {}).get('sources', []))
+        if mes in new_parts and source and os.path.basename(source) not in sources:
+            sources.append(os.path.basename(source))
+        manifest['partitions'][mes] = {
+            'path': rel_path.replace(os.sep, '/'),
+            'rows': merged.num_rows,
+            'sha256': _file_sha256(path),
+            'sources': sources,
+            'updated_at': pd.Timestamp.now().isoformat(timespec='seconds'),
+        }
+
+    _write_manifest(store_dir, manifest)
+    return summary
+
+
+def list_months(store_dir):
+    """Meses almacenados en orden cronológico"""
+    return sorted(read_manifest(store_dir)['partitions'], key=month_sort_key)
+
+
+def read_store(store_dir, months=None, columns=None):
+    """
+    Lee el store (opcionalmente solo algunos meses/columnas).
+    Devuelve (df, info) con el mismo formato que columnar_cache.read_excel_cached.
+    """
+    t0 = time.perf_counter()
+    manifest = read_manifest(store_dir)
+    wanted = list_months(store_dir) if months is None else [m for m in list_months(store_dir) if m in months]
+
+    tables = []
+    for mes in wanted:
+        table = _read_partition(store_dir, manifest['partitions'][mes])
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.column_names])
+        tables.append(table)
+
+    if tables:
+        df = _concat_unified(tables).to_pandas()
+    else:
+        df = pd.DataFrame(columns=columns or [])
+
+    return df, {'source': os.path.abspath(store_dir), 'status': 'store',
+                'load_seconds': time.perf_counter() - t0, 'build_seconds': None,
+                'version': manifest.get('version'), 'partitions': len(wanted)}
@@ -0,0 +1,122 @@
+"""
+ADS Boletín - Timestamps Module
+Combinación vectorizada de pares fecha/hora (fec_* + hrs_*) en timestamps.
+
+Acepta lo que realmente trae la BBDD: fechas datetime, seriales de Excel
+(float/int) o texto; horas como texto 'HH:MM[:SS]', datetime.time, datetime
+completos o fracción de día de Excel.
+"""
+import pandas as pd
+
+EXCEL_ORIGIN = '1899-12-30'
+ONE_DAY = pd.Timedelta(days=1)
+
+
+def _as_series(values):
+    """Series con índice posicional (el original se restaura al final)"""
+    s = pd.Series(values)
+    return s.reset_index(drop=True), s.index
+
+
+def parse_dates(values):
+    """Fecha (a medianoche) como Series datetime64; inválidos -> NaT"""
+    s, index = _as_series(values)
+
+    if pd.api.types.is_datetime64_any_dtype(s):
+        result = s.dt.tz_localize(None) if s.dt.tz is not None else s
+    elif pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        result = pd.to_datetime(s, unit='D', origin=EXCEL_ORIGIN, errors='coerce')
+    else:
+        # object/texto: seriales de Excel por un lado, el resto por parseo de fecha
+        serial = pd.to_numeric(s, errors='coerce')
+        result = pd.to_datetime(serial, unit='D', origin=EXCEL_ORIGIN, errors='coerce')
+
+        pending = serial.isna() & s.notna()
+        if pending.any():
+            rest = s[pending]
+            parsed = pd.to_datetime(rest, errors='coerce', format='ISO8601')
+            retry = parsed.isna()
+            if retry.any():
+                parsed[retry] = pd.to_datetime(rest[retry].astype(str), errors='coerce', format='mixed')
+            result[pending] = parsed
+
+    result = result.dt.normalize()
+    result.index = index
+    return result
+
+
+def parse_times(values):
+    """Hora del día como Series timedelta64 desde medianoche; inválidos -> NaT"""
+    s, index = _as_series(values)
+
+    if pd.api.types.is_timedelta64_dtype(s):
+        offset = s
+    elif pd.api.types.is_datetime64_any_dtype(s):
+        offset = s - s.dt.normalize()
+    elif pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        # Excel guarda la hora como fracción de día
+        offset = pd.to_timedelta((s % 1) * 86400, unit='s', errors='coerce').dt.round('s')
+    else:
+        offset = pd.Series(pd.NaT, index=s.index, dtype='timedelta64[ns]')
+        raw = s[s.notna()]
+        serial = pd.to_numeric(raw, errors='coerce')
+
+        fraction = serial.dropna()
+        if len(fraction):
+            offset[fraction.index] = pd.to_timedelta((fraction % 1) * 86400, unit='s').dt.round('s')
+
+        # Texto y datetime.time -> 'HH:MM:SS'; se completa 'HH:MM'
+        text = raw[serial.isna()].astype(str).str.strip()
+        if len(text):
+            text = text.where(~text.str.fullmatch(r'\d{1,2}:\d{2}'), text + ':00')
+            parsed = pd.to_timedelta(text, errors='coerce')
+
+            # Lo que no es una hora pura (datetime completo, '4:05 PM', ...)
+            retry = parsed.isna()
+            if retry.any():
+                as_dt = pd.to_datetime(text[retry], errors='coerce', format='mixed')
+                parsed[retry] = as_dt - as_dt.dt.normalize()
+            offset[parsed.index] = parsed
+
+    # Solo offsets dentro del día
+    offset = offset.where((offset >= pd.Timedelta(0)) & (offset < ONE_DAY))
+    offset.index = index
+    return offset
+
+
+def combine_date_time(date_values, time_values):
+    """Timestamp = fecha (normalizada) + hora; NaT si falta cualquiera de las dos"""
+    dates = parse_dates(date_values)
+    times = parse_times(time_values)
+    times.index = dates.index
+    return dates + times
+
+
+def find_datetime_pairs(columns):
+    """Pares {sufijo: (fec_<sufijo>, hrs_<sufijo>)} presentes en las columnas"""
+    cols = set(columns)
+    pairs = {}
+    for col in columns:
+        if isinstance(col, str) and col.startswith('fec_'):
+            suffix = col[len('fec_'):]
+            if f'hrs_{suffix}' in cols:
+                pairs[suffix] = (col, f'hrs_{suffix}')
+    return pairs
+
+
+def build_timestamps(df, pairs=None, prefix='ts_'):
+    """
+    Combina todos los pares fecha/hora del DataFrame.
+    Devuelve un DataFrame con una columna '<prefix><sufijo>' por par.
+    """
+    if pairs is None:
+        pairs = find_datetime_pairs(df.columns)
+    return pd.DataFrame(
+        {f'{prefix}{suffix}': combine_date_time(df[fec], df[hrs]) for suffix, (fec, hrs) in pairs.items()},
+        index=df.index,
+    )
+
+
+def minutes_between(start, end):
+    """Diferencia end - start en minutos (float, NaN si falta algún extremo)"""
+    return (pd.Series(end) - pd.Series(start)).dt.total_seconds() / 60
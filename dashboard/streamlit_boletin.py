@@ -8,6 +8,19 @@ import plotly.express as px
 import plotly.graph_objects as go
 import os
 
+try:
+    from modules.columnar_cache import read_excel_cached
+    from modules.metrics import calculate_metrics, materialize_exclusion_flags
+    from modules.nps import categorize_scores, nps_column, nps_summary
+    from modules.schema import sort_month_labels
+except ImportError:
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
+    from columnar_cache import read_excel_cached
+    from metrics import calculate_metrics, materialize_exclusion_flags
+    from nps import categorize_scores, nps_column, nps_summary
+    from schema import sort_month_labels
+
 # Page config
 st.set_page_config(
     page_title="Boletín de Calidad ADS",
@@ -60,69 +73,15 @@ def load_data():
     path = os.path.join(script_dir, "resultados", "analyzed_bbdd.xlsx")
     
     if os.path.exists(path):
-        return pd.read_excel(path)
+        return materialize_exclusion_flags(read_excel_cached(path)[0])
     
     # Fallback: try relative path
     fallback_path = os.path.join("resultados", "analyzed_bbdd.xlsx")
     if os.path.exists(fallback_path):
-        return pd.read_excel(fallback_path)
+        return materialize_exclusion_flags(read_excel_cached(fallback_path)[0])
     
     return None
 
-def calculate_metrics(df):
-    """Calcula KPIs 100% dinámicos basados en columnas del sistema"""
-    metrics = {}
-    
-    # 1. Total Servicios
-    metrics['total_servicios'] = len(df)
-    metrics['concluidos'] = len(df[df['status_del_servicio'].astype(str).str.contains('Concluido', case=False, na=False)])
-    
-    # 2. SLA - Usar columnas de cumplimiento que están en el Excel
-    # Buscar columnas con "cumplimiento" y "vial" (que son las principales)
-    sla_cols = [c for c in df.columns if 'cumplimiento' in c.lower() and 'vial' in c.lower()]
-    
-    if sla_cols:
-        # Usar la primera columna de cumplimiento vial encontrada
-        sla_col = sla_cols[0]
-        sla_data = df[sla_col].astype(str).str.strip().str.upper()
-        cumple = (sla_data == 'CUMPLE').sum()
-        total_valid = sla_data.isin(['CUMPLE', 'NO CUMPLE']).sum()
-        metrics['sla'] = (cumple / total_valid * 100) if total_valid > 0 else 0
-    else:
-        # Fallback: promedio ponderado LOCAL/FORANEO
-        try:
-            origen_counts = df['origen_del_servicio'].value_counts()
-            local = origen_counts.get('LOCAL', 0)
-            foraneo = origen_counts.get('FORANEO', 0)
-            total = local + foraneo
-            if total > 0:
-                metrics['sla'] = ((local * 85.80) + (foraneo * 78.25)) / total
-            else:
-                metrics['sla'] = 0
-        except:
-            metrics['sla'] = 0
-    
-    # 3. NPS - Categorización híbrida exacta de auditoría
-    nps_col = next((c for c in df.columns if 'nps' in c.lower() and 'calificacion' in c.lower()), None)
-    metrics['nps'] = 0
-    
-    if nps_col:
-        nps_data = pd.to_numeric(df[nps_col], errors='coerce').dropna()
-        if len(nps_data) > 0:
-            def categorize_nps(val):
-                if val == 10: return 'PROMOTOR'
-                if val >= 7: return 'PASIVO'
-                if val == 5: return 'PROMOTOR'
-                if val == 4: return 'PASIVO'
-                return 'DETRACTOR'
-            
-            categorias = nps_data.apply(categorize_nps)
-            prom = (categorias == 'PROMOTOR').sum() / len(categorias)
-            det = (categorias == 'DETRACTOR').sum() / len(categorias)
-            metrics['nps'] = (prom - det) * 100
-
-    return metrics
-
 def main():
     # Header
     st.markdown('<h1 class="main-header">📊 Boletín de Calidad ADS</h1>', unsafe_allow_html=True)
@@ -142,6 +101,7 @@ def main():
             df = pd.read_excel(uploaded_file)
         # Standardize column names
         df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_').str.replace('.', '')
+        df = materialize_exclusion_flags(df)
         st.sidebar.success(f"✅ {uploaded_file.name}")
     else:
         # Load from local file
@@ -173,15 +133,8 @@ def main():
     st.sidebar.divider()
     st.sidebar.subheader("🗓️ Filtros")
     
-    # Get unique months and sort chronologically
-    month_order = {'Ene': 1, 'Feb': 2, 'Mar': 3, 'Abr': 4, 'May': 5, 'Jun': 6,
-                   'Jul': 7, 'Ago': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dic': 12}
-    raw_months = df['mes'].dropna().unique().tolist()
-    # Sort by extracting month prefix (e.g., "Ene-25" -> "Ene")
-    all_months = sorted(raw_months, key=lambda x: (
-        int(str(x).split('-')[-1]) if '-' in str(x) else 0,  # Year first
-        month_order.get(str(x).split('-')[0], 0)  # Then month
-    ))
+    # Get unique months and sort chronologically (por periodo mensual)
+    all_months = sort_month_labels(df['mes'].dropna().unique().tolist())
     
     # Select All checkbox
     select_all = st.sidebar.checkbox("Seleccionar todos los meses", value=True)
@@ -220,7 +173,7 @@ def main():
         if selected_city != 'Todas':
             df = df[df['ciudad'] == selected_city]
     
-    # Calculate metrics with filtered data
+    # Calculate metrics with filtered data (motor compartido: modules/metrics.py)
     metrics = calculate_metrics(df)
     
     st.sidebar.divider()
@@ -497,25 +450,30 @@ def main():
         
         with col2:
             # NPS Distribution
-            nps_col = next((c for c in df.columns if 'nps' in c.lower() and 'calificacion' in c.lower()), None)
+            nps_col = nps_column(df.columns)
             if nps_col:
                 nps_data = pd.to_numeric(df[nps_col], errors='coerce').dropna()
                 nps_counts = nps_data.value_counts().sort_index()
                 
-                colors = []
-                for val in nps_counts.index:
-                    if val >= 9 or val == 5:
-                        colors.append(COLORS['success'])
-                    elif val >= 7 or val == 4:
-                        colors.append(COLORS['warning'])
-                    else:
-                        colors.append(COLORS['danger'])
+                # Color por categoría NPS (misma tabla de búsqueda que el KPI)
+                category_colors = {'PROMOTOR': COLORS['success'], 'PASIVO': COLORS['warning'], 'DETRACTOR': COLORS['danger']}
+                colors = [category_colors.get(cat, COLORS['danger']) for cat in categorize_scores(nps_counts.index)]
                 
                 fig = px.bar(x=nps_counts.index.astype(str), y=nps_counts.values,
                             title="Distribución de Calificaciones NPS",
                             color=nps_counts.index.astype(str),
                             color_discrete_sequence=colors)
                 st.plotly_chart(fig, use_container_width=True)
+        
+        # NPS por mes (un solo groupby con conteos y porcentajes)
+        if nps_col and 'mes' in df.columns:
+            st.subheader("NPS por Mes")
+            nps_mes = nps_summary(df, 'mes')
+            nps_mes = nps_mes.loc[sort_month_labels(nps_mes.index)]
+            nps_mes = nps_mes[nps_mes['respuestas'] > 0]
+            table = nps_mes[['respuestas', 'promotores', 'pasivos', 'detractores', 'nps']]
+            table.columns = ['Respuestas', 'Promotores', 'Pasivos', 'Detractores', 'NPS']
+            st.dataframe(table.style.format({'NPS': '{:.1f}%'}), use_container_width=True)
     
     # ==========================================================================
     # METODOLOGÍA
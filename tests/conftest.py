@@ -0,0 +1,13 @@
+"""
+Configuración de pytest: los módulos del dashboard (dashboard/modules) y los
+scripts de codigos/ se importan igual que en los scripts del repo.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ROOT, 'tests', 'fixtures')
+
+for path in (os.path.join(ROOT, 'dashboard'), os.path.join(ROOT, 'codigos')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
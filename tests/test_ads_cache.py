@@ -0,0 +1,78 @@
+"""
+Caché de artefactos (codigos/ads_cache.py): la llave cambia con el código del
+módulo que dibuja y el caché se poda al superar su tamaño máximo.
+"""
+import importlib.util
+import os
+import sys
+
+from ads_cache import ArtifactCache, artifact_key
+
+RENDERER = '''
+COLORS = {colors!r}
+
+
+def _style():
+    return COLORS
+
+
+def draw(data, path):
+    with open(path, 'w') as f:
+        f.write(repr((_style(), data)))
+'''
+
+
+def load_renderer(tmp_path, name, colors):
+    path = tmp_path / f'{name}.py'
+    path.write_text(RENDERER.format(colors=colors))
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module.draw
+
+
+def test_module_constants_change_the_key(tmp_path):
+    # Misma función draw, distinta constante de módulo
+    draw_a = load_renderer(tmp_path, 'renderer_a', {'CUMPLE': 'green'})
+    draw_b = load_renderer(tmp_path, 'renderer_b', {'CUMPLE': 'blue'})
+    draw_c = load_renderer(tmp_path, 'renderer_c', {'CUMPLE': 'green'})
+    key = artifact_key('x.png', {'n': 1}, renderer=draw_a)
+    assert key != artifact_key('x.png', {'n': 1}, renderer=draw_b)
+    assert key == artifact_key('x.png', {'n': 1}, renderer=draw_c)
+
+
+def test_explicit_version_overrides_source(tmp_path):
+    draw_a = load_renderer(tmp_path, 'renderer_va', {'CUMPLE': 'green'})
+    draw_b = load_renderer(tmp_path, 'renderer_vb', {'CUMPLE': 'blue'})
+    draw_a.artifact_version = draw_b.artifact_version = 2
+    assert artifact_key('x.png', 1, renderer=draw_a) == artifact_key('x.png', 1, renderer=draw_b)
+
+
+def test_prune_keeps_recently_used(tmp_path):
+    cache = ArtifactCache(str(tmp_path / 'cache'), verbose=False, max_bytes=350)
+    out = tmp_path / 'out'
+    out.mkdir()
+    keys = []
+    for i in range(3):
+        path = str(out / f'a{i}.txt')
+        with open(path, 'w') as f:
+            f.write(str(i) * 100)
+        keys.append(artifact_key(f'a{i}.txt', i))
+        cache.store(keys[-1], path)
+        # mtime distinto por artefacto (resolución del sistema de archivos)
+        cached = cache._path(keys[-1], path)
+        os.utime(cached, ns=(i * 10**9, i * 10**9))
+
+    # a0 se vuelve a usar: pasa a ser el más reciente
+    assert cache.fetch(keys[0], str(out / 'a0.txt'))
+    path = str(out / 'a3.txt')
+    with open(path, 'w') as f:
+        f.write('3' * 100)
+    cache.store(artifact_key('a3.txt', 3), path)
+
+    assert cache.pruned == 1
+    assert not cache.fetch(keys[1], str(out / 'a1.txt'))
+    assert cache.fetch(keys[0], str(out / 'a0.txt'))
+    assert cache.fetch(keys[2], str(out / 'a2.txt'))
+    assert sum(s for _, s, _ in cache._entries()) <= 350
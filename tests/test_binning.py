@@ -0,0 +1,41 @@
+"""
+Bins de las vistas de distribución (modules/binning.py): solo un último borde
+`inf` acumula los valores grandes; con bordes cerrados quedan fuera.
+"""
+import numpy as np
+
+from modules.binning import bin_index, build_histograms, fixed_edges, histogram, histogram_frame
+
+VALUES = [np.nan, -1.0, 0.0, 4.9, 5.0, 10.0, 10.5, 300.0]
+
+
+def test_closed_edges_leave_overflow_out():
+    edges = fixed_edges(0, 10, 5)
+    # El borde derecho del último bin es inclusivo (10.0); 10.5 y 300 quedan fuera
+    assert bin_index(VALUES, edges).tolist() == [-1, -1, 0, 0, 1, 1, -1, -1]
+    assert histogram(VALUES, edges)[0].tolist() == [2, 2]
+
+
+def test_open_last_edge_accumulates():
+    edges = fixed_edges(0, 10, 5, open_ended=True)
+    assert edges.tolist() == [0.0, 5.0, np.inf]
+    assert bin_index(VALUES + [np.inf], edges).tolist() == [-1, -1, 0, 0, 1, 1, 1, 1, 1]
+
+
+def test_freedman_diaconis_includes_maximum():
+    values = np.array([1.0, 2.0, 2.5, 3.0, 9.0])
+    counts, _ = histogram(values)
+    assert counts.sum() == len(values)
+
+
+def test_cube_histograms_ignore_overflow():
+    counts = build_histograms([0, 0, 1, 1], [1.0, 11.0, 6.0, np.nan], fixed_edges(0, 10, 5), 2)
+    assert counts.tolist() == [[1, 0], [0, 1]]
+
+
+def test_frame_draws_open_bin_with_previous_width():
+    frame = histogram_frame([3, 4, 5], fixed_edges(0, 15, 5, open_ended=True))
+    assert frame['bin'].tolist() == ['0–5', '5–10', '≥ 10']
+    assert frame['hasta'].tolist() == [5.0, 10.0, 15.0]
+    assert np.isfinite(frame[['centro', 'ancho']].to_numpy()).all()
+    assert histogram_frame([1, 2], fixed_edges(0, 10, 5))['bin'].tolist() == ['0–5', '5–10']
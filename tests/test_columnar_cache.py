@@ -0,0 +1,45 @@
+"""
+Caché columnar de Excel (modules/columnar_cache.py): proyección de columnas en
+caliente y limpieza de entradas de versiones anteriores de la fuente.
+"""
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+pytest.importorskip('openpyxl')
+
+from modules.columnar_cache import cache_paths, read_excel_cached
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / 'bbdd.xlsx')
+    pd.DataFrame({'mes': ['Ene-25', 'Feb-25'], 'expedientes': [1, 2], 'nota': [9.0, 10.0]}).to_excel(path, index=False)
+    return path
+
+
+def test_warm_read_converts_only_requested_columns(workbook):
+    cold, info = read_excel_cached(workbook, columns=['mes', 'nota'])
+    assert info['status'] == 'cold'
+    warm, info = read_excel_cached(workbook, columns=['mes', 'nota'])
+    assert info['status'] == 'warm'
+    assert list(warm.columns) == ['mes', 'nota']
+    pd.testing.assert_frame_equal(warm, cold)
+    # El caché guarda el libro completo
+    assert list(read_excel_cached(workbook)[0].columns) == ['mes', 'expedientes', 'nota']
+
+
+def test_changed_source_prunes_superseded_entries(workbook):
+    read_excel_cached(workbook)
+    read_excel_cached(workbook, sheet_name=0)
+    stale = cache_paths(workbook, {'sheet_name': 0})
+
+    pd.DataFrame({'mes': ['Mar-25'], 'expedientes': [3], 'nota': [8.0]}).to_excel(workbook, index=False)
+    df, info = read_excel_cached(workbook)
+    assert info['status'] == 'cold'
+    assert df['mes'].tolist() == ['Mar-25']
+    assert not any(os.path.exists(p) for p in stale)
+    cache_dir = os.path.dirname(stale[0])
+    assert sorted(os.listdir(cache_dir)) == sorted(os.path.basename(p) for p in cache_paths(workbook))
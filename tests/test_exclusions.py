@@ -0,0 +1,40 @@
+"""
+Universos SLA: exclusion_flags (KPI / Indicadores) y sla_rules_base (tabla de
+reglas / ECDF) clasifican igual los servicios programados.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.metrics import exclusion_flags, programado_mask, sla_rules_base
+from modules.schema import apply_schema
+
+PROGRAMADOS = ['No', 'no', ' No ', 'NO', 'Si', 'si', ' SI', '', '  ', None, np.nan]
+EXPECTED = [False, False, False, False, True, True, True, True, True, True, True]
+
+
+@pytest.fixture(params=[False, True], ids=['object', 'schema'])
+def bbdd(request):
+    df = pd.DataFrame({
+        'status_del_servicio': ['Concluido'] * len(PROGRAMADOS),
+        'servicios_programados': PROGRAMADOS,
+        'duracion_minutos': [10.0] * len(PROGRAMADOS),
+    })
+    return apply_schema(df) if request.param else df
+
+
+def test_programado_predicate(bbdd):
+    assert programado_mask(bbdd).tolist() == EXPECTED
+
+
+def test_universes_agree(bbdd):
+    flags = exclusion_flags(bbdd)
+    assert flags['is_programado'].tolist() == EXPECTED
+    np.testing.assert_array_equal(sla_rules_base(bbdd), ~np.array(EXPECTED))
+    np.testing.assert_array_equal(flags['is_valid_sla'].to_numpy(), sla_rules_base(bbdd))
+
+
+def test_without_column():
+    df = pd.DataFrame({'status_del_servicio': ['Concluido', 'Cancelado al momento']})
+    assert programado_mask(df).tolist() == [False, False]
+    assert sla_rules_base(df).tolist() == [True, False]
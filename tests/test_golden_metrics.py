@@ -0,0 +1,43 @@
+"""
+Cifras publicadas (Boletín V3) frente al motor de KPIs de modules/metrics.py,
+sobre la BBDD analizada versionada en resultados/. Los valores esperados están
+en tests/fixtures/golden_v3.json.
+"""
+import json
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR, ROOT
+from modules.columnar_cache import read_excel_cached
+from modules.metrics import calculate_metrics, materialize_exclusion_flags
+from modules.schema import apply_schema
+
+with open(os.path.join(FIXTURES_DIR, 'golden_v3.json'), encoding='utf-8') as f:
+    GOLDEN = json.load(f)
+
+SOURCE = os.path.join(ROOT, GOLDEN['fuente'])
+
+
+@pytest.fixture(scope='module')
+def bbdd():
+    if not os.path.exists(SOURCE):
+        pytest.skip(f"{GOLDEN['fuente']} no disponible")
+    return apply_schema(read_excel_cached(SOURCE)[0])
+
+
+@pytest.mark.parametrize('key', sorted(GOLDEN['metricas']))
+def test_published_figures(bbdd, key):
+    assert round(calculate_metrics(bbdd)[key], 2) == GOLDEN['metricas'][key]
+
+
+def test_materialized_flags_give_same_metrics(bbdd):
+    flagged = materialize_exclusion_flags(bbdd.copy(deep=False))
+    assert calculate_metrics(flagged) == pytest.approx(calculate_metrics(bbdd))
+
+
+def test_nps_matches_previous_implementation(bbdd):
+    # Implementación anterior (texto y NPS fila a fila), conservada para el benchmark
+    from benchmark_metrics import legacy_metrics
+
+    assert round(legacy_metrics(bbdd)['nps'], 2) == round(calculate_metrics(bbdd)['nps'], 2)
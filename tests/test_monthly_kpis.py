@@ -0,0 +1,136 @@
+"""
+Equivalencia de metrics.calculate_monthly_kpis con el bucle por mes original
+(baseline, copiado tal cual abajo como referencia).
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.metrics import calculate_monthly_kpis
+from modules.schema import apply_schema
+
+
+def legacy_monthly_kpis(df):
+    """Implementación original (un groupby por mes y .apply fila a fila)"""
+    results = {}
+    if 'mes' not in df.columns:
+        return results
+    INVALID_STATUSES = ['Cancelado al momento', 'Cancelado posterior', 'Anulado', 'Abortado', 'Duplicado', 'Prueba']
+
+    def combine_date_time(date_val, time_val):
+        try:
+            d = pd.to_datetime(date_val)
+            if pd.isna(d): return pd.NaT
+            if pd.isna(time_val): return pd.NaT
+            t_str = str(time_val).strip()
+            if hasattr(time_val, 'hour'):
+                t_str = time_val.strftime('%H:%M:%S')
+            dt_str = f"{d.strftime('%Y-%m-%d')} {t_str}"
+            return pd.to_datetime(dt_str, errors='coerce')
+        except:
+            return pd.NaT
+
+    for mes, group in df.groupby('mes'):
+        metrics = {}
+        total_bruto = len(group)
+        if total_bruto == 0: continue
+        status_col = 'status_del_servicio'
+        if status_col in group.columns:
+            mask_valid = ~group[status_col].astype(str).isin(INVALID_STATUSES)
+            group_valid = group[mask_valid]
+            total_valid = len(group_valid)
+            concluidos = group_valid[group_valid[status_col].astype(str).str.contains('Concluido', case=False, na=False)].shape[0]
+            metrics['ns'] = (concluidos / total_valid * 100) if total_valid > 0 else 0
+            mask_abandono = group[status_col].astype(str).str.contains('Cancelado|Abandono', case=False, na=False)
+            abandonos = mask_abandono.sum()
+            exclusions_abandono = ['Anulado', 'Abortado', 'Duplicado', 'Prueba']
+            mask_valid_abandono = ~group[status_col].astype(str).isin(exclusions_abandono)
+            total_valid_abandono = mask_valid_abandono.sum()
+            metrics['abandono'] = (abandonos / total_valid_abandono * 100) if total_valid_abandono > 0 else 0
+        else:
+            metrics['ns'] = 0
+            metrics['abandono'] = 0
+
+        if {'fec_contacto', 'hrs_contacto', 'fec_asignacion', 'hrs_asignacion'}.issubset(group.columns):
+            dt_contact = group.apply(lambda x: combine_date_time(x['fec_contacto'], x['hrs_contacto']), axis=1)
+            dt_assign = group.apply(lambda x: combine_date_time(x['fec_asignacion'], x['hrs_asignacion']), axis=1)
+            diff_min = (dt_contact - dt_assign).dt.total_seconds() / 60
+            valid_mask = diff_min.notna() & (diff_min >= 0)
+            valid_diffs = diff_min[valid_mask]
+            if len(valid_diffs) > 0:
+                metrics['coordinacion'] = ((valid_diffs <= 10).sum() / len(valid_diffs)) * 100
+            else:
+                metrics['coordinacion'] = 0
+        else:
+            metrics['coordinacion'] = 0
+
+        quejas_count = 0
+        if 'es_queja' in group.columns:
+            quejas_count = group[group['es_queja'].astype(str).str.lower() == 'si'].shape[0]
+        elif 'tipo_de_servicio' in group.columns:
+            quejas_count = group[group['tipo_de_servicio'].astype(str).str.contains('Queja', case=False, na=False)].shape[0]
+        metrics['quejas'] = (quejas_count / total_bruto) * 100
+        metrics['recobros'] = 0
+        results[mes] = metrics
+    return results
+
+
+@pytest.fixture
+def bbdd():
+    """
+    BBDD mínima con los casos borde del contrato: mes sin denominador de
+    coordinación ni de NS, etiqueta de mes que no es un mes ('Total'), fechas u
+    horas faltantes, diferencias negativas y quejas.
+    """
+    rows = [
+        # mes, status, fec_asig, hrs_asig, fec_cont, hrs_cont, tipo
+        ('Ene-25', 'Concluido', '2025-01-03', '10:00:00', '2025-01-03', '10:05:00', 'AUXILIO VIAL'),
+        ('Ene-25', 'Concluido', '2025-01-03', '10:00:00', '2025-01-03', '10:30:00', 'REMOLQUE'),
+        ('Ene-25', 'Cancelado al momento', '2025-01-04', '08:00:00', None, None, 'REMOLQUE'),
+        ('Ene-25', 'Anulado', '2025-01-04', '08:00:00', '2025-01-04', '07:50:00', 'QUEJA SERVICIO'),
+        ('Ene-25', 'En proceso', '2025-01-05', '23:55:00', '2025-01-06', '00:04:00', 'AUXILIO VIAL'),
+        ('Feb-25', 'Concluido', '2025-02-01', '09:00:00', '2025-02-01', '09:10:00', 'QUEJA'),
+        ('Feb-25', 'Cancelado posterior', '2025-02-01', '09:00:00', '2025-02-01', '09:11:00', 'REMOLQUE'),
+        ('Feb-25', None, None, '09:00:00', '2025-02-02', '09:00:00', 'REMOLQUE'),
+        # Mes sin denominadores: todo cancelado y sin contacto
+        ('Mar-25', 'Cancelado al momento', '2025-03-01', '12:00:00', None, None, 'REMOLQUE'),
+        ('Mar-25', 'Cancelado posterior', None, None, None, None, 'AUXILIO VIAL'),
+        # Etiqueta que no es un mes: el diccionario la conserva
+        ('Total', 'Concluido', '2025-03-02', '12:00:00', '2025-03-02', '12:09:59', 'REMOLQUE'),
+        # Sin mes: no entra en ningún grupo
+        (None, 'Concluido', '2025-03-02', '12:00:00', '2025-03-02', '12:01:00', 'REMOLQUE'),
+    ]
+    return pd.DataFrame(rows, columns=['mes', 'status_del_servicio', 'fec_asignacion', 'hrs_asignacion',
+                                       'fec_contacto', 'hrs_contacto', 'tipo_de_servicio'])
+
+
+def _assert_same(result, expected):
+    assert set(result) == set(expected)
+    for mes, metrics in expected.items():
+        assert set(result[mes]) == set(metrics), mes
+        for kpi, value in metrics.items():
+            assert result[mes][kpi] == pytest.approx(value, abs=1e-9), (mes, kpi)
+
+
+def test_matches_legacy_loop(bbdd):
+    expected = legacy_monthly_kpis(bbdd)
+    result = calculate_monthly_kpis(bbdd)
+    _assert_same(result, expected)
+    assert set(result) == {'Ene-25', 'Feb-25', 'Mar-25', 'Total'}
+
+
+def test_missing_denominator_is_zero(bbdd):
+    march = calculate_monthly_kpis(bbdd)['Mar-25']
+    assert march['ns'] == 0
+    assert march['coordinacion'] == 0
+
+
+def test_matches_legacy_loop_after_schema(bbdd):
+    # Con apply_schema (mes categórico, status normalizado) el contrato no cambia
+    _assert_same(calculate_monthly_kpis(apply_schema(bbdd.copy())), legacy_monthly_kpis(bbdd))
+
+
+def test_without_columns():
+    assert calculate_monthly_kpis(pd.DataFrame({'x': [1]})) == {}
+    df = pd.DataFrame({'mes': ['Ene-25', 'Ene-25'], 'tipo_de_servicio': ['Queja', np.nan]})
+    _assert_same(calculate_monthly_kpis(df), legacy_monthly_kpis(df))
@@ -0,0 +1,44 @@
+"""
+Tabla de reglas SLA (modules/sla_rules.py): una regla con `categoria` solo
+aplica a los tipos de servicio que calzan con su regex.
+"""
+import pandas as pd
+
+from modules.sla_rules import SLA_RULES, sla_flags
+
+RULES = [
+    {'sla': 'vial', 'nombre': 'Vial', 'categoria': 'REMOLQUE|AUXILIO', 'origen': 'LOCAL',
+     'inicio': 'asignacion', 'fin': 'contacto', 'limite': 45, 'meta': 86.5},
+    {'sla': 'situ', 'nombre': 'In situ', 'categoria': 'IN SITU', 'origen': 'LOCAL',
+     'inicio': 'asignacion', 'fin': 'contacto', 'limite': 35, 'meta': 80.0},
+    {'sla': 'todas', 'nombre': 'Todas', 'categoria': None, 'origen': None,
+     'inicio': 'asignacion', 'fin': 'contacto', 'limite': 35, 'meta': 80.0},
+]
+
+
+def bbdd():
+    return pd.DataFrame({
+        'tipo_de_servicio': ['REMOLQUE DE AUTOMOVIL ( GRUA )', 'ASISTENCIA IN SITU', 'auxilio vial', None],
+        'origen_del_servicio': ['LOCAL', 'LOCAL', 'FORANEO', 'LOCAL'],
+        'duracion_minutos': [40.0, 40.0, 20.0, 10.0],
+    })
+
+
+def test_categoria_filters_service_type():
+    flags = sla_flags(bbdd(), RULES)
+    assert flags['vial_den'].tolist() == [True, False, False, False]
+    assert flags['vial_num'].tolist() == [True, False, False, False]
+    assert flags['situ_den'].tolist() == [False, True, False, False]
+    assert flags['situ_num'].tolist() == [False, False, False, False]
+    assert flags['todas_den'].tolist() == [True, True, True, True]
+
+
+def test_categoria_without_column():
+    flags = sla_flags(bbdd().drop(columns='tipo_de_servicio'), RULES)
+    assert not flags['vial_den'].any()
+    assert flags['todas_den'].all()
+
+
+def test_rule_table_has_every_field():
+    for r in SLA_RULES:
+        assert {'sla', 'nombre', 'categoria', 'origen', 'inicio', 'fin', 'limite', 'meta'} <= set(r)
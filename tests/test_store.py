@@ -0,0 +1,82 @@
+"""
+Store particionado (modules/store.py): reemplazo por llave entre particiones,
+filas repetidas dentro de un export y esquemas que cambian entre exports.
+"""
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from modules.store import list_months, read_manifest, read_store, upsert_partitions
+
+
+def export(rows):
+    return pd.DataFrame(rows, columns=['mes', 'expedientes', 'asistencias', 'status_del_servicio'])
+
+
+@pytest.fixture
+def store_dir(tmp_path):
+    return str(tmp_path / 'bbdd_store')
+
+
+def test_repeated_keys_within_export_are_kept(store_dir):
+    # Dos servicios distintos del mismo expediente/asistencia
+    df = export([('Ene-25', 1, 10, 'Concluido'), ('Ene-25', 1, 10, 'Concluido'), ('Ene-25', 2, 20, 'Concluido')])
+    upsert_partitions(store_dir, df)
+    assert len(read_store(store_dir)[0]) == 3
+
+
+def test_reingest_is_idempotent(store_dir):
+    df = export([('Ene-25', 1, 10, 'Concluido'), ('Ene-25', 1, 10, 'Concluido'), ('Feb-25', 2, 20, 'Concluido')])
+    upsert_partitions(store_dir, df)
+    summary = upsert_partitions(store_dir, df)
+    assert summary['Ene-25'] == {'previas': 2, 'reemplazadas': 2, 'nuevas': 2, 'total': 2}
+    assert len(read_store(store_dir)[0]) == 3
+
+
+def test_corrected_row_replaces_previous_version(store_dir):
+    upsert_partitions(store_dir, export([('Ene-25', 1, 10, 'En proceso'), ('Ene-25', 2, 20, 'Concluido')]))
+    upsert_partitions(store_dir, export([('Ene-25', 1, 10, 'Concluido')]))
+    df = read_store(store_dir)[0].sort_values('expedientes')
+    assert df['status_del_servicio'].tolist() == ['Concluido', 'Concluido']
+
+
+def test_key_moved_to_another_month(store_dir):
+    upsert_partitions(store_dir, export([('Ene-25', 1, 10, 'Concluido'), ('Ene-25', 2, 20, 'Concluido'),
+                                         ('Feb-25', 3, 30, 'Concluido')]))
+    # El export corregido mueve el expediente 1 a febrero
+    summary = upsert_partitions(store_dir, export([('Feb-25', 1, 10, 'Concluido'), ('Feb-25', 3, 30, 'Concluido')]))
+    assert summary['Ene-25']['reemplazadas'] == 1
+    df = read_store(store_dir)[0]
+    assert len(df) == 3
+    assert df.set_index('expedientes')['mes'].to_dict() == {1: 'Feb-25', 2: 'Ene-25', 3: 'Feb-25'}
+
+
+def test_partition_emptied_by_move_is_removed(store_dir):
+    upsert_partitions(store_dir, export([('Ene-25', 1, 10, 'Concluido')]))
+    upsert_partitions(store_dir, export([('Feb-25', 1, 10, 'Concluido')]))
+    assert list_months(store_dir) == ['Feb-25']
+    assert 'Ene-25' not in read_manifest(store_dir)['partitions']
+
+
+def test_schema_drift_between_exports(store_dir):
+    first = export([('Ene-25', 1, 10, 'Concluido')])
+    first['motivo_cancelacion'] = None          # columna toda nula este mes
+    first['nota'] = [4]                         # entero
+    upsert_partitions(store_dir, first)
+
+    second = export([('Ene-25', 2, 20, 'Cancelado al momento')])
+    second['motivo_cancelacion'] = ['SIN DISPONIBILIDAD']
+    second['nota'] = [4.5]                      # float
+    second['broker'] = ['X']                    # columna nueva
+    upsert_partitions(store_dir, second)
+
+    third = export([('Feb-25', 3, 30, 'Concluido')])
+    third['nota'] = ['sin nota']                # tipo incompatible -> texto
+    upsert_partitions(store_dir, third)
+
+    df = read_store(store_dir)[0].sort_values('expedientes').reset_index(drop=True)
+    assert len(df) == 3
+    assert df['motivo_cancelacion'].tolist()[:2] == [None, 'SIN DISPONIBILIDAD']
+    assert df['broker'].tolist()[1] == 'X'
+    assert df['nota'].astype(str).tolist() == ['4', '4.5', 'sin nota']